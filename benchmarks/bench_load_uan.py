@@ -0,0 +1,51 @@
+"""
+Benchmark the UAN readers on the files in `tests/assets/uan_example`.
+
+Compares the previous reader (header stripped line by line from a text
+handle, then `np.loadtxt` on the remaining rows) with `read_uan`, and times
+the full `load_uan` decode on top of each.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_load_uan
+"""
+import glob
+import timeit
+
+import numpy as np
+
+from src.GENETIS_RHINO.fitness_functions import load_uan, read_uan
+
+UAN_FILES = sorted(glob.glob("tests/assets/uan_example/0/*.uan"))
+REPEATS = 5
+
+
+def legacy_read(fname: str) -> np.ndarray:
+    """The reader used by `load_uan` before `read_uan` existed."""
+    with open(fname) as f:
+        line = f.readline()
+        while "end_<parameters>" not in line:
+            line = f.readline()
+        return np.loadtxt(f)
+
+
+def best_time(func: callable) -> float:
+    """Best wall time per call over all example files, in ms."""
+    timer = timeit.Timer(lambda: [func(fname) for fname in UAN_FILES])
+    return min(timer.repeat(repeat=REPEATS, number=1)) / len(UAN_FILES) * 1e3
+
+
+def main() -> None:
+    """Print per-file timings."""
+    for fname in UAN_FILES:
+        assert np.array_equal(legacy_read(fname), read_uan(fname)[1])
+
+    print("%d files, best of %d" % (len(UAN_FILES), REPEATS))
+    print("  legacy header + np.loadtxt : %7.2f ms/file" % best_time(legacy_read))
+    print("  read_uan (all columns)     : %7.2f ms/file" % best_time(read_uan))
+    print("  read_uan (magnitudes only) : %7.2f ms/file" % best_time(lambda f: read_uan(f, usecols=(0, 1, 2, 3))))
+    print("  load_uan                   : %7.2f ms/file" % best_time(load_uan))
+
+
+if __name__ == "__main__":
+    main()
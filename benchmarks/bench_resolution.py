@@ -0,0 +1,75 @@
+"""
+Compare low-resolution BCF metrics with the full-resolution ones on `tests/assets/uan_example`.
+
+For each setting this prints the BCF statistics, their relative difference
+from the default full-resolution result, and the
+time taken by the BCF step on an already-loaded, already-interpolated sky.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_resolution [path/to/reference_map.fits]
+
+Without a map argument, the Haslam map at its default path is used if it
+exists, otherwise a smooth synthetic map.
+"""
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import healpy as hp
+import numpy as np
+
+from src.GENETIS_RHINO.fitness_functions import calculate_fitnesses
+from src.GENETIS_RHINO.sky_model import DEFAULT_REF_MAP_PATH, SkyModel
+
+UAN_DIR = "tests/assets/uan_example/0"
+SETTINGS = [
+    ("full", {}),
+    ("decimate 2", {"decimate": 2}),
+    ("decimate 4", {"decimate": 4}),
+    ("decimate 8", {"decimate": 8}),
+    ("healpix nside 32", {"nside": 32}),
+    ("healpix nside 16", {"nside": 16}),
+    ("healpix nside 8", {"nside": 8}),
+]
+
+
+def reference_map_path(tmp_dir: str) -> str:
+    """The map given on the command line, the Haslam map, or a synthetic one."""
+    if len(sys.argv) > 1:
+        return sys.argv[1]
+    if Path(DEFAULT_REF_MAP_PATH).exists():
+        return DEFAULT_REF_MAP_PATH
+    print("Haslam map not found, using a synthetic map")
+    nside = 64
+    theta, phi = hp.pix2ang(nside, np.arange(hp.nside2npix(nside)))
+    sky = 20. + 200. * np.exp(-((theta - np.pi / 2) / 0.2)**2) + 10. * np.cos(phi)**2
+    path = str(Path(tmp_dir) / "synthetic_map.fits")
+    hp.write_map(path, sky)
+    return path
+
+
+def main() -> None:
+    """Print the metrics and timings for every setting."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sky = SkyModel(reference_map_path(tmp_dir))
+        results = {}
+        for name, kwargs in SETTINGS:
+            # First call fills the sky cache; time the next ones
+            results[name] = calculate_fitnesses(UAN_DIR, cache=True, sky_model=sky, **kwargs)
+            seconds = min(timeit.repeat(lambda kw=kwargs: calculate_fitnesses(UAN_DIR, cache=True, sky_model=sky, **kw),
+                                        number=1, repeat=3))
+            results[name]["seconds"] = seconds
+
+    reference = results["full"]
+    print("%-18s %10s %10s %14s %9s %9s %9s %9s" % ("setting", "rms", "swing", "max_abs_deriv",
+                                                    "d_rms", "d_swing", "d_deriv", "time [s]"))
+    for name, stats in results.items():
+        rel = [abs(stats[k] / reference[k] - 1.) for k in ("rms", "swing", "max_abs_deriv")]
+        print("%-18s %10.3e %10.3e %14.3e %8.1f%% %8.1f%% %8.1f%% %9.4f" % (
+            name, stats["rms"], stats["swing"], stats["max_abs_deriv"], *(100 * r for r in rel), stats["seconds"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,35 @@
 """Record the best individuals and fitness score statistics for each generation of Phenotypes."""
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
 from src.GENETIS_RHINO.phenotype import Phenotype
+from src.GENETIS_RHINO.population import Population
+
+
+def column_name(gene: str) -> str:
+    """The CSV column of a Population gene, e.g. `"wp0_ridge_height"` is `"WP1_Ridge_Height"`."""
+    wall, _, rest = gene.partition("_")
+    if wall.startswith("wp") and wall[2:].isdigit():
+        return f"WP{int(wall[2:]) + 1}_" + "_".join(word.capitalize() for word in rest.split("_"))
+    return "_".join(word.capitalize() for word in gene.split("_"))
 
 
 # noinspection SpellCheckingInspection
 class Analysis:
     """Collect data about the progress of generations and fitness."""
 
-    def __init__(self, population: list) -> None:
-        """Track the population as it is updated."""
+    def __init__(self, population: list | Population, file_prefix: str = "") -> None:
+        """
+        Track the population as it is updated; CSV file names start with `file_prefix`, e.g. one per island.
+
+        A Population is summarised from its columns directly.
+        """
         self.population = population
         self.generation_counter = 0
+        self.file_prefix = file_prefix
 
     def update(self, generation_num: int) -> None:
         """Increment the generation counter; write to the fitness and the best individual CSV files."""
@@ -25,16 +40,31 @@ class Analysis:
 
     def update_best_individuals(self) -> list[Phenotype]:
         """Read the nsgaii rank from each individual and find the individuals on the pareto front (lowest rank)."""
+        if isinstance(self.population, Population):
+            best = self.population.take(np.flatnonzero(self.population.rank == self.population.rank.min()))
+            self.to_csv_best_individuals(best, self.file_prefix + "best_individuals.csv")
+            return list(best)
         min_rank = min(indiv.nsgaii_rank for indiv in self.population)
         best_indivs = [indiv for indiv in self.population if indiv.nsgaii_rank==min_rank]
-        self.to_csv_best_individuals(best_indivs)
+        self.to_csv_best_individuals(best_indivs, self.file_prefix + "best_individuals.csv")
         return best_indivs
 
     @staticmethod
-    def to_csv_best_individuals(best_indivs: list[Phenotype],
+    def to_csv_best_individuals(best_indivs: list[Phenotype] | Population,
                                 csv_path: str="best_individuals.csv") -> (
             DataFrame):
         """Write the attributes of the best phenotypes to a CSV file."""
+        if isinstance(best_indivs, Population):
+            columns = {"Indiv_ID": best_indivs.ids,
+                       "Parent1_ID": best_indivs.parent_ids,
+                       "Generation_Created": best_indivs.generation_created}
+            for gene, values in zip(best_indivs.gene_names, best_indivs.genes.T, strict=True):
+                columns[column_name(gene)] = values.astype(bool) if gene.endswith("has_ridge") else values
+            columns["Fitness_Fidelity"] = best_indivs.fidelity
+            columns.update(zip(best_indivs.objectives, best_indivs.scores.T, strict=True))
+            indiv_df = pd.DataFrame(columns)
+            indiv_df.to_csv(csv_path, mode="w", header=True, index=False)
+            return indiv_df
 
         def make_row(indiv: Phenotype) -> pd.DataFrame:
             """Get the attributes of a phenotype and turn its attributes into a table row."""
@@ -72,6 +102,7 @@ class Analysis:
 
                 counter += 1
 
+            row["Fitness_Fidelity"] = [indiv.fitness_fidelity]
             for metric, score in indiv.fitness_scores.items():
                 row[metric] = [score]
             return pd.DataFrame(row)
@@ -82,6 +113,16 @@ class Analysis:
 
     def update_fitness_scores(self) -> dict[str, int]:
         """Read the fitness from each individual and calculate the maximum and average."""
+        if isinstance(self.population, Population):
+            scores = self.population.scores
+            fitness_stats_dict = {"Generation": self.generation_counter}
+            for metric, average, maximum in zip(self.population.objectives,
+                                                (scores.sum(axis=0) / len(scores)).tolist(),
+                                                scores.max(axis=0).tolist(), strict=True):
+                fitness_stats_dict[metric+"_Average"] = [average]
+                fitness_stats_dict[metric+"_Maximum"] = [maximum]
+            self.to_csv_fitness(fitness_stats_dict, self.file_prefix + "fitness.csv")
+            return fitness_stats_dict
         # Create dictionary containing fitness scores from every phenotype in the population.
         all_scores = {}
         for indiv in self.population:
@@ -98,7 +139,7 @@ class Analysis:
         for metric, scores in all_scores.items():
             fitness_stats_dict[metric+"_Average"] = [sum(scores) / len(scores)]
             fitness_stats_dict[metric+"_Maximum"] = [max(scores)]
-        self.to_csv_fitness(fitness_stats_dict)
+        self.to_csv_fitness(fitness_stats_dict, self.file_prefix + "fitness.csv")
         return fitness_stats_dict
 
     @staticmethod
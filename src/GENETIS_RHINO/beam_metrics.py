@@ -0,0 +1,339 @@
+"""
+Engine that computes all beam objectives in a single pass over an antenna's UAN files.
+
+Each metric is a reducer: it sees every beam once, in linear power, as the
+files are read one at a time, and keeps only what it needs (e.g. one number
+per frequency). Adding an objective therefore never adds another pass over
+the files or another dB conversion.
+
+This module provides:
+- BeamMetric: the interface for metrics
+- register_beam_metric: decorator that makes a metric available by name
+- calculate_beam_metrics: reads a directory of UAN files and evaluates metrics
+"""
+import glob
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+from astropy.coordinates import EarthLocation
+from astropy.time import Time
+
+# Imported as a module, as fitness_functions in turn uses this engine
+from src.GENETIS_RHINO import fitness_functions
+from src.GENETIS_RHINO.beam_resampling import solid_angle_weights
+from src.GENETIS_RHINO.sky_model import DEFAULT_REF_MAP_PATH, SkyModel
+
+
+class BeamContext:
+    """
+    Everything about one antenna's beams that is shared by all metrics.
+
+    The beam grid attributes (`za`, `az`, `alt_pix`, `az_pix`,
+    `solid_angle`) are set once the first file has been read.
+    """
+
+    def __init__(self, freqs: npt.ArrayLike, beam_ref_idx: int,
+                 sky_model: Optional[SkyModel], ref_map_path: str,
+                 location: Optional[EarthLocation], obstime: Optional[Time]) -> None:
+        """
+        Holds the antenna's frequencies and the reference sky settings.
+
+        Args:
+            freqs (array_like):
+                Frequency of each beam, in MHz, in increasing order.
+            beam_ref_idx (int):
+                Index of the reference frequency.
+            sky_model (SkyModel):
+                Reference sky, or None to load one from `ref_map_path` if a metric needs it.
+            ref_map_path (str):
+                Path to the reference map.
+            location (astropy.EarthLocation):
+                Location of the observer.
+            obstime (astropy.Time):
+                Time of the observation, or 1D array of times.
+
+        """
+        self.freqs = freqs
+        self.beam_ref_idx = beam_ref_idx
+        self._sky_model = sky_model
+        self.ref_map_path = ref_map_path
+        self.location = location
+        self.obstime = obstime
+
+        self.za = self.az = None
+        self.alt_pix = self.az_pix = None
+        self.solid_angle = None
+
+    def set_grid(self, za: npt.ArrayLike, az: npt.ArrayLike) -> None:
+        """Record the (za, az) grid of the beams."""
+        self.za, self.az = za, az
+        az_grid, alt_grid = np.meshgrid(az, 90-za)
+        self.alt_pix, self.az_pix = alt_grid.flatten(), az_grid.flatten()
+        self.solid_angle = solid_angle_weights(za, az)
+
+    @property
+    def sky_model(self) -> SkyModel:
+        """The reference sky, loaded on first use."""
+        if self._sky_model is None:
+            self._sky_model = SkyModel(self.ref_map_path)
+        return self._sky_model
+
+
+class BeamMetric(ABC):
+    """Each metric reduces every beam of an antenna as it is read, then summarises the results."""
+
+    def setup(self, ctx: BeamContext) -> None:
+        """Prepare for a new antenna, once its beam grid is known."""
+
+    @abstractmethod
+    def accumulate(self, freq_idx: int, beam: npt.ArrayLike, ctx: BeamContext) -> None:
+        """
+        Reduce the beam at one frequency.
+
+        Args:
+            freq_idx (int):
+                Index of the beam's frequency in `ctx.freqs`.
+            beam (array_like):
+                Beam power, linear (not dB), of shape `(Nza, Naz)`. Must not be modified.
+            ctx (BeamContext):
+                Shared information about the antenna.
+
+        """
+
+    @abstractmethod
+    def result(self, ctx: BeamContext) -> dict:
+        """Return the metric's values, as a dict of name to scalar."""
+
+
+class PerFrequencyMetric(BeamMetric):
+    """A metric that reduces each beam to one number, then averages over frequency."""
+
+    name = ""
+
+    def setup(self, ctx: BeamContext) -> None:
+        """Allocate one value per frequency."""
+        self.values = np.zeros(ctx.freqs.size)
+
+    def accumulate(self, freq_idx: int, beam: npt.ArrayLike, ctx: BeamContext) -> None:
+        """Store this beam's value."""
+        self.values[freq_idx] = self.evaluate(beam, ctx)
+
+    @abstractmethod
+    def evaluate(self, beam: npt.ArrayLike, ctx: BeamContext) -> float:
+        """The metric's value for one beam."""
+
+    def result(self, ctx: BeamContext) -> dict:
+        """Average over the band."""
+        return {self.name: float(np.mean(self.values))}
+
+
+# Metrics that can be requested by name
+beam_metric_convert_dict: dict[str, type[BeamMetric]] = {}
+
+
+def register_beam_metric(name: str) -> callable:
+    """Class decorator that makes a BeamMetric available to `calculate_beam_metrics` by name."""
+    def register(cls: type[BeamMetric]) -> type[BeamMetric]:
+        beam_metric_convert_dict[name] = cls
+        return cls
+    return register
+
+
+@register_beam_metric("bcf")
+class BCFMetric(BeamMetric):
+    """Beam correction factor statistics, as returned by `calculate_fitnesses`, with pixels weighted by solid angle."""
+
+    def setup(self, ctx: BeamContext) -> None:
+        """Interpolate the reference sky onto the beam grid."""
+        tmap = ctx.sky_model.tmap(ctx.alt_pix, ctx.az_pix, location=ctx.location, obstime=ctx.obstime)
+        self.weights = ctx.solid_angle.ravel()
+        self.tsky_ref = fitness_functions.reference_sky(tmap, ctx.freqs[ctx.beam_ref_idx]) * self.weights
+        self.beam_integ = np.zeros(ctx.freqs.size)
+        self.sky_times_beam_integ = np.zeros((*self.tsky_ref.shape[:-1], ctx.freqs.size))
+
+    def accumulate(self, freq_idx: int, beam: npt.ArrayLike, ctx: BeamContext) -> None:
+        """Add the beam and sky-weighted beam integrals."""
+        beam = beam.ravel()
+        self.beam_integ[freq_idx] = beam @ self.weights
+        self.sky_times_beam_integ[..., freq_idx] = self.tsky_ref @ beam
+
+    def result(self, ctx: BeamContext) -> dict:
+        """BCF statistics, averaged over time for a drift scan."""
+        self.freqs = ctx.freqs
+        self.bcf = fitness_functions.bcf_from_integrals(self.beam_integ, self.sky_times_beam_integ, ctx.beam_ref_idx)
+        return fitness_functions.time_averaged_bcf_stats(ctx.freqs, self.bcf)
+
+
+@register_beam_metric("peak_gain")
+class PeakGainMetric(PerFrequencyMetric):
+    """Maximum of the beam, in dB."""
+
+    name = "peak_gain_dB"
+
+    def evaluate(self, beam: npt.ArrayLike, ctx: BeamContext) -> float:
+        """Peak gain of one beam."""
+        return 10. * np.log10(beam.max())
+
+
+@register_beam_metric("directivity")
+class DirectivityMetric(PerFrequencyMetric):
+    """Peak of the beam relative to its average over the sphere, in dBi."""
+
+    name = "directivity_dBi"
+
+    def evaluate(self, beam: npt.ArrayLike, ctx: BeamContext) -> float:
+        """Directivity of one beam."""
+        total = np.sum(beam * ctx.solid_angle)
+        return 10. * np.log10(4. * np.pi * beam.max() / total)
+
+
+@register_beam_metric("front_to_back")
+class FrontToBackMetric(PerFrequencyMetric):
+    """Ratio of the power at boresight (zenith) to the power straight behind (nadir), in dB."""
+
+    name = "front_to_back_dB"
+
+    def evaluate(self, beam: npt.ArrayLike, ctx: BeamContext) -> float:
+        """Front-to-back ratio of one beam."""
+        return 10. * np.log10(beam[0].mean() / beam[-1].mean())
+
+
+@register_beam_metric("hpbw")
+class HalfPowerBeamwidthMetric(PerFrequencyMetric):
+    """
+    Full width of the main lobe at half its boresight power, in deg.
+
+    The half-power zenith angle is found along each azimuth cut and averaged
+    over azimuth.
+    """
+
+    name = "hpbw_deg"
+
+    def evaluate(self, beam: npt.ArrayLike, ctx: BeamContext) -> float:
+        """Half-power beamwidth of one beam."""
+        below_half = beam < beam[0].mean() / 2.
+        # First zenith angle below half power in each azimuth cut
+        first = np.where(below_half.any(axis=0), below_half.argmax(axis=0), ctx.za.size - 1)
+        return 2. * float(np.mean(ctx.za[first]))
+
+
+@register_beam_metric("sidelobe_level")
+class SidelobeLevelMetric(PerFrequencyMetric):
+    """
+    Highest sidelobe relative to the peak, in dB.
+
+    Along each azimuth cut the main lobe ends at the first null, i.e. the
+    first zenith angle where the power starts rising again. Everything
+    further from boresight is sidelobe.
+    """
+
+    name = "sidelobe_level_dB"
+
+    def evaluate(self, beam: npt.ArrayLike, ctx: BeamContext) -> float:
+        """Sidelobe level of one beam."""
+        rising = np.diff(beam, axis=0) > 0
+        first_null = np.where(rising.any(axis=0), rising.argmax(axis=0), beam.shape[0])
+        sidelobe = np.arange(beam.shape[0])[:, np.newaxis] > first_null
+        if not sidelobe.any():
+            return -np.inf
+        return 10. * np.log10(beam[sidelobe].max() / beam.max())
+
+
+class BeamSnapshot(BeamMetric):
+    """Keeps the beam at one frequency, in dB, e.g. for plotting. It adds no values to the results."""
+
+    def __init__(self, freq_idx: int = 0) -> None:
+        """Keep the beam at index `freq_idx` of the antenna's frequencies."""
+        self.freq_idx = freq_idx
+        self.beam_db = None
+
+    def accumulate(self, freq_idx: int, beam: npt.ArrayLike, ctx: BeamContext) -> None:
+        """Convert the beam back to dB if it is the one to keep."""
+        if freq_idx == self.freq_idx:
+            self.beam_db = 10. * np.log10(beam)
+
+    def result(self, ctx: BeamContext) -> dict:
+        """No values; the beam is kept in `beam_db`."""
+        return {}
+
+
+def calculate_beam_metrics(uan_directory_root: str,
+                           metrics: Sequence[str | BeamMetric] = ("bcf",),
+                           suffix: str = ".uan",
+                           beam_ref_idx: Optional[int] = None,
+                           ref_map_path: str = DEFAULT_REF_MAP_PATH,
+                           location: Optional[EarthLocation] = None,
+                           obstime: Optional[Time] = None,
+                           sky_model: Optional[SkyModel] = None,
+                           *, cache: bool = False) -> dict:
+    """
+    Calculates beam metrics for one antenna, reading each UAN file once.
+
+    The files are read one at a time in frequency order; each beam is
+    converted from dB once and handed to every metric before being dropped.
+    With `cache`, the beams are instead taken one at a time from the cube
+    kept by `load_uan_directory`, which is memory-mapped once it has been
+    written, so the UAN files are not parsed again.
+
+    Args:
+        uan_directory_root (str):
+            Path to directory of UAN files for one antenna, see `load_uan_directory`.
+        metrics (sequence of str or BeamMetric):
+            Names in `beam_metric_convert_dict`, or BeamMetric instances.
+            Instances keep their state after the call, e.g. `BCFMetric.bcf`,
+            `PerFrequencyMetric.values` or `BeamSnapshot.beam_db`, which can
+            be used for plotting.
+        suffix (str):
+            Suffix of the data files, e.g. '.uan'.
+        beam_ref_idx (int):
+            Index of the BCF reference frequency. Defaults to `Nfreqs // 2`.
+        ref_map_path (str):
+            Path to the reference map, see `beam_correction_factor`.
+        location (astropy.EarthLocation):
+            Location of the observer, see `beam_correction_factor`.
+        obstime (astropy.Time):
+            Time of the observation, or 1D array of times, see `beam_correction_factor`.
+        sky_model (SkyModel):
+            Already-loaded reference map, see `beam_correction_factor`.
+        cache (bool):
+            Reuse/keep a binary copy of the loaded beams, see `load_uan_directory`.
+
+    Returns:
+        values (dict):
+            The results of all metrics, merged into one dict of name to value.
+
+    """
+    metrics = [beam_metric_convert_dict[m]() if isinstance(m, str) else m for m in metrics]
+
+    if cache:
+        beams_db, freqs, za, az = fitness_functions.load_uan_directory(uan_directory_root, suffix, cache=True)
+        grids = ((za, az, beam_db) for beam_db in beams_db)
+    else:
+        files, freqs, headers = fitness_functions.sort_uan_files(glob.glob("%s/*%s" % (uan_directory_root, suffix)))
+        grids = (fitness_functions.load_uan(fname, header=header)[1:]
+                 for fname, header in zip(files, headers, strict=True))
+    if beam_ref_idx is None:
+        beam_ref_idx = freqs.size // 2
+    ctx = BeamContext(freqs, beam_ref_idx, sky_model, ref_map_path, location, obstime)
+
+    for i, (za, az, beam_db) in enumerate(grids):
+        if i == 0:
+            ctx.set_grid(za, az)
+            for metric in metrics:
+                metric.setup(ctx)
+        else:
+            assert np.all(ctx.za == za), "za arrays don't match"
+            assert np.all(ctx.az == az), "az arrays don't match"
+
+        beam = 10.**(beam_db/10.) # convert dB to linear gain
+        beam.flags.writeable = False
+        for metric in metrics:
+            metric.accumulate(i, beam, ctx)
+
+    values = {}
+    for metric in metrics:
+        values.update(metric.result(ctx))
+    return values
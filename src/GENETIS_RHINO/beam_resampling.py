@@ -0,0 +1,130 @@
+"""Functions for evaluating beams at a lower resolution than the UAN grid, for cheap pre-scoring."""
+import healpy as hp
+import numpy as np
+import numpy.typing as npt
+
+
+def solid_angle_weights(za : npt.ArrayLike, az : npt.ArrayLike) -> npt.ArrayLike:
+    """
+    Solid angle of each pixel of an equal-angle (za, az) grid.
+
+    Each sample is taken to be the centre of a cell that extends halfway to
+    its neighbours. The first and last cells are as wide as the spacing to
+    their only neighbour, clipped to the poles, so a grid that stops short of
+    za=180 deg (e.g. after decimation) does not stretch its last cell to the
+    pole. An azimuth column that repeats the
+    first one 360 deg later (e.g. az=360 when az=0 is present) gets zero
+    weight, so it is not counted twice.
+
+    Args:
+        za (array_like):
+            Zenith angles of the grid, in deg, increasing.
+        az (array_like):
+            Azimuths of the grid, in deg, increasing and evenly spaced.
+
+    Returns:
+        weights (array_like):
+            Solid angle of each pixel in sr, of shape `(Nza, Naz)`.
+
+    """
+    za_rad = np.deg2rad(np.asarray(za, dtype=float))
+    az = np.asarray(az, dtype=float)
+
+    # Zenith angle cell edges, halfway between samples and clipped to the poles
+    if za_rad.size > 1:
+        za_edges = np.concatenate([[1.5 * za_rad[0] - 0.5 * za_rad[1]],
+                                   (za_rad[1:] + za_rad[:-1]) / 2.,
+                                   [1.5 * za_rad[-1] - 0.5 * za_rad[-2]]])
+        za_edges = np.clip(za_edges, 0., np.pi)
+    else:
+        za_edges = np.array([0., np.pi])
+    za_weights = np.cos(za_edges[:-1]) - np.cos(za_edges[1:])
+
+    # Azimuth cells all have the same width; drop the duplicate column
+    az_width = np.deg2rad(az[1] - az[0]) if az.size > 1 else 2. * np.pi
+    az_weights = np.full(az.size, az_width)
+    az_weights[np.isclose(az - az[0], 360.)] = 0.
+    return np.outer(za_weights, az_weights)
+
+
+def decimate_beams(beams : npt.ArrayLike, za : npt.ArrayLike, az : npt.ArrayLike,
+                   factor : int) -> tuple[npt.ArrayLike, npt.ArrayLike, npt.ArrayLike]:
+    """
+    Keep every `factor`-th zenith angle and azimuth of a stack of beams.
+
+    Args:
+        beams (array_like):
+            Beams of shape `(..., Nza, Naz)`.
+        za (array_like):
+            Zenith angles of the grid, in deg.
+        az (array_like):
+            Azimuths of the grid, in deg.
+        factor (int):
+            Decimation factor, 1 keeps the full grid.
+
+    Returns:
+        beams (array_like):
+            Decimated beams of shape `(..., ceil(Nza/factor), ceil(Naz/factor))`.
+        za (array_like):
+            Remaining zenith angles.
+        az (array_like):
+            Remaining azimuths.
+
+    """
+    if factor < 1:
+        raise ValueError("Decimation factor must be at least 1")
+    return beams[..., ::factor, ::factor], za[::factor], az[::factor]
+
+
+def resample_to_healpix(beams_db : npt.ArrayLike, za : npt.ArrayLike, az : npt.ArrayLike,
+                        nside : int) -> tuple[npt.ArrayLike, npt.ArrayLike, npt.ArrayLike]:
+    """
+    Resample beams from an equal-angle (za, az) grid onto HEALPix pixel centres.
+
+    The beams are bilinearly interpolated in linear power. HEALPix pixels all
+    have the same solid angle, so the resampled beams can be summed without
+    weights.
+
+    Args:
+        beams_db (array_like):
+            Beam power in dB, of shape `(..., Nza, Naz)`, on a grid that covers
+            the whole sphere (za from 0 to 180 deg, az over 360 deg).
+        za (array_like):
+            Zenith angles of the grid, in deg, increasing and evenly spaced.
+        az (array_like):
+            Azimuths of the grid, in deg, increasing and evenly spaced.
+        nside (int):
+            HEALPix resolution to resample to.
+
+    Returns:
+        beams_db (array_like):
+            Resampled beam power in dB, of shape `(..., 12 * nside**2)`.
+        alt (array_like):
+            Altitude of each HEALPix pixel centre, in deg.
+        az (array_like):
+            Azimuth of each HEALPix pixel centre, in deg.
+
+    """
+    za = np.asarray(za, dtype=float)
+    az = np.asarray(az, dtype=float)
+    theta, phi = hp.pix2ang(nside, np.arange(hp.nside2npix(nside)))
+    pix_za, pix_az = np.rad2deg(theta), np.rad2deg(phi)
+
+    # Fractional grid position of each pixel centre. Azimuth wraps around,
+    # so the grid is extended by one column if it does not already repeat az[0].
+    beams = 10.**(np.asarray(beams_db)/10.) # convert dB to linear gain
+    if not np.isclose(az[-1] - az[0], 360.):
+        beams = np.concatenate([beams, beams[..., :1]], axis=-1)
+        az = np.append(az, az[0] + 360.)
+    za_pos = np.clip((pix_za - za[0]) / (za[1] - za[0]), 0, za.size - 1)
+    az_pos = np.clip(((pix_az - az[0]) % 360.) / (az[1] - az[0]), 0, az.size - 1)
+
+    i0 = np.minimum(za_pos.astype(int), za.size - 2)
+    j0 = np.minimum(az_pos.astype(int), az.size - 2)
+    dza = za_pos - i0
+    daz = az_pos - j0
+    resampled = beams[..., i0, j0] * (1 - dza) * (1 - daz) \
+              + beams[..., i0 + 1, j0] * dza * (1 - daz) \
+              + beams[..., i0, j0 + 1] * (1 - dza) * daz \
+              + beams[..., i0 + 1, j0 + 1] * dza * daz
+    return 10. * np.log10(resampled), 90. - pix_za, pix_az
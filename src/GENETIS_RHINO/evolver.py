@@ -2,42 +2,155 @@
 
 import random
 from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from types import SimpleNamespace
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
 
 from src.GENETIS_RHINO import ga_selectors
-from src.GENETIS_RHINO.phenotype import Phenotype
+from src.GENETIS_RHINO.fitness_evaluators import AbstractFitnessEvaluator, DummyFitnessEvaluator
+from src.GENETIS_RHINO.phenotype import FULL_FIDELITY, LOW_FIDELITY, Phenotype
+from src.GENETIS_RHINO.population import Population
+from src.GENETIS_RHINO.ranking import (
+    crowding_distances,
+    efficient_non_dominated_sort,
+    merge_into_fronts,
+    sweep_non_dominated_sort,
+    vectorized_non_dominated_sort,
+)
+from src.GENETIS_RHINO.surrogate import RBFSurrogate
 
 
 class AbstractEvolver(ABC):
     """Evolvers perform everything needed to select and manage populations of individuals."""
 
+    # Number of times an individual whose evaluation failed is requeued before it is dropped
+    max_requeues = 2
+
+    def __init__(self, fitness_evaluator: Optional[AbstractFitnessEvaluator] = None,
+                 sort_algorithm: str = "vectorized") -> None:
+        """
+        Use `fitness_evaluator` to score new individuals, by default DummyFitnessEvaluator.
+
+        Populations are sorted into fronts by `sort_algorithm`, a key of
+        `non_dominated_sort_convert_dict`.
+        """
+        if fitness_evaluator is None:
+            fitness_evaluator = DummyFitnessEvaluator()
+        if sort_algorithm not in non_dominated_sort_convert_dict:
+            raise ValueError("Invalid non-dominated sort")
+        self.fitness_evaluator = fitness_evaluator
+        self.sort_algorithm = sort_algorithm
+        self.requeue: list[Phenotype] = []
+
+    def evaluate(self, population: list[Phenotype]) -> list[Phenotype]:
+        """
+        Evaluate all pending individuals of a population in one batch.
+
+        With a two-tier evaluator, the pending individuals get low-fidelity
+        scores, then the population is ranked by its low-fidelity scores and
+        the individuals in the leading `promote_fronts` fronts are evaluated
+        at full fidelity.
+
+        Individuals that could not be evaluated are left out of the returned
+        population and added to `requeue`, to be evaluated again with the
+        next batch, unless they have already failed more than
+        `max_requeues` times.
+
+        Returns:
+        The evaluated individuals
+
+        """
+        self.fitness_evaluator.evaluate_pending(population)
+        failed = [indiv for indiv in population if indiv.fitness_pending]
+        if failed:
+            requeue = [indiv for indiv in failed if indiv.failed_evaluations <= self.max_requeues]
+            print(f"{len(failed)} individuals could not be evaluated; {len(requeue)} are requeued")
+            self.requeue.extend(requeue)
+            population = [indiv for indiv in population if not indiv.fitness_pending]
+
+        if self.fitness_evaluator.promote_fronts > 0:
+            stand_ins = [SimpleNamespace(fitness_scores=indiv.fitness_at(LOW_FIDELITY), indiv=indiv)
+                         for indiv in population]
+            fronts = fast_non_dominated_sort(stand_ins, self.sort_algorithm)[:self.fitness_evaluator.promote_fronts]
+            promoted = [s.indiv for front in fronts for s in front]
+            self.fitness_evaluator.promote(promoted)
+            failed = [indiv for indiv in promoted if FULL_FIDELITY not in indiv.fitness_fidelities]
+            if failed:
+                print(f"{len(failed)} individuals could not be promoted; they keep their low-fidelity scores")
+        return population
+
     @abstractmethod
     def evolve(self, population: list[Phenotype], generation_num: int, rand: random.Random) -> list[Phenotype]:
         """Take in a population and return a new population that has undergone selection and mutation."""
 
+    def close(self) -> None:
+        """Release any resources held between generations, e.g. running evaluations."""
+
 
 class NSGA2(AbstractEvolver):
-    """Implemented evolver for the Non-dominated Sorting Genetic Algorithm."""
+    """
+    Implemented evolver for the Non-dominated Sorting Genetic Algorithm.
+
+    The fronts of the population returned by `evolve` are kept, so when it
+    is passed back unchanged for the next generation it is not sorted again,
+    and the offspring are inserted into the kept fronts rather than sorting
+    the merged population from scratch. The result is the same as sorting
+    from scratch with `sort_algorithm`. With two-tier evaluation, promoted
+    individuals change scores, so every sort is done from scratch.
+    """
+
+    def __init__(self, fitness_evaluator: Optional[AbstractFitnessEvaluator] = None,
+                 surrogate: Optional[RBFSurrogate] = None, sort_algorithm: str = "vectorized") -> None:
+        """Use `fitness_evaluator` to score new individuals, pre-screened by `surrogate` if given."""
+        super().__init__(fitness_evaluator, sort_algorithm)
+        self.surrogate = surrogate
+        self.pop_size = None
+        # The last population returned by `evolve`, and its fronts
+        self.survivors: Optional[list[Phenotype]] = None
+        self.survivor_fronts: list[list[Phenotype]] = []
 
     def evolve(self, population: list[Phenotype], generation_num: int, rand: random.Random) -> list[Phenotype]:
         """
         Do one generation of NSGA-II.
 
         Steps:
-        1. Assign ranks and distances to all individuals.
+        1. Assign ranks and distances to all individuals, reusing the fronts
+           of the last generation's survivors.
         2. Generate offspring equal to the size of the pop using binary tournament.
-        3. Merge the offspring and old population.
-        4. Truncate the lower half (according to rank and crowding distance).
+           Once the surrogate is trained, generate `pool_factor` times as many
+           and keep the best by predicted rank.
+        3. Merge the offspring, the old population and the individuals
+           requeued after a failed evaluation, and evaluate all pending
+           individuals in one batch (see `evaluate`).
+        4. Insert the new individuals into the fronts and truncate the lower
+           half (according to rank and crowding distance).
         """
-        pop_size = len(population)
+        if self.pop_size is None:
+            # Requeued individuals still count towards the population size
+            self.pop_size = len(population) + len(self.requeue)
+        pop_size = self.pop_size
 
         # Assign ranks and distances
-        fronts = fast_non_dominated_sort(population)
+        known_fronts = self.survivor_fronts if population is self.survivors else None
+        population = self.evaluate(population)
+        fronts = self.sort_into_fronts(population, known_fronts)
         for front in fronts:
             crowding_distance_assignment(front)
 
+        # Oversize the offspring pool if a trained surrogate will screen it
+        num_offspring = pop_size
+        if self.surrogate is not None:
+            self.surrogate.observe(population)
+            if self.surrogate.ready:
+                num_offspring = int(pop_size * self.surrogate.pool_factor)
+
         # Generate offspring
         offspring = []
-        for i in range(pop_size):
+        for i in range(num_offspring):
             parent1 = ga_selectors.NSGATournament.select_one(population, rand)
             # uncomment these lines for crossover
             #parent2 = NSGATournament.select_one(population, rand)
@@ -46,26 +159,346 @@ class NSGA2(AbstractEvolver):
                                            rand)
             offspring.append(child)
 
-        # Combine parents + offspring
-        combined = population + offspring
+        predicted = None
+        if num_offspring > pop_size:
+            offspring, predicted = self.prescreen(offspring, population, generation_num)
+
+        # Combine parents + offspring + requeued individuals
+        requeued, self.requeue = self.requeue, []
+        combined = self.evaluate(population + offspring + requeued)
+
+        if self.surrogate is not None:
+            # The surrogate predicts full-fidelity scores
+            if predicted is not None:
+                full = [i for i, child in enumerate(offspring) if child.fitness_fidelity == FULL_FIDELITY]
+                if full:
+                    self.surrogate.record_accuracy(generation_num, [predicted[i] for i in full],
+                                                   [offspring[i].fitness_scores for i in full])
+            self.surrogate.observe(offspring)
 
         # Re-sort and truncate to pop_size for elitism
-        fronts = fast_non_dominated_sort(combined)
-        new_pop = []
+        survivors = select_survivors(combined, pop_size, fronts=self.sort_into_fronts(combined, fronts))
+
+        # Truncation keeps whole fronts and part of the last, so ranks stay valid
+        self.survivors = survivors
+        self.survivor_fronts = [[] for _ in range(survivors[-1].nsgaii_rank + 1)] if survivors else []
+        for indiv in survivors:
+            self.survivor_fronts[indiv.nsgaii_rank].append(indiv)
+        return survivors
+
+    def sort_into_fronts(self, population: list[Phenotype],
+                         known_fronts: Optional[list[list[Phenotype]]] = None) -> list[list[Phenotype]]:
+        """
+        Sort a population into fronts, given the fronts of some of its individuals.
+
+        Args:
+        population (list[Phenotype]): Evaluated individuals
+        known_fronts (list[list[Phenotype]]): The fronts of some of the
+            individuals of `population`, which must not have been re-scored
+            since, or None to sort from scratch
+
+        Returns:
+        The fronts of `population`, as `fast_non_dominated_sort` returns them
+
+        """
+        if known_fronts is None or self.fitness_evaluator.promote_fronts > 0:
+            return fast_non_dominated_sort(population, self.sort_algorithm)
+        return merge_into_fronts(population, known_fronts,
+                                 deb_order=self.sort_algorithm in deb_ordered_sorts)
+
+    def prescreen(self, candidates: list[Phenotype], population: list[Phenotype],
+                  generation_num: int) -> tuple[list[Phenotype], list[dict]]:
+        """
+        Keep the candidate offspring with the best predicted rank.
+
+        The candidates are ranked, with their predicted fitness, together with
+        the current population, by Pareto rank and then crowding distance.
+        As many candidates as there are individuals in the population are
+        kept, and renumbered as if they were the only offspring generated.
+
+        Args:
+        candidates (list[Phenotype]): Offspring with pending fitness
+        population (list[Phenotype]): The current, evaluated, population
+        generation_num (int): The generation being created
+
+        Returns:
+        The kept candidates, and the predicted fitness of each
+
+        """
+        pop_size = len(population)
+        predictions = self.surrogate.predict([child.genotype for child in candidates])
+
+        # Rank stand-ins, so the real individuals' ranks are left alone
+        pool = [SimpleNamespace(fitness_scores=p, child=c) for p, c in zip(predictions, candidates, strict=True)]
+        pool += [SimpleNamespace(fitness_scores=indiv.fitness_scores, child=None) for indiv in population]
+        for front in fast_non_dominated_sort(pool, self.sort_algorithm):
+            crowding_distance_assignment(front)
+        ranked = sorted((s for s in pool if s.child is not None),
+                        key=lambda s: (s.nsgaii_rank, -s.nsgaii_distance))[:pop_size]
+
+        for i, s in enumerate(ranked):
+            s.child.indiv_id = str(generation_num * pop_size + i)
+        return [s.child for s in ranked], [s.fitness_scores for s in ranked]
+
+
+class SteadyStateNSGA2(AbstractEvolver):
+    """
+    Asynchronous steady-state variant of NSGA-II.
+
+    Instead of evaluating a whole generation of offspring before selecting
+    again, up to `fitness_evaluator.max_workers` offspring are evaluated at
+    once, each by `fitness_evaluator.evaluate_one` in its own thread. As soon
+    as one returns, it is inserted into the population's front structure,
+    the worst individual is dropped, and a new offspring is bred from the
+    updated population for the freed worker, so no worker waits for the
+    slowest evaluation of a generation. Evaluations still running when
+    `evolve` returns carry on into the next call.
+
+    As individuals are inserted in the order their evaluations finish, runs
+    are not reproducible when evaluations run in parallel. Two-tier
+    evaluation, surrogate pre-screening and evaluators that only work in
+    batches (e.g. simulations on the SLURM backend, which would submit a
+    job array per individual) are not supported.
+    """
+
+    # Number of evaluations in a row that may fail before evolve gives up
+    max_consecutive_failures = 100
+
+    def __init__(self, fitness_evaluator: Optional[AbstractFitnessEvaluator] = None,
+                 surrogate: Optional[RBFSurrogate] = None, sort_algorithm: str = "vectorized") -> None:
+        """Use `fitness_evaluator` to score new individuals; `surrogate` must be None."""
+        super().__init__(fitness_evaluator, sort_algorithm)
+        if self.fitness_evaluator.promote_fronts > 0:
+            raise ValueError("Steady-state NSGA-II does not support two-tier fitness evaluation")
+        if self.fitness_evaluator.batch_only:
+            raise ValueError("Steady-state NSGA-II evaluates one individual at a time, "
+                             "which this fitness evaluator only supports in batches")
+        if surrogate is not None:
+            raise ValueError("Steady-state NSGA-II does not support surrogate pre-screening")
+        self.pop_size = None
+        self.num_issued = 0
+        self.consecutive_failures = 0
+        self.in_flight: dict[Future, Phenotype] = {}
+        self.executor = None
+
+    def evolve(self, population: list[Phenotype], generation_num: int, rand: random.Random) -> list[Phenotype]:
+        """
+        Insert as many evaluated offspring as there are individuals in the population.
+
+        Steps:
+        1. Assign ranks and distances to all individuals.
+        2. Keep every worker busy with an offspring bred by binary
+           tournament, or with an individual requeued after a failed
+           evaluation.
+        3. Each time an evaluation finishes, insert the individual into its
+           front, updating the ranks and distances of the fronts that
+           changed, and drop the individual with the smallest crowding
+           distance in the last front.
+
+        Raises RuntimeError if more than `max_consecutive_failures`
+        evaluations in a row fail, e.g. because the simulator is broken.
+        """
+        if self.pop_size is None:
+            # Requeued individuals still count towards the population size
+            self.pop_size = len(population) + len(self.requeue)
+            self.executor = ThreadPoolExecutor(max_workers=self.fitness_evaluator.max_workers)
+
+        fronts = fast_non_dominated_sort(self.evaluate(population), self.sort_algorithm)
         for front in fronts:
             crowding_distance_assignment(front)
-            if len(new_pop) + len(front) <= pop_size:
-                new_pop.extend(front)
-            else:
-                front.sort(key=lambda ind: ind.nsgaii_distance, reverse=True)
-                new_pop.extend(front[: pop_size - len(new_pop)])
+
+        inserted = 0
+        while True:
+            # Hand every free worker a new individual
+            while len(self.in_flight) < self.fitness_evaluator.max_workers:
+                self.issue(fronts, generation_num, rand)
+            if inserted >= self.pop_size:
                 break
 
-        return new_pop
+            done, _ = wait(self.in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                indiv = self.in_flight.pop(future)
+                fitness_scores = future.result()
+                if fitness_scores is None:
+                    indiv.failed_evaluations += 1
+                    if indiv.failed_evaluations <= self.max_requeues:
+                        self.requeue.append(indiv)
+                    self.consecutive_failures += 1
+                    if self.consecutive_failures > self.max_consecutive_failures:
+                        raise RuntimeError(f"The last {self.consecutive_failures} evaluations all failed")
+                    continue
+
+                self.consecutive_failures = 0
+                indiv.set_fitness(fitness_scores, self.fitness_evaluator.fidelity)
+                for i in insert_into_fronts(fronts, indiv):
+                    crowding_distance_assignment(fronts[i])
+                if sum(len(front) for front in fronts) > self.pop_size:
+                    remove_worst(fronts)
+                    crowding_distance_assignment(fronts[-1])
+                inserted += 1
+
+        return [indiv for front in fronts for indiv in front]
+
+    def issue(self, fronts: list[list[Phenotype]], generation_num: int, rand: random.Random) -> None:
+        """
+        Start evaluating a requeued individual, or else a new offspring.
+
+        Args:
+        fronts (list[list[Phenotype]]): The current population, by front
+        generation_num (int): The generation being created
+        rand (random.Random): Random number generator for breeding
+
+        """
+        if self.requeue:
+            indiv = self.requeue.pop(0)
+        else:
+            population = [indiv for front in fronts for indiv in front]
+            parent1 = ga_selectors.NSGATournament.select_one(population, rand)
+            new_child_id = str(self.pop_size + self.num_issued)
+            indiv = parent1.make_offspring(new_child_id, generation_num, rand)
+            self.num_issued += 1
+        future = self.executor.submit(self.fitness_evaluator.evaluate_one, indiv.genotype)
+        self.in_flight[future] = indiv
+
+    def close(self) -> None:
+        """Wait for the evaluations still running, and discard them."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.in_flight.clear()
+
+
+class ColumnarNSGA2(AbstractEvolver):
+    """
+    NSGA-II on a struct-of-arrays Population.
+
+    Does the same generation as NSGA2, but sorting, crowding distance,
+    tournament selection, mutation and truncation work on the columns of a
+    Population, see `population`, rather than on thousands of Phenotypes.
+    `evolve` accepts a list of Phenotypes or a Population, and returns a
+    Population, whose items are Phenotype views for the rest of the
+    program. Mutation draws from a NumPy generator seeded from `rand`, so
+    runs are reproducible, but differ from those of NSGA2.
+
+    Fitness evaluators score the Population through its views. Two-tier
+    evaluation and surrogate pre-screening are not supported.
+    """
+
+    def __init__(self, fitness_evaluator: Optional[AbstractFitnessEvaluator] = None,
+                 surrogate: Optional[RBFSurrogate] = None, sort_algorithm: str = "vectorized") -> None:
+        """Use `fitness_evaluator` to score new individuals; `surrogate` must be None."""
+        super().__init__(fitness_evaluator, sort_algorithm)
+        if self.fitness_evaluator.promote_fronts > 0:
+            raise ValueError("Columnar NSGA-II does not support two-tier fitness evaluation")
+        if surrogate is not None:
+            raise ValueError("Columnar NSGA-II does not support surrogate pre-screening")
+        self.pop_size = None
+
+    def evolve(self, population: list[Phenotype] | Population, generation_num: int,
+               rand: random.Random) -> Population:
+        """
+        Do one generation of NSGA-II on columns.
+
+        Steps:
+        1. Assign ranks and distances to all individuals.
+        2. Generate offspring equal to the size of the pop using binary
+           tournament, and mutate them all at once.
+        3. Merge the offspring, the old population and the individuals
+           requeued after a failed evaluation, and evaluate all pending
+           individuals in one batch.
+        4. Truncate the lower half (according to rank and crowding distance).
+        """
+        if not isinstance(population, Population):
+            population = Population.from_phenotypes(population)
+        rng = np.random.default_rng(rand.getrandbits(64))
+
+        if self.pop_size is None:
+            # Requeued individuals still count towards the population size
+            self.pop_size = len(population) + len(self.requeue)
+        pop_size = self.pop_size
+
+        # Assign ranks and distances
+        population = self.evaluate_population(population)
+        for rows in self.sort(population):
+            population.crowding_distance_assignment(rows)
+
+        # Generate offspring
+        parents = population.tournament(pop_size, rng)
+        offspring = population.make_offspring(parents, generation_num * pop_size, generation_num, rng)
+
+        # Combine parents + offspring + requeued individuals
+        requeued, self.requeue = self.requeue, []
+        pools = [population, offspring]
+        if requeued:
+            pools.append(Population.from_phenotypes(requeued, population.cfg))
+        combined = self.evaluate_population(Population.concat(pools))
+
+        # Re-sort and truncate to pop_size for elitism
+        return combined.select_survivors(pop_size, self.sort(combined))
+
+    def evaluate_population(self, population: Population) -> Population:
+        """
+        Evaluate the pending individuals of a Population, see `evaluate`.
+
+        Args:
+        population (Population): Individuals, some of which may have pending fitness
+
+        Returns:
+        The evaluated individuals
+
+        """
+        evaluated = self.evaluate(list(population))
+        if len(evaluated) < len(population):
+            population = population.take([view.row for view in evaluated])
+        return population
+
+    def sort(self, population: Population) -> list[npt.ArrayLike]:
+        """
+        Sort a Population into fronts with `sort_algorithm`.
+
+        Args:
+        population (Population): Evaluated individuals
+
+        Returns:
+        The rows of each front, best first
+
+        """
+        if self.sort_algorithm == "vectorized":
+            return population.non_dominated_sort()
+        fronts = fast_non_dominated_sort(list(population), self.sort_algorithm)
+        return [np.array([view.row for view in front], dtype=int) for front in fronts]
+
 
 ### Helper functions for NSGAII
-def fast_non_dominated_sort(population: list) -> list[list]:
-    """Assigns NSGA-II Pareto rank to each individual in the population. Lower rank = better front."""
+def fast_non_dominated_sort(population: list, algorithm: str = "vectorized") -> list[list]:
+    """
+    Assigns NSGA-II Pareto rank to each individual in the population. Lower rank = better front.
+
+    Every algorithm of `non_dominated_sort_convert_dict` gives the same
+    fronts; only `"pairwise"` and `"vectorized"` also give the same order
+    within each front.
+
+    Args:
+    population (list[Phenotype]): Evaluated individuals
+    algorithm (str): Name of the sorting algorithm, by default the array-based
+    `ranking.vectorized_non_dominated_sort`
+
+    """
+    return non_dominated_sort_convert_dict[algorithm](population)
+
+def pairwise_non_dominated_sort(population: list) -> list[list]:
+    """
+    Assigns NSGA-II Pareto rank to each individual by comparing every pair with `dominates`.
+
+    Everyone is compared at the highest fidelity they all have, see
+    `shared_fidelity`. If some individuals also have higher-fidelity scores,
+    the fronts are then split by `split_promoted_fronts`.
+
+    Args:
+    population (list[Phenotype]): Evaluated individuals
+
+    """
+    fidelity = shared_fidelity(population)
     fronts: list[list] = [[]]
 
     # For every individual get who it dominates, and how many it is dominated by
@@ -77,9 +510,9 @@ def fast_non_dominated_sort(population: list) -> list[list]:
             if indiv is q:
                 continue
 
-            if dominates(indiv, q):
+            if dominates(indiv, q, fidelity):
                 indiv.dominated_set.append(q)
-            elif dominates(q, indiv):
+            elif dominates(q, indiv, fidelity):
                 indiv.domination_count += 1
 
         # If you're not dominated by anyone, you go in the first front
@@ -101,25 +534,155 @@ def fast_non_dominated_sort(population: list) -> list[list]:
                     next_front.append(q)
         i += 1
         fronts.append(next_front)
-    return fronts[:-1]
+    fronts.pop()
+    if fidelity is None:
+        return fronts
+    return split_promoted_fronts(fronts, fidelity)
+
+def split_promoted_fronts(fronts: list[list], fidelity: int) -> list[list]:
+    """
+    Splits each front by the higher-fidelity scores of its promoted members.
+
+    The members evaluated above `fidelity` are sorted among themselves at
+    the highest fidelity they all have. The others join the first part, and
+    each part keeps the order of the front.
+
+    Args:
+    fronts (list[list[Phenotype]]): Fronts sorted at `fidelity`
+    fidelity (int): The fidelity the fronts were sorted at
+
+    Returns:
+    The split fronts, with NSGA-II ranks reassigned
+
+    """
+    num_for_split = 2
+    split = []
+    for front in fronts:
+        promoted = [indiv for indiv in front if indiv.fitness_fidelity > fidelity]
+        if len(promoted) < num_for_split:
+            split.append(front)
+            continue
+        stand_ins = [SimpleNamespace(fitness_scores=scores, indiv=indiv)
+                     for indiv, scores in zip(promoted, comparable_scores(*promoted), strict=True)]
+        sub_rank = {id(s.indiv): s.nsgaii_rank
+                    for sub_front in pairwise_non_dominated_sort(stand_ins) for s in sub_front}
+        parts = [[] for _ in range(max(sub_rank.values()) + 1)]
+        for indiv in front:
+            parts[sub_rank.get(id(indiv), 0)].append(indiv)
+        split.extend(parts)
+
+    for rank, front in enumerate(split):
+        for indiv in front:
+            indiv.nsgaii_rank = rank
+    return split
+
+# Non-dominated sorting algorithms that can be selected by name in the config
+non_dominated_sort_convert_dict = {
+    "pairwise": pairwise_non_dominated_sort,
+    "vectorized": vectorized_non_dominated_sort,
+    "sweep_2d": sweep_non_dominated_sort,
+    "ens_ss": partial(efficient_non_dominated_sort, binary_search=False),
+    "ens_bs": partial(efficient_non_dominated_sort, binary_search=True),
+}
+
+# Sorts that order each front as Deb's sort does; the others keep population order
+deb_ordered_sorts = {"pairwise", "vectorized"}
+
+def shared_fidelity(individuals: list) -> Optional[int]:
+    """
+    Returns the highest fidelity all individuals have been evaluated at.
+
+    Args:
+    individuals (list[Phenotype]): Evaluated individuals
+
+    Returns:
+    The fidelity, or None if every individual's `fitness_scores` already has
+    the same fidelity
+
+    """
+    fidelities = [getattr(indiv, "fitness_fidelity", None) for indiv in individuals]
+    if all(f == fidelities[0] for f in fidelities):
+        return None
+
+    common = set.intersection(*(set(indiv.fitness_fidelities) for indiv in individuals))
+    if not common:
+        raise ValueError("Individuals have no fitness fidelity in common and cannot be compared")
+    return max(common)
 
-def dominates(p: Phenotype, q: Phenotype) -> bool:
+def comparable_scores(*individuals: Phenotype) -> list[dict]:
+    """
+    Returns the fitness scores of individuals at the highest fidelity they all have.
+
+    Scores of different fidelities are never compared: an individual with
+    full-fidelity scores is compared with one that only has low-fidelity
+    scores by their low-fidelity scores.
+
+    Args:
+    individuals (Phenotype): Individuals to compare
+
+    """
+    fidelity = shared_fidelity(individuals)
+    if fidelity is None:
+        return [indiv.fitness_scores for indiv in individuals]
+    return [indiv.fitness_at(fidelity) for indiv in individuals]
+
+def dominates(p: Phenotype, q: Phenotype, fidelity: Optional[int] = None) -> bool:
     """
     Returns True if individual p dominates q (minimization).
 
+    The individuals are compared at `fidelity`, by default the highest
+    fidelity they both have (see `comparable_scores`). Comparing each pair
+    at its own shared fidelity is not transitive, so a population is
+    compared at the fidelity they all have, see `pairwise_non_dominated_sort`.
+
     Args:
     p (Phenotype): First individual to compare
     q (Phenotype): Second individual to compare
+    fidelity (int): Fidelity to compare the individuals at
 
     """
-    p_better_or_equal = all(p.fitness_scores[obj] <= q.fitness_scores[obj] for obj in p.fitness_scores)
-    p_strictly_better = any(p.fitness_scores[obj] < q.fitness_scores[obj] for obj in p.fitness_scores)
+    if fidelity is None:
+        p_scores, q_scores = comparable_scores(p, q)
+    else:
+        p_scores, q_scores = p.fitness_at(fidelity), q.fitness_at(fidelity)
+    p_better_or_equal = all(p_scores[obj] <= q_scores[obj] for obj in p_scores)
+    p_strictly_better = any(p_scores[obj] < q_scores[obj] for obj in p_scores)
     return p_better_or_equal and p_strictly_better
 
-def crowding_distance_assignment(front: list) -> None:
+def crowding_distance_assignment(front: list) -> npt.ArrayLike:
     """
     Assigns NSGA-II crowding distance to individuals in a front. Larger distance = more diversity.
 
+    Uses the array-based `ranking.crowding_distances`, which gives the same
+    distances as `loop_crowding_distance_assignment` and leaves the front in
+    the same order.
+
+    Args: front: A collection of individuals on the same front
+
+    Returns:
+    The distances, in the new order of the front
+
+    """
+    num_for_double_front = 2
+    if len(front) <= num_for_double_front:
+        for indiv in front:
+            indiv.nsgaii_distance = float("inf")
+        return np.full(len(front), np.inf)
+
+    # Compare every individual at the same fidelity
+    scores = comparable_scores(*front)
+    objectives = list(scores[0])
+    distances, order = crowding_distances([[s[obj] for obj in objectives] for s in scores])
+    front[:] = [front[i] for i in order]
+    distances = distances[order]
+    for indiv, distance in zip(front, distances.tolist(), strict=True):
+        indiv.nsgaii_distance = distance
+    return distances
+
+def loop_crowding_distance_assignment(front: list) -> None:
+    """
+    Assigns NSGA-II crowding distance to individuals in a front by sorting the list once per objective.
+
     Args: front: A collection of individuals on the same front
     """
     if len(front) == 0:
@@ -136,13 +699,16 @@ def crowding_distance_assignment(front: list) -> None:
     for indiv in front:
         indiv.nsgaii_distance = 0.0
 
+    # Compare every individual at the same fidelity
+    scores = {id(indiv): s for indiv, s in zip(front, comparable_scores(*front), strict=True)}
+
     # For every objective
-    for obj in front[0].fitness_scores:
+    for obj in scores[id(front[0])]:
         # Sort the front for this objective
-        front.sort(key=lambda indiv: indiv.fitness_scores[obj])
+        front.sort(key=lambda indiv: scores[id(indiv)][obj])
         # Get the max and min for normalization
-        f_min = front[0].fitness_scores[obj]
-        f_max = front[-1].fitness_scores[obj]
+        f_min = scores[id(front[0])][obj]
+        f_max = scores[id(front[-1])][obj]
 
         # If equal we will get division by zero, so skip
         if f_max == f_min:
@@ -156,7 +722,97 @@ def crowding_distance_assignment(front: list) -> None:
         for i in range(1, len(front) - 1):
             if front[i].nsgaii_distance != float("inf"):
                 # Get the two closest points
-                prev_f = front[i - 1].fitness_scores[obj]
-                next_f = front[i + 1].fitness_scores[obj]
+                prev_f = scores[id(front[i - 1])][obj]
+                next_f = scores[id(front[i + 1])][obj]
                 # Assign normalized crowding distance
                 front[i].nsgaii_distance += (next_f - prev_f) / (f_max - f_min)
+
+
+def select_survivors(combined: list, pop_size: int, sort_algorithm: str = "vectorized",
+                     fronts: Optional[list[list]] = None) -> list:
+    """
+    Sorts individuals into fronts and keeps the best `pop_size`, by rank and then crowding distance.
+
+    Args:
+    combined (list[Phenotype]): Evaluated individuals
+    pop_size (int): The number of individuals to keep
+    sort_algorithm (str): See `fast_non_dominated_sort`
+    fronts (list[list[Phenotype]]): The fronts of `combined`, if already sorted
+
+    Returns:
+    The survivors, with their NSGA-II ranks and crowding distances assigned
+
+    """
+    if fronts is None:
+        fronts = fast_non_dominated_sort(combined, sort_algorithm)
+    new_pop = []
+    for front in fronts:
+        distances = crowding_distance_assignment(front)
+        if len(new_pop) + len(front) <= pop_size:
+            new_pop.extend(front)
+        else:
+            # Least crowded first, ties in front order
+            keep = np.argsort(-distances, kind="stable")[: pop_size - len(new_pop)]
+            new_pop.extend(front[i] for i in keep.tolist())
+            break
+    return new_pop
+
+
+def insert_into_fronts(fronts: list[list], indiv: Phenotype) -> set[int]:
+    """
+    Inserts an individual into sorted fronts, updating the NSGA-II ranks of those it pushes back.
+
+    The individual joins the first front where nobody dominates it. Members
+    of that front it dominates move one front back, as do members of each
+    following front dominated by someone who moved into it, and so on.
+
+    Args:
+    fronts (list[list[Phenotype]]): Fronts from `fast_non_dominated_sort`, modified in place
+    indiv (Phenotype): The evaluated individual to insert
+
+    Returns:
+    The indices of the fronts whose members changed
+
+    """
+    rank = 0
+    while rank < len(fronts) and any(dominates(q, indiv) for q in fronts[rank]):
+        rank += 1
+    indiv.nsgaii_rank = rank
+    if rank == len(fronts):
+        fronts.append([indiv])
+        return {rank}
+
+    changed = {rank}
+    moved = [q for q in fronts[rank] if dominates(indiv, q)]
+    fronts[rank] = [q for q in fronts[rank] if not dominates(indiv, q)] + [indiv]
+    while moved:
+        rank += 1
+        changed.add(rank)
+        for q in moved:
+            q.nsgaii_rank = rank
+        if rank == len(fronts):
+            fronts.append(moved)
+            break
+        next_moved = [q for q in fronts[rank] if any(dominates(p, q) for p in moved)]
+        fronts[rank] = [q for q in fronts[rank] if q not in next_moved] + moved
+        moved = next_moved
+    return changed
+
+
+def remove_worst(fronts: list[list]) -> Phenotype:
+    """
+    Removes the individual with the smallest crowding distance from the last front.
+
+    Args:
+    fronts (list[list[Phenotype]]): Fronts with crowding distances assigned, modified in place
+
+    Returns:
+    The removed individual
+
+    """
+    last = fronts[-1]
+    worst = min(last, key=lambda indiv: indiv.nsgaii_distance)
+    last.remove(worst)
+    if not last:
+        fronts.pop()
+    return worst
@@ -0,0 +1,137 @@
+"""
+Persistent cache of fitness scores, keyed by genotype.
+
+Each real fitness evaluation is a full simulation followed by the beam
+analysis, so a design that has already been scored, e.g. an offspring whose
+mutations were all clamped back to the same bounds, should never be
+simulated again. The scores are kept in an SQLite database, usually in the
+run directory, so they survive restarts and can be shared by several
+processes.
+
+This module provides:
+- FitnessCache: the SQLite-backed store, with hit/miss counters and eviction
+
+See `CachedFitnessEvaluator` for consulting the cache before evaluating.
+"""
+import json
+import sqlite3
+import time
+from contextlib import closing
+from typing import Optional
+
+
+class FitnessCache:
+    """
+    Fitness scores stored in an SQLite database.
+
+    Every call opens its own connection and runs in a single transaction, so
+    any number of processes can share the same file. Once the cache holds
+    more than `max_entries` scores, the least recently used are evicted.
+
+    :param path: Path to the database file, created if it does not exist.
+    :type path: str
+    :param max_entries: The maximum number of scores kept.
+    :type max_entries: int
+    :param timeout: Seconds to wait for another process to release the database.
+    :type timeout: float
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000,
+                 timeout: float = 60.) -> None:
+        """
+        FitnessCache constructor.
+
+        :param path: Path to the database file, created if it does not exist.
+        :type path: str
+        :param max_entries: The maximum number of scores kept.
+        :type max_entries: int
+        :param timeout: Seconds to wait for another process to release the database.
+        :type timeout: float
+        :rtype: None
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be greater than zero.")
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS fitness ("
+                         "key TEXT PRIMARY KEY, "
+                         "scores TEXT NOT NULL, "
+                         "last_used INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS fitness_last_used ON fitness (last_used)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection to the database."""
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def get_many(self, keys: list[str]) -> dict[str, dict]:
+        """
+        Look up the scores of several keys, counting hits and misses.
+
+        :param keys: Genotype keys, see `Genotype.canonical_hash`.
+        :type keys: list[str]
+        :return: The scores of each key found in the cache.
+        :rtype: dict[str, dict]
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with closing(self._connect()) as conn, conn:
+            for key in keys:
+                row = conn.execute("SELECT scores FROM fitness WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    found[key] = json.loads(row[0])
+            conn.executemany("UPDATE fitness SET last_used = ? WHERE key = ?",
+                             [(time.time_ns(), key) for key in found])
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Look up the scores of one key.
+
+        :param key: Genotype key, see `Genotype.canonical_hash`.
+        :type key: str
+        :return: The scores, or None if the key is not in the cache.
+        :rtype: dict, optional
+        """
+        return self.get_many([key]).get(key)
+
+    def put_many(self, scores: dict[str, dict]) -> None:
+        """
+        Store the scores of several keys, then evict the least recently used beyond `max_entries`.
+
+        :param scores: The scores of each key.
+        :type scores: dict[str, dict]
+        :rtype: None
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO fitness (key, scores, last_used) VALUES (?, ?, ?)",
+                             [(key, json.dumps(s), time.time_ns()) for key, s in scores.items()])
+            excess = conn.execute("SELECT COUNT(*) FROM fitness").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM fitness WHERE key IN "
+                             "(SELECT key FROM fitness ORDER BY last_used LIMIT ?)", (excess,))
+
+    def put(self, key: str, scores: dict) -> None:
+        """
+        Store the scores of one key.
+
+        :param key: Genotype key, see `Genotype.canonical_hash`.
+        :type key: str
+        :param scores: The fitness scores.
+        :type scores: dict
+        :rtype: None
+        """
+        self.put_many({key: scores})
+
+    def __len__(self) -> int:
+        """The number of scores in the cache."""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM fitness").fetchone()[0]
+
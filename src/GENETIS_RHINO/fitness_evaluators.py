@@ -0,0 +1,485 @@
+"""
+Fitness evaluators turn a batch of Genotypes into their fitness scores.
+
+The evolvers hand every new individual of a generation to the evaluator in a
+single call, so an evaluator is free to score the batch in parallel, in a
+vectorized way, or by submitting simulation jobs.
+
+This module provides:
+- AbstractFitnessEvaluator: the interface for all evaluators
+- DummyFitnessEvaluator: scores from DummyFitnessFunc
+- UANFitnessEvaluator: beam correction factor statistics from simulated UAN files
+- SimulationFitnessEvaluator: simulates each Genotype, then scores its UAN files
+- CachedFitnessEvaluator: consults a persistent FitnessCache before evaluating
+- TwoTierFitnessEvaluator: cheap scores for everyone, full scores for the leading fronts
+- make_fitness_evaluator: builds the evaluator named in the config
+"""
+import importlib
+import pathlib
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from src.GENETIS_RHINO.dummy_fitness_func import DummyFitnessFunc
+from src.GENETIS_RHINO.fitness_cache import FitnessCache
+from src.GENETIS_RHINO.fitness_functions import calculate_fitnesses
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.parameters import ParametersObject
+from src.GENETIS_RHINO.phenotype import FULL_FIDELITY, LOW_FIDELITY
+from src.GENETIS_RHINO.simulation_runner import LOG_FILENAME, LocalSimulationRunner, SimulationResult
+from src.GENETIS_RHINO.sky_model import SkyModel
+from src.GENETIS_RHINO.slurm_runner import SlurmSimulationRunner
+
+# Where the "simulation" evaluator runs simulations, selected by `simulation_backend`
+simulation_backend_convert_dict = {
+    "local": LocalSimulationRunner,
+    "slurm": SlurmSimulationRunner,
+}
+
+
+class AbstractFitnessEvaluator(ABC):
+    """
+    Each evaluator scores a batch of Genotypes at once.
+
+    :param cfg: Configuration object.
+    :type cfg: ParametersObject, optional
+    """
+
+    # Fidelity of the scores returned by evaluate_batch
+    fidelity = FULL_FIDELITY
+
+    # Number of leading fronts, ranked at low fidelity, to promote to full fidelity
+    promote_fronts = 0
+
+    def __init__(self, cfg: Optional[ParametersObject] = None) -> None:
+        """
+        Evaluator constructor.
+
+        :param cfg: Configuration object.
+        :type cfg: ParametersObject, optional
+        :rtype: None
+        """
+        self.cfg = cfg
+
+    @abstractmethod
+    def evaluate_batch(self, genotypes: list[Genotype]) -> list[Optional[dict]]:
+        """
+        Evaluate a batch of Genotypes.
+
+        :param genotypes: The Genotypes to score.
+        :type genotypes: list[Genotype]
+        :return: The fitness scores of each Genotype, in the same order, or
+        None for a Genotype that could not be evaluated, e.g. because its
+        simulation failed, and should be requeued.
+        :rtype: list[dict or None]
+        """
+
+    @property
+    def max_workers(self) -> int:
+        """The number of `evaluate_one` calls that can usefully run at once, e.g. in threads."""
+        return 1
+
+    @property
+    def batch_only(self) -> bool:
+        """Whether Genotypes must be evaluated in batches, e.g. because each call submits a scheduler job."""
+        return False
+
+    @property
+    def cache_namespace(self) -> str:
+        """
+        Everything the scores depend on besides the Genotype, to key a FitnessCache.
+
+        Subclasses add the settings that change their scores, so cached
+        scores are not reused after a setting changes.
+
+        :return: The evaluator's class, followed by its settings.
+        :rtype: str
+        """
+        return f"{type(self).__module__}.{type(self).__qualname__}"
+
+    def evaluate_one(self, genotype: Genotype) -> Optional[dict]:
+        """
+        Evaluate a single Genotype, e.g. as soon as a worker is free.
+
+        Must be safe to call from several threads at once, up to `max_workers`.
+
+        :param genotype: The Genotype to score.
+        :type genotype: Genotype
+        :return: Its fitness scores, or None if it could not be evaluated.
+        :rtype: dict, optional
+        """
+        return self.evaluate_batch([genotype])[0]
+
+    def evaluate_pending(self, population: list) -> int:
+        """
+        Evaluate every individual of a population whose fitness is pending, in one batch.
+
+        Individuals that could not be evaluated stay pending, and their
+        `failed_evaluations` count goes up by one.
+
+        :param population: Phenotypes, some of which may have pending fitness.
+        :type population: list[Phenotype]
+        :return: The number of individuals evaluated.
+        :rtype: int
+        """
+        pending = [indiv for indiv in population if indiv.fitness_pending]
+        evaluated = 0
+        if pending:
+            scores = self.evaluate_batch([indiv.genotype for indiv in pending])
+            for indiv, fitness_scores in zip(pending, scores, strict=True):
+                if fitness_scores is None:
+                    indiv.failed_evaluations += 1
+                    continue
+                indiv.set_fitness(fitness_scores, self.fidelity)
+                evaluated += 1
+        return evaluated
+
+    def promote(self, individuals: list) -> int:
+        """
+        Evaluate individuals at full fidelity, in one batch, if they have not been already.
+
+        Individuals that could not be evaluated keep their lower-fidelity scores.
+
+        :param individuals: Evaluated Phenotypes.
+        :type individuals: list[Phenotype]
+        :return: The number of individuals evaluated.
+        :rtype: int
+        """
+        todo = [indiv for indiv in individuals if FULL_FIDELITY not in indiv.fitness_fidelities]
+        evaluated = 0
+        if todo:
+            scores = self.evaluate_batch([indiv.genotype for indiv in todo])
+            for indiv, fitness_scores in zip(todo, scores, strict=True):
+                if fitness_scores is not None:
+                    indiv.set_fitness(fitness_scores, FULL_FIDELITY)
+                    evaluated += 1
+        return evaluated
+
+
+class DummyFitnessEvaluator(AbstractFitnessEvaluator):
+    """Scores each Genotype with DummyFitnessFunc."""
+
+    def evaluate_batch(self, genotypes: list[Genotype]) -> list[dict]:
+        """Return the dummy fitness scores of each Genotype."""
+        return [DummyFitnessFunc(genotype).get_fitness_scores() for genotype in genotypes]
+
+
+class UANFitnessEvaluator(AbstractFitnessEvaluator):
+    """
+    Scores each Genotype by the beam correction factor statistics of its simulated beams.
+
+    The simulation stage writes the UAN files of each Genotype to
+    `<uan_directory_root>/<hash>`, where `<hash>` is its `canonical_hash()`,
+    so a Genotype is found however it is batched. The reference sky is loaded
+    once, on the first batch, and shared by every antenna.
+    """
+
+    def __init__(self, cfg: ParametersObject) -> None:
+        """
+        Evaluator constructor.
+
+        :param cfg: Configuration object, with `uan_directory_root` set.
+        :type cfg: ParametersObject
+        :rtype: None
+        """
+        super().__init__(cfg)
+        self.uan_directory_root = pathlib.Path(cfg.uan_directory_root)
+        self.sky_model = None
+
+    def uan_directory(self, genotype: Genotype) -> pathlib.Path:
+        """
+        The directory holding the UAN files of a Genotype.
+
+        :param genotype: The Genotype.
+        :type genotype: Genotype
+        :return: `<uan_directory_root>/<genotype.canonical_hash()>`.
+        :rtype: pathlib.Path
+        """
+        return self.uan_directory_root / genotype.canonical_hash()
+
+    @property
+    def cache_namespace(self) -> str:
+        """The evaluator's class and UAN directory."""
+        return f"{super().cache_namespace} uan_directory_root={self.uan_directory_root}"
+
+    def evaluate_batch(self, genotypes: list[Genotype]) -> list[dict]:
+        """Return the beam correction factor statistics of each Genotype."""
+        if self.sky_model is None:
+            self.sky_model = SkyModel()
+        return [calculate_fitnesses(str(self.uan_directory(genotype)), sky_model=self.sky_model)
+                for genotype in genotypes]
+
+
+class CoarseUANFitnessEvaluator(UANFitnessEvaluator):
+    """
+    Low-fidelity UANFitnessEvaluator, on a beam grid decimated by `low_fidelity_decimate`.
+
+    See `calculate_fitnesses` for how the beams are decimated.
+    """
+
+    @property
+    def cache_namespace(self) -> str:
+        """The evaluator's class, UAN directory and decimation."""
+        return f"{super().cache_namespace} decimate={self.cfg.low_fidelity_decimate}"
+
+    def evaluate_batch(self, genotypes: list[Genotype]) -> list[dict]:
+        """Return the beam correction factor statistics of each Genotype, on the coarse grid."""
+        if self.sky_model is None:
+            self.sky_model = SkyModel()
+        return [calculate_fitnesses(str(self.uan_directory(genotype)), sky_model=self.sky_model,
+                                    decimate=self.cfg.low_fidelity_decimate)
+                for genotype in genotypes]
+
+
+class SimulationFitnessEvaluator(AbstractFitnessEvaluator):
+    """
+    Simulates each Genotype with the configured simulator, then scores its beams.
+
+    The simulations of a batch are run on the machine itself or as a SLURM
+    job array, as selected by `simulation_backend` (see
+    `simulation_backend_convert_dict`), and configured by the simulation
+    parameters. The UAN files of each successful simulation are then passed
+    to `calculate_fitnesses`, sharing one reference sky. Genotypes whose
+    simulation still failed after its retries get no scores, so they are
+    requeued rather than stopping the run; why each one failed is recorded
+    in the `simulation.log` of its work directory. So do Genotypes whose
+    UAN files cannot be read or analysed, e.g. because the simulator
+    crashed while writing them but still exited with status 0.
+    """
+
+    def __init__(self, cfg: ParametersObject) -> None:
+        """
+        Evaluator constructor.
+
+        :param cfg: Configuration object.
+        :type cfg: ParametersObject
+        :rtype: None
+        """
+        super().__init__(cfg)
+        if cfg.simulation_backend not in simulation_backend_convert_dict:
+            raise ValueError("Invalid simulation backend")
+        self.runner = simulation_backend_convert_dict[cfg.simulation_backend].from_config(cfg)
+        self.sky_model = None
+        self._sky_model_lock = threading.Lock()
+
+    @property
+    def max_workers(self) -> int:
+        """One worker per simulator slot."""
+        return self.runner.max_jobs
+
+    @property
+    def batch_only(self) -> bool:
+        """Whether the simulation backend submits a scheduler job for every batch."""
+        return self.runner.batch_only
+
+    @property
+    def cache_namespace(self) -> str:
+        """The evaluator's class and simulator command."""
+        return f"{super().cache_namespace} simulator_command={self.cfg.simulator_command}"
+
+    def evaluate_batch(self, genotypes: list[Genotype]) -> list[Optional[dict]]:
+        """Return the beam correction factor statistics of each Genotype's simulated beams, or None if it failed."""
+        results = self.runner.run(genotypes)
+        with self._sky_model_lock:
+            if self.sky_model is None:
+                self.sky_model = SkyModel()
+        return [self.score(r) for r in results]
+
+    def score(self, result: SimulationResult) -> Optional[dict]:
+        """
+        Score one simulation's UAN files.
+
+        :param result: The outcome of the simulation.
+        :type result: SimulationResult
+        :return: The beam correction factor statistics, or None if the
+        simulation failed or its UAN files could not be read or analysed,
+        in which case the error is appended to its `simulation.log`.
+        :rtype: dict or None
+        """
+        if not result.ok:
+            return None
+        try:
+            return calculate_fitnesses(result.uan_dir, sky_model=self.sky_model)
+        except (AssertionError, ValueError, OSError) as e:
+            with (pathlib.Path(result.work_dir) / LOG_FILENAME).open("a") as log:
+                log.write(f"--- scoring failed: {type(e).__name__}: {e}\n")
+            return None
+
+
+class CachedFitnessEvaluator(AbstractFitnessEvaluator):
+    """
+    Wraps an evaluator so that only genotypes missing from a FitnessCache are evaluated.
+
+    Genotypes are keyed by `Genotype.canonical_hash(quantum)`, prefixed by
+    the `cache_namespace` of the wrapped evaluator, so scores from another
+    evaluator or other fitness settings are never returned. Genotypes of a
+    batch that share a key are evaluated once.
+
+    :param evaluator: The evaluator to dispatch cache misses to.
+    :type evaluator: AbstractFitnessEvaluator
+    :param cache: The cache to consult.
+    :type cache: FitnessCache
+    :param quantum: The resolution genes are rounded to before hashing, or
+    None to only match identical genotypes.
+    :type quantum: float, optional
+    """
+
+    def __init__(self, evaluator: AbstractFitnessEvaluator, cache: FitnessCache,
+                 quantum: Optional[float] = None) -> None:
+        """
+        CachedFitnessEvaluator constructor.
+
+        :param evaluator: The evaluator to dispatch cache misses to.
+        :type evaluator: AbstractFitnessEvaluator
+        :param cache: The cache to consult.
+        :type cache: FitnessCache
+        :param quantum: The resolution genes are rounded to before hashing.
+        :type quantum: float, optional
+        :rtype: None
+        """
+        super().__init__(evaluator.cfg)
+        self.evaluator = evaluator
+        self.cache = cache
+        self.quantum = quantum
+
+    @property
+    def max_workers(self) -> int:
+        """As many workers as the wrapped evaluator."""
+        return self.evaluator.max_workers
+
+    @property
+    def batch_only(self) -> bool:
+        """Whether the wrapped evaluator needs batches."""
+        return self.evaluator.batch_only
+
+    def evaluate_batch(self, genotypes: list[Genotype]) -> list[Optional[dict]]:
+        """Return cached scores, evaluating the missing genotypes in one batch; failures are not cached."""
+        namespace = self.evaluator.cache_namespace
+        keys = [f"{namespace}/{g.canonical_hash(self.quantum)}" for g in genotypes]
+        scores = self.cache.get_many(keys)
+
+        # Evaluate each missing key once
+        missing = {}
+        for key, g in zip(keys, genotypes, strict=True):
+            if key not in scores:
+                missing.setdefault(key, g)
+        if missing:
+            new_scores = self.evaluator.evaluate_batch(list(missing.values()))
+            new_scores = {key: s for key, s in zip(missing, new_scores, strict=True) if s is not None}
+            self.cache.put_many(new_scores)
+            scores.update(new_scores)
+
+        return [dict(scores[key]) if key in scores else None for key in keys]
+
+
+class TwoTierFitnessEvaluator(AbstractFitnessEvaluator):
+    """
+    Scores every new individual cheaply, and only the most promising at full fidelity.
+
+    Pending individuals are scored by the low-fidelity evaluator. The
+    evolver then ranks the population by those scores and promotes the
+    individuals in the first `promote_fronts` fronts to the full-fidelity
+    evaluator.
+
+    :param low_fidelity: The cheap evaluator, e.g. a coarse beam grid or the dummy model.
+    :type low_fidelity: AbstractFitnessEvaluator
+    :param full_fidelity: The full evaluator.
+    :type full_fidelity: AbstractFitnessEvaluator
+    :param promote_fronts: The number of leading fronts to promote.
+    :type promote_fronts: int
+    """
+
+    fidelity = LOW_FIDELITY
+
+    def __init__(self, low_fidelity: AbstractFitnessEvaluator,
+                 full_fidelity: AbstractFitnessEvaluator,
+                 promote_fronts: int = 1) -> None:
+        """
+        TwoTierFitnessEvaluator constructor.
+
+        :param low_fidelity: The cheap evaluator.
+        :type low_fidelity: AbstractFitnessEvaluator
+        :param full_fidelity: The full evaluator.
+        :type full_fidelity: AbstractFitnessEvaluator
+        :param promote_fronts: The number of leading fronts to promote.
+        :type promote_fronts: int
+        :rtype: None
+        """
+        if promote_fronts < 1:
+            raise ValueError("promote_fronts must be greater than zero.")
+        super().__init__(full_fidelity.cfg)
+        self.low_fidelity = low_fidelity
+        self.full_fidelity = full_fidelity
+        self.promote_fronts = promote_fronts
+
+    def evaluate_batch(self, genotypes: list[Genotype]) -> list[Optional[dict]]:
+        """Return the low-fidelity scores of each Genotype."""
+        return self.low_fidelity.evaluate_batch(genotypes)
+
+    def promote(self, individuals: list) -> int:
+        """Evaluate individuals with the full-fidelity evaluator, if they have not been already."""
+        return self.full_fidelity.promote(individuals)
+
+
+# Evaluators that can be selected by name in the config
+fitness_evaluator_convert_dict = {
+    "dummy": DummyFitnessEvaluator,
+    "uan": UANFitnessEvaluator,
+    "uan_coarse": CoarseUANFitnessEvaluator,
+    "simulation": SimulationFitnessEvaluator,
+}
+
+
+def evaluator_from_name(name: str, cfg: ParametersObject) -> AbstractFitnessEvaluator:
+    """
+    Build an evaluator from its name.
+
+    :param name: A key of `fitness_evaluator_convert_dict`, or a custom
+    evaluator given as `"package.module:ClassName"`.
+    :type name: str
+    :param cfg: Configuration object, passed to the evaluator.
+    :type cfg: ParametersObject
+    :return: The fitness evaluator.
+    :rtype: AbstractFitnessEvaluator
+    """
+    if name in fitness_evaluator_convert_dict:
+        return fitness_evaluator_convert_dict[name](cfg)
+
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError("Invalid fitness evaluator")
+    evaluator_class = getattr(importlib.import_module(module_name), class_name)
+    if not issubclass(evaluator_class, AbstractFitnessEvaluator):
+        raise TypeError(f"{name} is not an AbstractFitnessEvaluator")
+    return evaluator_class(cfg)
+
+
+def make_fitness_evaluator(cfg: ParametersObject) -> AbstractFitnessEvaluator:
+    """
+    Build the fitness evaluator selected by `cfg.fitness_evaluator`.
+
+    The name is either a key of `fitness_evaluator_convert_dict`, or a custom
+    evaluator given as `"package.module:ClassName"`. Either way, the
+    evaluator is constructed with the config. If `cfg.fitness_cache_path`
+    is set, it is wrapped in a CachedFitnessEvaluator using that file. If
+    `cfg.low_fidelity_evaluator` is set, that evaluator scores every
+    individual first, and the full evaluator only the leading
+    `cfg.promote_fronts` fronts, see TwoTierFitnessEvaluator.
+
+    :param cfg: Configuration object.
+    :type cfg: ParametersObject
+    :return: The fitness evaluator.
+    :rtype: AbstractFitnessEvaluator
+    """
+    evaluator = evaluator_from_name(cfg.fitness_evaluator, cfg)
+
+    # only the full-fidelity scores are cached
+    if cfg.fitness_cache_path:
+        cache = FitnessCache(cfg.fitness_cache_path, cfg.fitness_cache_max_entries)
+        quantum = cfg.fitness_cache_quantum if cfg.fitness_cache_quantum > 0 else None
+        evaluator = CachedFitnessEvaluator(evaluator, cache, quantum)
+
+    if cfg.low_fidelity_evaluator:
+        evaluator = TwoTierFitnessEvaluator(evaluator_from_name(cfg.low_fidelity_evaluator, cfg),
+                                            evaluator, cfg.promote_fronts)
+    return evaluator
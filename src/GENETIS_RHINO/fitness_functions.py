@@ -1,15 +1,23 @@
 """This files contains functions for calculating fitness values."""
 
 import glob
+import hashlib
+import io
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
+from pathlib import Path
+from typing import NamedTuple, Optional
 
-import healpy as hp
 import numpy as np
 import numpy.typing as npt
 import pylab as plt
-from astropy import units as u
-from astropy.coordinates import AltAz, EarthLocation, Galactic, SkyCoord
+from astropy.coordinates import EarthLocation
 from astropy.time import Time
-from astropy_healpix import HEALPix
+
+from src.GENETIS_RHINO import beam_metrics
+from src.GENETIS_RHINO.beam_resampling import resample_to_healpix, solid_angle_weights
+from src.GENETIS_RHINO.sky_model import DEFAULT_REF_MAP_PATH, SkyModel
 
 
 def beam_correction_factor(beam_power_db : npt.ArrayLike,
@@ -17,9 +25,11 @@ def beam_correction_factor(beam_power_db : npt.ArrayLike,
                            beam_az_deg : npt.ArrayLike,
                            beam_freqs_MHz : npt.ArrayLike,
                            beam_ref_idx : int,
-                           ref_map_path : str="src/assets/haslam408_dsds_Remazeilles2014.fits",
+                           ref_map_path : str=DEFAULT_REF_MAP_PATH,
                            location : EarthLocation = None,
-                           obstime : Time = None) -> npt.ArrayLike:
+                           obstime : Time = None,
+                           sky_model : Optional[SkyModel] = None,
+                           pixel_weights : Optional[npt.ArrayLike] = None) -> npt.ArrayLike:
     """
     Calculates the beam correction factor as defined in Eq. 7 of Spinelli et al. (2022) [https://doi.org/10.1093/mnras/stac1804].
 
@@ -61,58 +71,148 @@ def beam_correction_factor(beam_power_db : npt.ArrayLike,
             will default to Jodrell Bank, `lat=53.2421deg, lon=-2.3067deg, flare_height=70`.
         obstime (astropy.Time):
             Object containing the time of the observation. If unspecified, will
-            default to `2025-08-01 22:00:00Z`.
+            default to `2025-08-01 22:00:00Z`. A 1D array of `Ntimes` times
+            (e.g. the LSTs of a drift scan) evaluates the BCF at every time in
+            one pass, with the rotated skies computed once.
+        sky_model (SkyModel):
+            Already-loaded reference map to use instead of reading `ref_map_path`.
+            Interpolated maps are reused across calls on the same beam grid,
+            location and obstime. If `location` or `obstime` are unspecified,
+            the model's defaults are used.
+        pixel_weights (array_like):
+            Solid angle of each pixel, used to weight the integrals. If
+            unspecified, all pixels are given the same weight.
 
     Returns:
         bcf (array_like):
-            Beam correction factor at each frequency. This is a dimensionless ratio.
+            Beam correction factor at each frequency. This is a dimensionless ratio,
+            of shape `(Nfreqs,)`, or `(Ntimes, Nfreqs)` for an array of times.
+
+    """
+    beam_power_db = np.asarray(beam_power_db)
+    return beam_correction_factor_batch(beam_power_db[np.newaxis], beam_alt_deg, beam_az_deg,
+                                        beam_freqs_MHz, beam_ref_idx, ref_map_path=ref_map_path,
+                                        location=location, obstime=obstime, sky_model=sky_model,
+                                        pixel_weights=pixel_weights)[0]
+
+
+def beam_correction_factor_batch(beam_power_db : npt.ArrayLike,
+                                 beam_alt_deg : npt.ArrayLike,
+                                 beam_az_deg : npt.ArrayLike,
+                                 beam_freqs_MHz : npt.ArrayLike,
+                                 beam_ref_idx : int,
+                                 ref_map_path : str=DEFAULT_REF_MAP_PATH,
+                                 location : EarthLocation = None,
+                                 obstime : Time = None,
+                                 sky_model : Optional[SkyModel] = None,
+                                 pixel_weights : Optional[npt.ArrayLike] = None) -> npt.ArrayLike:
+    """
+    Calculates the beam correction factor for a stack of antennas at once.
+
+    Same as `beam_correction_factor`, but for many beams on the same grid.
+    The dB to linear conversion and the two integrals over the beam are
+    done for all antennas and frequencies in single array operations.
+
+    Args:
+        beam_power_db (array_like):
+            Beam power patterns in dB, of shape `(Nant, Nfreqs, Npixels)`.
+            Any trailing pixel axes, e.g. `(Nant, Nfreqs, Nza, Naz)`, are flattened.
+        beam_alt_deg (array_like):
+            Altitude of each pixel, in degrees, as for `beam_correction_factor`.
+        beam_az_deg (array_like):
+            Azimuth of each pixel, in degrees.
+        beam_freqs_MHz (array_like):
+            Frequencies of the beams, in MHz. The same for every antenna.
+        beam_ref_idx (int):
+            Which reference frequency to use from the `beam_freqs_MHz` array.
+        ref_map_path (str):
+            Path to the Haslam 408 MHz map, see `beam_correction_factor`.
+        location (astropy.EarthLocation):
+            Location of the observer, see `beam_correction_factor`.
+        obstime (astropy.Time):
+            Time of the observation, or 1D array of times, see `beam_correction_factor`.
+        sky_model (SkyModel):
+            Already-loaded reference map, see `beam_correction_factor`.
+        pixel_weights (array_like):
+            Solid angle of each pixel, see `beam_correction_factor`.
+
+    Returns:
+        bcf (array_like):
+            Beam correction factor of shape `(Nant, Nfreqs)`, or
+            `(Nant, Ntimes, Nfreqs)` for an array of times.
 
     """
     # Load healpix reference map, assumed to be at 408 MHz
+    if sky_model is None:
+        sky_model = SkyModel(ref_map_path) # load map from fits file
+
+    # Interpolate values of reference map onto the same coords as the beam
+    tmap = sky_model.tmap(beam_alt_deg, beam_az_deg, location=location, obstime=obstime)
+    tsky_ref = reference_sky(tmap, beam_freqs_MHz[beam_ref_idx])
+
+    # Integrals of beam and sky times beam over solid angle, for every
+    # antenna and frequency. Without pixel weights all integrals are just
+    # sums, assuming fixed pixel area (true for healpix). No overall pixel
+    # area factor is used as they should cancel in the BCF ratio.
+    beam_power_db = np.asarray(beam_power_db)
+    beams = 10.**(beam_power_db.reshape(*beam_power_db.shape[:2], -1)/10.) # convert dB to linear gain
+    if pixel_weights is None:
+        beam_integ = beams.sum(axis=-1)
+    else:
+        pixel_weights = np.ravel(pixel_weights)
+        beam_integ = beams @ pixel_weights
+        tsky_ref = tsky_ref * pixel_weights
+    sky_times_beam_integ = beams @ tsky_ref.T
+
+    # Several times: (Nant, Nfreqs, Ntimes) -> (Nant, Ntimes, Nfreqs)
+    if tsky_ref.ndim > 1:
+        sky_times_beam_integ = np.moveaxis(sky_times_beam_integ, -1, 1)
+        beam_integ = beam_integ[:, np.newaxis]
+    return bcf_from_integrals(beam_integ, sky_times_beam_integ, beam_ref_idx)
+
+
+def reference_sky(tmap : npt.ArrayLike, freq_MHz : float) -> npt.ArrayLike:
+    """
+    Scale the reference map to a frequency with the assumed power-law spectrum.
+
+    Args:
+        tmap (array_like):
+            Reference (408 MHz) map temperature at each beam pixel.
+        freq_MHz (float):
+            Frequency to scale to, in MHz.
+
+    Returns:
+        tsky (array_like):
+            Sky temperature at each beam pixel.
+
+    """
     spectral_index_ref_freq = 408. # MHz
     beta = -2.7 # spectral index for reference map power-law frequency spectrum
-    ref_map = hp.fitsfunc.read_map(ref_map_path) # load map from fits file
+    return tmap * (freq_MHz / spectral_index_ref_freq)**beta
 
-    # Set up HP object, which is assuemd to be in Galactic coords
-    hp_map = HEALPix(nside=hp.npix2nside(ref_map.size), order="RING", frame=Galactic())
 
-    # Define local alt/az coordinate system
-    if location is None:
-        location = EarthLocation(lat=53.2421*u.deg, lon=-2.3067*u.deg, height=70.)
-    if obstime is None:
-        obstime = Time("2025-08-01 22:00:00Z")
-    frame_altaz = AltAz(obstime=obstime, location=location)
+def bcf_from_integrals(beam_integ : npt.ArrayLike, sky_times_beam_integ : npt.ArrayLike,
+                       beam_ref_idx : int) -> npt.ArrayLike:
+    """
+    Combine the per-frequency beam integrals into the beam correction factor.
+
+    Args:
+        beam_integ (array_like):
+            Integral of the beam over solid angle, of shape `(..., Nfreqs)`.
+        sky_times_beam_integ (array_like):
+            Integral of the reference sky times the beam, of shape `(..., Nfreqs)`.
+        beam_ref_idx (int):
+            Index of the reference frequency.
 
-    # Set up Astropy coordinate objects for each pixel of the beam
-    coords = SkyCoord(beam_az_deg.ravel() * u.deg, beam_alt_deg.ravel() * u.deg, frame=frame_altaz)
+    Returns:
+        bcf (array_like):
+            Beam correction factor of shape `(..., Nfreqs)`.
 
-    # Interpolate values of reference map onto the same coords as the beam
-    tmap = hp_map.interpolate_bilinear_skycoord(coords, ref_map)
-
-    # Integrals of beam at ref. frequency
-    # (integral of beam and sky times beam over solid angle at ref. freq.)
-    # All integrals are just sums, assuming fixed pixel area (true for healpix).
-    # No pixel area factor is used as they should cancel in the BCF ratio.
-    beam_ref = (10.**(beam_power_db[beam_ref_idx]/10.)).flatten() # convert dB to linear gain
-    tsky_ref = tmap * (beam_freqs_MHz[beam_ref_idx] / spectral_index_ref_freq)**beta
-    beam_integ_ref = np.sum(beam_ref)
-    sky_times_beam_integ_ref = np.sum(beam_ref * tsky_ref)
-
-    # Loop over frequencies to calculate BCF
-    bcf = np.zeros(beam_freqs_MHz.size)
-    for i, freq in enumerate(beam_freqs_MHz):
-        # Beam and sky maps at this frequency
-        beam = (10.**(beam_power_db[i]/10.)).flatten()
-        #tsky = tmap * (freq / spectral_index_ref_freq)**beta
-
-        # Integral of beam and ref. sky times beam at this frequency
-        beam_integ = np.sum(beam)
-        sky_times_beam_integ = np.sum(beam * tsky_ref)
-
-        # Populate BCF value in array
-        bcf[i] = (sky_times_beam_integ / sky_times_beam_integ_ref) \
-               * (beam_integ_ref / beam_integ)
-    return bcf
+    """
+    beam_integ = np.asarray(beam_integ)
+    sky_times_beam_integ = np.asarray(sky_times_beam_integ)
+    return (sky_times_beam_integ / sky_times_beam_integ[..., beam_ref_idx, np.newaxis]) \
+         * (beam_integ[..., beam_ref_idx, np.newaxis] / beam_integ)
 
 
 def calculate_bcf_stats(freqs : npt.ArrayLike, bcf : npt.ArrayLike) -> dict:
@@ -123,11 +223,13 @@ def calculate_bcf_stats(freqs : npt.ArrayLike, bcf : npt.ArrayLike) -> dict:
         freqs (array_like):
             Frequencies at which the BCF was evaluated. Assumed to be in MHz.
         bcf (array_like):
-            Array of BCF values.
+            Array of BCF values, of shape `(Nfreqs,)`, or `(Nant, Nfreqs)` for
+            a stack of antennas from `beam_correction_factor_batch`.
 
     Returns:
         stats (dict):
-            Dictionary of simple summary statistics:
+            Dictionary of simple summary statistics, each a scalar or, for a
+            stack of antennas, an array of shape `(Nant,)`:
             - max_abs_deriv: Phil's favorite. Maximum value of the derivative of the
                 BCF in frequency. Higher absolute values imply that somewhere in the
                 frequency range, there is a more rapid variation of the BCF with
@@ -143,99 +245,337 @@ def calculate_bcf_stats(freqs : npt.ArrayLike, bcf : npt.ArrayLike) -> dict:
     stats = {}
 
     # Calculate RMS value
-    stats["rms"] = np.sqrt(np.mean((bcf - 1.)**2.))
+    stats["rms"] = np.sqrt(np.mean((bcf - 1.)**2., axis=-1))
 
     # Calculate swing
-    stats["swing"] = bcf.max() - bcf.min()
+    stats["swing"] = bcf.max(axis=-1) - bcf.min(axis=-1)
 
     # Calculate max. absolute derivative
     # Lower is better
-    stats["max_abs_deriv"] = np.max(np.abs(np.diff(bcf) / np.diff(freqs)))
+    stats["max_abs_deriv"] = np.max(np.abs(np.diff(bcf, axis=-1) / np.diff(freqs)), axis=-1)
     return stats
 
 
-def load_uan(fname : str) -> tuple[float, npt.ArrayLike, npt.ArrayLike, npt.ArrayLike]:
-    """Load antenna pattern data from a UAN text file."""
-    def strip_header(f : str) -> tuple[int, int, str, float]:
-        # Parse and strip header lines from input file
-        phi_inc = theta_inc = magnitude = None    # need these to process the file
-        line = f.readline()
-        while "end_<parameters>" not in line:
-            if "phi_inc" in line:
-                phi_inc = int(line.split()[1])
-            if "theta_inc" in line:
-                theta_inc = int(line.split()[1])
-            if "magnitude" in line:
-                magnitude_unit = line.split()[1]
-            if "frequencyHz" in line:
-                freq_hz = float(line.split()[1])
-            line = f.readline()
-
-        # Check headers were found
-        assert  phi_inc is not None \
-            and theta_inc is not None \
-            and magnitude_unit is not None \
-            and freq_hz is not None, \
-            "Required headers missing"
-        return phi_inc, theta_inc, magnitude_unit, freq_hz
-
-    def polar_to_re_im(fn : callable, amp : float, phase : float) -> complex:
-        # amp in dB and phase in degrees
-        return fn(amp) * (np.cos(np.deg2rad(phase)) + 1.j*np.sin(np.deg2rad(phase)))
+def time_averaged_bcf_stats(freqs : npt.ArrayLike, bcf : npt.ArrayLike) -> dict:
+    """
+    Summary statistics of the BCF, averaged over observation times.
 
-    # Helper conversion functions
-    def dB_to_lin(vals : npt.ArrayLike) -> npt.ArrayLike:
-        return 10.**(vals/10.)
+    Args:
+        freqs (array_like):
+            Frequencies at which the BCF was evaluated. Assumed to be in MHz.
+        bcf (array_like):
+            Array of BCF values, of shape `(Nfreqs,)` for a single time, or
+            `(Ntimes, Nfreqs)` for several.
+
+    Returns:
+        stats (dict):
+            The statistics of `calculate_bcf_stats` at each time, averaged over
+            all times. For a single time this is just `calculate_bcf_stats`.
+
+    """
+    stats = calculate_bcf_stats(freqs, bcf)
+    if np.ndim(bcf) == 1:
+        return stats
+    return {name: np.mean(values) for name, values in stats.items()}
+
+
+class UANHeader(NamedTuple):
+    """Metadata from the `begin_<parameters>` block of a UAN file."""
+
+    freq_hz: float
+    phi_inc: int
+    theta_inc: int
+    magnitude_unit: str
+    polarization: Optional[str]
+    phi_min: int = 0
+    phi_max: int = 360
+    theta_min: int = 0
+    theta_max: int = 180
+    header_lines: int = 0
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """Number of zenith angles and azimuths implied by the angular ranges and increments."""
+        return ((self.theta_max - self.theta_min) // self.theta_inc + 1,
+                (self.phi_max - self.phi_min) // self.phi_inc + 1)
+
+    @property
+    def nrows(self) -> int:
+        """Number of data rows implied by the angular ranges and increments."""
+        ntheta, nphi = self.shape
+        return ntheta * nphi
+
+
+UAN_END_OF_HEADER = b"end_<parameters>"
+
+
+def parse_uan_header(header : bytes) -> UANHeader:
+    """
+    Parse the start of a UAN file, up to and including its `end_<parameters>` line.
+
+    Args:
+        header (bytes):
+            Raw header bytes. Anything after the `end_<parameters>` line is ignored.
+
+    Returns:
+        header (UANHeader):
+            Parsed header; `header_lines` counts the lines up to and including
+            `end_<parameters>`.
+
+    """
+    end = header.find(UAN_END_OF_HEADER)
+    assert end >= 0, "UAN file has no %s line" % UAN_END_OF_HEADER.decode()
+
+    # Parse header into key/value pairs
+    fields = {}
+    for line in header[:end].decode().splitlines():
+        words = line.split()
+        if len(words) >= 2:  # noqa: PLR2004
+            fields[words[0]] = words[1]
+    assert all(key in fields for key in ("phi_inc", "theta_inc", "magnitude", "frequencyHz")), \
+           "Required headers missing"
+
+    return UANHeader(freq_hz=float(fields["frequencyHz"]),
+                     phi_inc=int(fields["phi_inc"]),
+                     theta_inc=int(fields["theta_inc"]),
+                     magnitude_unit=fields["magnitude"],
+                     polarization=fields.get("polarization"),
+                     phi_min=int(fields.get("phi_min", 0)),
+                     phi_max=int(fields.get("phi_max", 360)),
+                     theta_min=int(fields.get("theta_min", 0)),
+                     theta_max=int(fields.get("theta_max", 180)),
+                     header_lines=header.count(b"\n", 0, end) + 1)
+
+
+def read_uan_header(fname : str) -> UANHeader:
+    """Read only the header of a UAN file, without touching its data rows."""
+    lines = []
+    with open(fname, "rb") as f:
+        for line in f:
+            lines.append(line)
+            if UAN_END_OF_HEADER in line:
+                break
+    return parse_uan_header(b"".join(lines))
+
+
+def sort_uan_files(files : list[str]) -> tuple[list[str], npt.ArrayLike, list[UANHeader]]:
+    """
+    Order UAN files by the frequency in their headers.
+
+    Args:
+        files (list of str):
+            Paths of UAN files.
+
+    Returns:
+        files (list of str):
+            The same paths, in increasing frequency.
+        freqs (array_like):
+            Frequency of each file, in MHz.
+        headers (list of UANHeader):
+            Header of each file, which can be passed on to `read_uan` so it is
+            not parsed again.
+
+    """
+    headers = [read_uan_header(fname) for fname in files]
+    header_freqs = np.array([header.freq_hz for header in headers])
+    order = np.argsort(header_freqs, kind="stable")
+    return ([files[idx] for idx in order], header_freqs[order] / 1e6, # convert to MHz
+            [headers[idx] for idx in order])
+
+
+def read_uan(fname : str, usecols : Optional[tuple[int, ...]] = None,
+             decimate : int = 1, header : Optional[UANHeader] = None) -> tuple[UANHeader, npt.ArrayLike]:
+    """
+    Read the header and numeric table of a UAN file.
+
+    The file is read once as bytes to parse the header and to count the data
+    rows, which are checked against the row count implied by the header
+    before any numbers are parsed. Trailing blank lines are not counted. The
+    table is then parsed from the same bytes by the C parser of `np.loadtxt`,
+    with the exact number of rows to read.
+
+    With `decimate`, the unwanted rows are dropped as lines of text, so they
+    are never parsed. This assumes the rows are ordered by zenith angle and
+    then azimuth, as written by XFdtd.
+
+    Args:
+        fname (str):
+            Path to the UAN file.
+        usecols (tuple of int):
+            Columns of the table to return. By default all six columns
+            `(theta, phi, mag_theta, mag_phi, phase_theta, phase_phi)` are read.
+        decimate (int):
+            Only return the rows of every `decimate`-th zenith angle and
+            azimuth. By default all rows are returned.
+        header (UANHeader):
+            The file's header, if it has already been read, e.g. by
+            `sort_uan_files`; it is then not parsed again.
+
+    Returns:
+        header (UANHeader):
+            Frequency, angular increments and ranges, magnitude unit and
+            polarization of the file.
+        table (array_like):
+            Array of shape `(Nrows, Ncols)`.
 
-    def no_change(vals : npt.ArrayLike) -> npt.ArrayLike:
-        return vals
+    """
+    if decimate < 1:
+        raise ValueError("Decimation factor must be at least 1")
+
+    with open(fname, "rb") as f:
+        data = f.read()
+
+    if header is None:
+        header = parse_uan_header(data)
+    body_start = data.find(b"\n", data.find(UAN_END_OF_HEADER)) + 1 or len(data)
 
-    def to_power(efield : tuple[complex, complex]) -> float:
-        return (efield[0] * np.conj(efield[0]) + efield[1] * np.conj(efield[1])).real
+    # Check the row count before parsing any numbers
+    body = data[body_start:].rstrip()
+    nrows = body.count(b"\n") + 1 if body else 0
+    assert nrows == header.nrows, \
+           "%s has %d data rows, expected %d from header" % (fname, nrows, header.nrows)
 
-    # Open file and parse data
-    with open(fname) as f:
-        # Parse header
-        za_inc, az_inc, magnitude_type, freq_hz = strip_header(f)
+    nrows = header.nrows
+    if decimate > 1:
+        lines = np.array(body.split(b"\n"), dtype=object).reshape(header.shape)[::decimate, ::decimate]
+        nrows = lines.size
+        body = b"\n".join(lines.ravel())
 
-        # Load data from remaining rows in file
-        uan_values = np.loadtxt(f)
+    table = np.loadtxt(io.BytesIO(body), max_rows=nrows, usecols=usecols, ndmin=2)
+    return header, table
+
+
+def load_uan(fname : str, decimate : int = 1,
+             header : Optional[UANHeader] = None) -> tuple[float, npt.ArrayLike, npt.ArrayLike, npt.ArrayLike]:
+    """
+    Load antenna pattern data from a UAN text file, keeping every `decimate`-th zenith angle and azimuth.
+
+    The file's `header`, if already read, is reused, see `read_uan`.
+    """
+    # Helper conversion functions
+    def dB_to_lin(vals : npt.ArrayLike) -> npt.ArrayLike:
+        return 10.**(vals/10.)
+
+    # Parse header and the columns needed for power; the phases are not needed
+    header, uan_values = read_uan(fname, usecols=(0, 1, 2, 3), decimate=decimate, header=header)
+    za_inc, az_inc = header.theta_inc * decimate, header.phi_inc * decimate
+    magnitude_type, freq_hz = header.magnitude_unit, header.freq_hz
 
     # Zenith angle and azimuth arrays
     za = np.sort(np.unique(uan_values[:, 0])).astype(int)
     az = np.sort(np.unique(uan_values[:, 1])).astype(int)
 
-    # Rescaling function
-    scale = no_change
+    # Grid index of every row; raises if a row falls outside the grid
+    flat_idx = np.ravel_multi_index((uan_values[:, 0].astype(int) // za_inc,
+                                     uan_values[:, 1].astype(int) // az_inc),
+                                    (za.size, az.size))
+    assert np.unique(flat_idx).size == flat_idx.size, \
+           "(za, az) grid has duplicate entries"
+    if decimate > 1:
+        assert np.all(uan_values[:, 0].astype(int) % za_inc == 0) \
+           and np.all(uan_values[:, 1].astype(int) % az_inc == 0), \
+               "rows are not ordered by zenith angle and azimuth"
+
+    # E-field magnitudes of the theta and phi polarizations
+    E_za = uan_values[:, 2]
+    E_az = uan_values[:, 3]
     if magnitude_type == "dB":
-        scale = dB_to_lin
-
-    # Unpack antenna pattern values
-    # (Naxes_vec, 1, Nfeeds or Npols, Nfreqs, Naxes2, Naxes1)
-    values = np.zeros((za.size, az.size))
-    for i in range(uan_values.shape[0]):
-        _za = int(uan_values[i, 0])
-        _az = int(uan_values[i, 1])
+        E_za = dB_to_lin(E_za)
+        E_az = dB_to_lin(E_az)
 
-        # E-field as complex number
-        E_za = polar_to_re_im(scale, uan_values[i, 2], uan_values[i, 4])
-        E_az = polar_to_re_im(scale, uan_values[i, 3], uan_values[i, 5])
-        assert values[_za//za_inc, _az//az_inc] == 0, \
-               "az='%s' already has a value" % str(_az)
+    # Convert E-field to power. The phase columns drop out of |E|^2, so the
+    # complex field never needs to be formed.
+    power = E_az**2 + E_za**2
 
-        # Convert E-field to power
-        values[_za//za_inc, _az//az_inc] = to_power((E_az, E_za))
-
-        # need to convert power to dB here
-        # dB = 10 * log10(Watts / Reference Power)
-        values[_za//za_inc, _az//az_inc] = 10 * np.log10(values[_za//za_inc, _az//az_inc])
+    # Unpack antenna pattern values, converting power to dB
+    # dB = 10 * log10(Watts / Reference Power)
+    values = np.zeros((za.size, az.size))
+    values.flat[flat_idx] = 10 * np.log10(power)
 
     # Check that array isn't blank
     assert np.min(values) != 0
     return freq_hz, za, az, values
 
 
-def load_uan_directory(path : str, suffix : str = ".uan") -> tuple[npt.ArrayLike, npt.ArrayLike, npt.ArrayLike, npt.ArrayLike]:
+UAN_CACHE_DIRNAME = ".uan_cache"
+UAN_CACHE_ARRAYS = ("beams", "freqs", "za", "az")
+
+
+def uan_cache_key(files : list[str]) -> str:
+    """
+    Hash the names, sizes and modification times of a set of UAN files.
+
+    Args:
+        files (list of str):
+            Paths of the files that make up one beam cube.
+
+    Returns:
+        key (str):
+            Hex digest that changes whenever a file is added, removed or modified.
+
+    """
+    h = hashlib.sha256()
+    for fname in sorted(files):
+        st = Path(fname).stat()
+        h.update(("%s %d %d\n" % (Path(fname).name, st.st_size, st.st_mtime_ns)).encode())
+    return h.hexdigest()
+
+
+def load_uan_cache(cache_dir : str, key : str) -> Optional[tuple[npt.ArrayLike, npt.ArrayLike, npt.ArrayLike, npt.ArrayLike]]:
+    """
+    Load a cached beam cube if its key matches, memory-mapping the beams.
+
+    Args:
+        cache_dir (str):
+            Directory written by `save_uan_cache`.
+        key (str):
+            Expected cache key, from `uan_cache_key`.
+
+    Returns:
+        cube (tuple or None):
+            `(beams, freqs, za, az)` as returned by `load_uan_directory`, with
+            `beams` a read-only memory map, or None if the cache is missing or stale.
+
+    """
+    cache_dir = Path(cache_dir)
+    try:
+        if (cache_dir / "key").read_text() != key:
+            return None
+        return tuple(np.load(cache_dir / (name + ".npy"), mmap_mode="r")
+                     for name in UAN_CACHE_ARRAYS)
+    except (OSError, ValueError):
+        return None
+
+
+def save_uan_cache(cache_dir : str, key : str, cube : tuple[npt.ArrayLike, npt.ArrayLike, npt.ArrayLike, npt.ArrayLike]) -> None:
+    """
+    Write a beam cube as `.npy` files that can be loaded with `np.load(mmap_mode='r')`.
+
+    The key is written last, so a partially written cache is never treated as valid.
+
+    Args:
+        cache_dir (str):
+            Directory to write to; created if needed.
+        key (str):
+            Cache key, from `uan_cache_key`.
+        cube (tuple):
+            `(beams, freqs, za, az)` as returned by `load_uan_directory`.
+
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    (cache_dir / "key").unlink(missing_ok=True)
+    for name, arr in zip(UAN_CACHE_ARRAYS, cube, strict=True):
+        tmp_path = cache_dir / (name + ".tmp.npy")
+        np.save(tmp_path, np.ascontiguousarray(arr))
+        tmp_path.replace(cache_dir / (name + ".npy"))
+    (cache_dir / "key.tmp").write_text(key)
+    (cache_dir / "key.tmp").replace(cache_dir / "key")
+
+
+def load_uan_directory(path : str, suffix : str = ".uan", *,
+                       cache : bool = False, workers : int = 1,
+                       decimate : int = 1) -> tuple[npt.ArrayLike, npt.ArrayLike, npt.ArrayLike, npt.ArrayLike]:
     """
     Load a series of UAN files from a directory, and pack into an array ordered by frequency.
 
@@ -245,6 +585,18 @@ def load_uan_directory(path : str, suffix : str = ".uan") -> tuple[npt.ArrayLike
             files for the same antenna at different frequencies.
         suffix (str):
             Suffix of the data files, e.g. '.uan'.
+        cache (bool):
+            If True, keep a binary copy of the packed arrays in a `.uan_cache`
+            subdirectory of `path` and reuse it while the names, sizes and
+            modification times of the UAN files are unchanged. Beams loaded
+            from the cache are a read-only memory map.
+        workers (int):
+            Number of processes used to parse the files. With 1 (default) the
+            files are parsed in this process.
+        decimate (int):
+            Keep every `decimate`-th zenith angle and azimuth, dropping the
+            other rows before they are parsed (see `read_uan`). Decimated
+            cubes are cached separately from the full cube.
 
     Returns:
         beams (array_like):
@@ -260,44 +612,132 @@ def load_uan_directory(path : str, suffix : str = ".uan") -> tuple[npt.ArrayLike
     # Get list of files
     files = glob.glob("%s/*%s" % (path, suffix))
 
+    # Reuse the cached cube if none of the files changed
+    if cache:
+        cache_dir = Path(path) / UAN_CACHE_DIRNAME
+        if decimate > 1:
+            cache_dir = cache_dir / ("decimate_%d" % decimate)
+        key = uan_cache_key(files)
+        cube = load_uan_cache(cache_dir, key)
+        if cube is not None:
+            return cube
+
+    # Order files by frequency from their headers, so each beam can be
+    # written straight to its final slot; the headers are not parsed again
+    files, _, headers = sort_uan_files(files)
+
     # Current az, za arrays
-    az, za = np.array([]), np.array([])
-
-    # Loop over files
-    freqs = []
-    beam_list = []
-    for fname in files:
-
-        # Load file
-        freq_hz, _za, _az, beam = load_uan(fname)
-
-        # Compare az/za arrays to make sure the ordering is the same
-        if az.size > 0:
-            assert np.all(za == _za), "za arrays don't match"
-            assert np.all(az == _az), "za arrays don't match"
-        az = _az
-        za  =_za
-
-        # Store frequencies and beams
-        freqs.append(freq_hz / 1e6) # convert to MHz
-        beam_list.append(beam)
-
-    # Re-order arrays
-    idxs = np.argsort(freqs)
-    beams = [beam_list[idx] for idx in idxs]
-    beams = np.array(beams)
+    beams, az, za = np.array([]), np.array([]), np.array([])
+    freqs = np.zeros(len(files))
+
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        args = (files, repeat(decimate), headers)
+        results = pool.map(load_uan, *args) if pool is not None else map(load_uan, *args)
+
+        # Loop over files
+        for i, (freq_hz, _za, _az, beam) in enumerate(results):
+
+            # Compare az/za arrays to make sure the ordering is the same
+            if i == 0:
+                beams = np.empty((len(files), *beam.shape))
+            else:
+                assert np.all(za == _za), "za arrays don't match"
+                assert np.all(az == _az), "az arrays don't match"
+            az = _az
+            za = _za
+
+            # Store frequencies and beams
+            freqs[i] = freq_hz / 1e6 # convert to MHz
+            beams[i] = beam
+
     freqs = np.unique(freqs)
+
+    if cache:
+        save_uan_cache(cache_dir, key, (beams, freqs, za, az))
     return beams, freqs, za, az
 
 
-def calculate_fitnesses(uan_directory_root : str) -> dict:
+def stream_beam_correction_factor(path : str, suffix : str = ".uan",
+                                  beam_ref_idx : Optional[int] = None,
+                                  ref_map_path : str=DEFAULT_REF_MAP_PATH,
+                                  location : EarthLocation = None,
+                                  obstime : Time = None,
+                                  sky_model : Optional[SkyModel] = None) -> tuple[npt.ArrayLike, npt.ArrayLike]:
+    """
+    Calculates the beam correction factor from a directory of UAN files, one file at a time.
+
+    The BCF only needs the integral of the beam and of the sky times the
+    beam at each frequency. The files are read by `calculate_beam_metrics`,
+    which adds each file's two integrals and drops the beam, so peak memory
+    does not grow with the number of frequencies. The result is the same as
+    `load_uan_directory` followed by `beam_correction_factor`, with each
+    pixel weighted by its solid angle (see `solid_angle_weights`).
+
+    Args:
+        path (str):
+            Path to directory of UAN files for one antenna, see `load_uan_directory`.
+        suffix (str):
+            Suffix of the data files, e.g. '.uan'.
+        beam_ref_idx (int):
+            Index of the reference frequency, in frequency order. Defaults to
+            the middle frequency, `Nfreqs // 2`.
+        ref_map_path (str):
+            Path to the Haslam 408 MHz map, see `beam_correction_factor`.
+        location (astropy.EarthLocation):
+            Location of the observer, see `beam_correction_factor`.
+        obstime (astropy.Time):
+            Time of the observation, or 1D array of times, see `beam_correction_factor`.
+        sky_model (SkyModel):
+            Already-loaded reference map, see `beam_correction_factor`.
+
+    Returns:
+        freqs (array_like):
+            Frequency of each beam, in MHz, in increasing order.
+        bcf (array_like):
+            Beam correction factor at each frequency, of shape `(Nfreqs,)`, or
+            `(Ntimes, Nfreqs)` for an array of times.
+
+    """
+    bcf = beam_metrics.BCFMetric()
+    beam_metrics.calculate_beam_metrics(path, [bcf], suffix=suffix, beam_ref_idx=beam_ref_idx,
+                                        ref_map_path=ref_map_path, location=location,
+                                        obstime=obstime, sky_model=sky_model)
+    return bcf.freqs, bcf.bcf
+
+
+def calculate_fitnesses(uan_directory_root : str, *, cache : bool = False,
+                        sky_model : Optional[SkyModel] = None,
+                        streaming : bool = False,
+                        obstime : Time = None,
+                        decimate : Optional[int] = None,
+                        nside : Optional[int] = None) -> dict:
     """
     Calculates fitness values (on all objectives).
 
+    Every pixel of the (za, az) grid is weighted by its solid angle, so the
+    full-resolution, decimated, HEALPix and streaming paths all integrate
+    the beams over the sphere in the same way.
+
     Args:
         uan_directory_root (str): Path to directory. This directory is assumed to
             contain a collection of uan files for the same antenna at
             different frequencies.
+        cache (bool): Reuse/keep a binary copy of the loaded beams, see
+            `load_uan_directory`.
+        sky_model (SkyModel): Reference sky shared between calls, see
+            `beam_correction_factor`.
+        streaming (bool): Read one UAN file at a time and never hold the
+            full beam cube, see `calculate_beam_metrics`. Cannot be
+            combined with `cache`.
+        obstime (astropy.Time): Time of the observation, see
+            `beam_correction_factor`. For a 1D array of times (a drift scan),
+            the statistics of each time are averaged over all times.
+        decimate (int): Evaluate the beams at a lower resolution, keeping every
+            `decimate`-th zenith angle and azimuth. The other rows of the UAN
+            files are never parsed. Cannot be combined with `nside`.
+        nside (int): Evaluate the beams at a lower resolution, resampled onto
+            HEALPix pixels at this `nside`. These have equal areas, so need
+            no weights.
 
     Returns:
         bcf_statistics (dict): a dictionary where keys are statistic names and
@@ -305,13 +745,29 @@ def calculate_fitnesses(uan_directory_root : str) -> dict:
             functions)
 
     """
+    if decimate is not None and nside is not None:
+        raise ValueError("Only one of decimate and nside can be given")
+    if streaming:
+        if cache:
+            raise ValueError("cache stores the full beam cube and cannot be used with streaming")
+        if decimate is not None or nside is not None:
+            raise ValueError("streaming evaluates the full-resolution beams only")
+        return beam_metrics.calculate_beam_metrics(uan_directory_root, ["bcf"], sky_model=sky_model, obstime=obstime)
+
     # freq_hz, za, az, values = load_uan("uan_files/0_uan_files/0/0_0_1.uan")
 
     # beams, freqs, za, az = load_uan_directory("uan_files/0_uan_files/1")
-    beams, freqs, za, az = load_uan_directory(uan_directory_root)
-
-    alt = 90-za              # Get altitude and work off that
-    az_grid, alt_grid = np.meshgrid(az, alt)
+    beams, freqs, za, az = load_uan_directory(uan_directory_root, cache=cache, decimate=decimate or 1)
+
+    # Optionally move to a coarser grid; HEALPix pixels have equal areas
+    pixel_weights = None
+    if nside is not None:
+        beams, alt_pix, az_pix = resample_to_healpix(beams, za, az, nside)
+    else:
+        pixel_weights = solid_angle_weights(za, az)
+        alt = 90-za              # Get altitude and work off that
+        az_grid, alt_grid = np.meshgrid(az, alt)
+        alt_pix, az_pix = alt_grid.flatten(), az_grid.flatten()
 
     # beams = beams[:, :180, :360]
 
@@ -319,52 +775,49 @@ def calculate_fitnesses(uan_directory_root : str) -> dict:
 
     # Calculate beam correction factor
     bcf = beam_correction_factor(beam_power_db=beams,
-                                beam_alt_deg=alt_grid.flatten(),
-                                beam_az_deg=az_grid.flatten(),
+                                beam_alt_deg=alt_pix,
+                                beam_az_deg=az_pix,
                                 beam_freqs_MHz=freqs,
                                 beam_ref_idx=freqs.size//2,
+                                obstime=obstime,
+                                sky_model=sky_model,
+                                pixel_weights=pixel_weights,
                                 )
 
-    return calculate_bcf_stats(freqs, bcf)
+    return time_averaged_bcf_stats(freqs, bcf)
 
 
-def make_plots(uan_directory_root : str) -> None:
+def make_plots(uan_directory_root : str, *, cache : bool = False,
+               sky_model : Optional[SkyModel] = None) -> None:
     """
     Makes plots of the beam power and beam correction factor.
 
+    The files are read once, by `calculate_beam_metrics`, keeping only the
+    first beam and the BCF.
+
     Args:
         uan_directory_root (str): Path to directory. This directory is assumed to
             contain a collection of uan files for the same antenna at
             different frequencies.
+        cache (bool): Reuse/keep a binary copy of the loaded beams, see
+            `load_uan_directory`, so re-plotting does not parse the files again.
+        sky_model (SkyModel): Reference sky, see `beam_correction_factor`.
 
     """
-    beams, freqs, za, az = load_uan_directory(uan_directory_root)
-
-    alt = 90-za              # Get altitude and work off that
-    az_grid, alt_grid = np.meshgrid(az, alt)
-
-    # beams = beams[:, :180, :360]
-
-    print(beams.shape)
-
-    # Calculate beam correction factor
-    bcf = beam_correction_factor(beam_power_db=beams,
-                                beam_alt_deg=alt_grid.flatten(),
-                                beam_az_deg=az_grid.flatten(),
-                                beam_freqs_MHz=freqs,
-                                beam_ref_idx=freqs.size//2,
-                                )
+    bcf = beam_metrics.BCFMetric()
+    first_beam = beam_metrics.BeamSnapshot(0)
+    beam_metrics.calculate_beam_metrics(uan_directory_root, [bcf, first_beam], sky_model=sky_model, cache=cache)
 
     plt.figure(figsize=(10, 4))
     plt.subplot(121)
-    plt.matshow(beams[0], vmax=20., vmin=-50., fignum=False, aspect="auto")
+    plt.matshow(first_beam.beam_db, vmax=20., vmin=-50., fignum=False, aspect="auto")
     cbar = plt.colorbar()
     plt.xlabel("Azimuth [deg]")
     plt.ylabel("Altitude [deg]")
     cbar.set_label("Beam power [dB]")
 
     plt.subplot(122)
-    plt.plot(freqs, bcf)
+    plt.plot(bcf.freqs, bcf.bcf)
     plt.xlabel("Freq. [MHz]")
     plt.ylabel("BCF")
     plt.tight_layout()
@@ -4,7 +4,10 @@ Class for constructing an antenna Genotype and acting upon it.
 This module provides:
 - generate: randomly generates a new Genotype
 - mutate: mutates the Genotype
+- canonical_hash: stable, optionally quantized, hash of the Genotype's genes
 """
+import hashlib
+import json
 import random
 from typing import Optional
 
@@ -73,6 +76,57 @@ class Genotype:
         self.waveguide_width = waveguide_width
         self.walls = walls
 
+    def genes(self) -> tuple:
+        """
+        Genotype genes.
+
+        The values that define the antenna, in a fixed order. Two Genotypes
+        are equal, and hash the same, if their genes are equal.
+
+        :return: The horn genes followed by the genes of each WallPair.
+        :rtype: tuple
+        """
+        walls = () if self.walls is None else tuple(wp.genes() for wp in self.walls)
+        return (self.flare_length, self.waveguide_height,
+                self.waveguide_length, self.waveguide_width, walls)
+
+    def __eq__(self, other: object) -> bool:
+        """Whether two Genotypes have the same genes."""
+        if not isinstance(other, Genotype):
+            return NotImplemented
+        return self.genes() == other.genes()
+
+    def __hash__(self) -> int:
+        """Hash of the Genotype's genes. Changes if the Genotype is mutated."""
+        return hash(self.genes())
+
+    def canonical_hash(self, quantum: Optional[float] = None) -> str:
+        """
+        Canonical hash.
+
+        A hash of the Genotype's genes that is the same in every process and
+        run, e.g. to key a persistent cache. With `quantum`, each gene is
+        rounded to a multiple of it first, so near-identical Genotypes share
+        a hash.
+
+        :param quantum: The resolution genes are rounded to, or None to use
+        the exact values.
+        :type quantum: float, optional
+        :return: Hex digest of the genes.
+        :rtype: str
+        """
+        def canonical(value: object) -> object:
+            if isinstance(value, tuple):
+                return [canonical(v) for v in value]
+            if isinstance(value, float) and quantum is not None:
+                return round(value / quantum)
+            if isinstance(value, float):
+                return value.hex()
+            return value
+
+        payload = json.dumps(canonical(self.genes()))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
     def generate_with_ridge(self, rand: random.Random) -> "Genotype":
         """
         Generate random Genotype with ridge.
@@ -1,30 +1,44 @@
 """Class for managing the evolution of a population of antennas."""
+import copy
+import multiprocessing
 import pathlib
+import queue
 import random
 
 from src.GENETIS_RHINO.analysis import Analysis
-from src.GENETIS_RHINO.evolver import NSGA2
+from src.GENETIS_RHINO.evolver import NSGA2, ColumnarNSGA2, SteadyStateNSGA2, select_survivors
+from src.GENETIS_RHINO.fitness_evaluators import make_fitness_evaluator
 from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.migration import migration_targets, receive_migrants, select_migrants
 from src.GENETIS_RHINO.parameters import ParametersObject
 from src.GENETIS_RHINO.phenotype import Phenotype
+from src.GENETIS_RHINO.surrogate import make_surrogate
 
 
 class Manager:
     """Manager class."""
 
-    def __init__(self, cfg: ParametersObject) -> None:
-        """Constructor."""
+    def __init__(self, cfg: ParametersObject, island_idx: int = 0) -> None:
+        """Constructor; in island mode each island has its own Manager, see `run_islands`."""
         self.seed = cfg.random_num_seed
-        self.rand = random.Random(self.seed)
+        self.island_idx = island_idx
+        # every island draws from its own stream; island 0 matches a single-population run
+        self.rand = random.Random(self.seed if island_idx == 0 else f"{self.seed}/island{island_idx}")
 
         self.population = []
 
+        # import fitness evaluator
+        self.fitness_evaluator = make_fitness_evaluator(cfg)
+
         # import selection scheme
         selection_scheme_convert_dict = {
             "NSGAII": NSGA2,
+            "SteadyStateNSGAII": SteadyStateNSGA2,
+            "ColumnarNSGAII": ColumnarNSGA2,
         }
         if cfg.selection_scheme in selection_scheme_convert_dict:
-            self.selection_scheme = selection_scheme_convert_dict[cfg.selection_scheme]()
+            self.selection_scheme = selection_scheme_convert_dict[cfg.selection_scheme](
+                self.fitness_evaluator, make_surrogate(cfg), cfg.non_dominated_sort)
             return
         raise ValueError("Invalid selection scheme")
 
@@ -32,7 +46,8 @@ class Manager:
         """
         Generate a random population.
 
-        Generates a new population of randomly generated Phenotypes.
+        Generates a new population of randomly generated Phenotypes, and
+        scores them all in one batch.
 
         :param cfg: Configuration object.
         :type cfg: ParametersObject
@@ -51,7 +66,7 @@ class Manager:
             # create new random Genotype with 4 sides
             g = Genotype(cfg).generate_with_ridge(self.rand)
 
-            # assign phenotype to genotype
+            # assign phenotype to genotype, its fitness is pending
             p = Phenotype(g, str(individual), "None", initial_generation_num)
 
             # append phenotype to population
@@ -62,12 +77,15 @@ class Manager:
             # create new random Genotype with 4 sides
             g = Genotype(cfg).generate_without_ridge(self.rand)
 
-            # assign phenotype to genotype
+            # assign phenotype to genotype, its fitness is pending
             p = Phenotype(g, str(individual), "None", initial_generation_num)
 
             # append phenotype to population
             self.population.append(p)
 
+        # score the whole population at once
+        self.population = self.selection_scheme.evaluate(self.population)
+
     def evolve_one_gen(self, generation_num: int) -> None:
         """
         Evolve population for one generation.
@@ -84,11 +102,129 @@ class Manager:
                                                     generation_num, self.rand)
         self.population = next_gen_pop
 
+    def add_immigrants(self, immigrants: list[Phenotype]) -> None:
+        """
+        Merge individuals from other islands into the population.
+
+        The population keeps its size: the immigrants compete with the
+        residents by rank and crowding distance.
+
+        :param immigrants: Evaluated Phenotypes from other islands.
+        :type immigrants: list[Phenotype]
+        :rtype: None
+        """
+        self.population = select_survivors(list(self.population) + immigrants, len(self.population),
+                                           self.selection_scheme.sort_algorithm)
+
+
+def island_config(cfg: ParametersObject, island_idx: int) -> ParametersObject:
+    """
+    A copy of the config for one island, which runs its simulations in `<simulation_run_dir>/island<i>`.
+
+    :param cfg: Configuration object; it is left unchanged.
+    :type cfg: ParametersObject
+    :param island_idx: The island's index.
+    :type island_idx: int
+    :rtype: ParametersObject
+    """
+    island_cfg = copy.copy(cfg)
+    island_cfg.simulation_run_dir = str(pathlib.Path(cfg.simulation_run_dir) / f"island{island_idx}")
+    return island_cfg
+
+
+def run_island(cfg: ParametersObject, island_idx: int, inboxes: list, results: multiprocessing.Queue) -> None:
+    """
+    Evolve one island, exchanging migrants with its neighbours, in its own process.
+
+    Every `cfg.migration_interval` generations, the island sends its best
+    `cfg.num_migrants` non-dominated individuals to the islands given by
+    `cfg.migration_topology`, and merges in those it receives. Each island
+    writes its own `island<i>_` CSV files, and runs its simulations in
+    `<simulation_run_dir>/island<i>`.
+
+    :param cfg: Configuration object.
+    :type cfg: ParametersObject
+    :param island_idx: The island's index.
+    :type island_idx: int
+    :param inboxes: The migration queue of every island.
+    :type inboxes: list[multiprocessing.Queue]
+    :param results: Queue the final `(island_idx, population)` is put on.
+    :type results: multiprocessing.Queue
+    :rtype: None
+    """
+    cfg = island_config(cfg, island_idx)
+    manager = Manager(cfg, island_idx)
+    manager.initialize_population(cfg)
+
+    targets = migration_targets(cfg.migration_topology, cfg.num_islands)
+    sources = [i for i, t in enumerate(targets) if island_idx in t]
+    pending = []
+
+    for generation_num in range(1, int(cfg.num_generations)):
+        manager.evolve_one_gen(generation_num)
+
+        if generation_num % cfg.migration_interval == 0 and sources:
+            migrants = select_migrants(manager.population, cfg.num_migrants)
+            for target in targets[island_idx]:
+                inboxes[target].put((island_idx, generation_num, migrants))
+            manager.add_immigrants(receive_migrants(inboxes[island_idx], pending, sources, generation_num))
+
+        Analysis(manager.population, f"island{island_idx}_").update(generation_num)
+
+    manager.selection_scheme.close()
+    results.put((island_idx, manager.population))
+
+
+def run_islands(cfg: ParametersObject) -> list[list[Phenotype]]:
+    """
+    Evolve `cfg.num_islands` populations in parallel processes, see `run_island`.
+
+    :param cfg: Configuration object.
+    :type cfg: ParametersObject
+    :raises RuntimeError: If an island's process fails.
+    :return: The final population of each island.
+    :rtype: list[list[Phenotype]]
+    """
+    migration_targets(cfg.migration_topology, cfg.num_islands)  # validate before starting
+
+    ctx = multiprocessing.get_context("spawn")
+    inboxes = [ctx.Queue() for _ in range(cfg.num_islands)]
+    results = ctx.Queue()
+    processes = [ctx.Process(target=run_island, args=(cfg, i, inboxes, results), name=f"island{i}")
+                 for i in range(cfg.num_islands)]
+    for process in processes:
+        process.start()
+
+    populations = [None] * cfg.num_islands
+    try:
+        for _ in range(cfg.num_islands):
+            while True:
+                try:
+                    island_idx, population = results.get(timeout=1.)
+                    break
+                except queue.Empty:
+                    failed = [p for p in processes if p.exitcode not in (None, 0)]
+                    if failed:
+                        raise RuntimeError(f"Island process {failed[0].name} failed "
+                                           f"with exit code {failed[0].exitcode}") from None
+            populations[island_idx] = population
+    finally:
+        for i, process in enumerate(processes):
+            if populations[i] is None:
+                process.terminate()
+            process.join()
+    return populations
+
+
 def main() -> None:
     """Main function."""
     # 0. Initialize manager
     cfg = ParametersObject(str(pathlib.Path(
         __file__).parent.parent/"GENETIS_RHINO/config.toml"))
+    if cfg.num_islands > 1:
+        run_islands(cfg)
+        return
+
     manager = Manager(cfg)
 
     num_generations = int(cfg.num_generations)
@@ -105,6 +241,8 @@ def main() -> None:
         # 3. Analyzer collects data on current state of population (to process and write to file)
         Analysis(manager.population).update(generation_num)
 
+    manager.selection_scheme.close()
+
 
 if __name__ == "__main__":
     main()
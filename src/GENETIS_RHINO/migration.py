@@ -0,0 +1,97 @@
+"""
+Migration of individuals between the islands of an island-model run.
+
+In island mode (see `manager.run_islands`), several populations evolve
+independently, each in its own process. Every `migration_interval`
+generations, each island sends copies of its best non-dominated individuals
+to its neighbours, which merge them into their own populations. Islands only
+wait for the neighbours they receive from, and only when migrating.
+
+This module provides:
+- migration_targets: which islands each island sends migrants to
+- select_migrants: the least crowded individuals of the first front
+- receive_migrants: collects one migration's individuals from an island's inbox
+"""
+from queue import Queue
+
+from src.GENETIS_RHINO.phenotype import Phenotype
+
+
+def migration_targets(topology: str, num_islands: int) -> list[list[int]]:
+    """
+    Which islands each island sends migrants to.
+
+    :param topology: `"ring"`, where island i sends to island i + 1 (and the
+    last to the first), or `"fully_connected"`, where every island sends to
+    every other.
+    :type topology: str
+    :param num_islands: The number of islands.
+    :type num_islands: int
+    :return: The destination islands of each island.
+    :rtype: list[list[int]]
+    """
+    if num_islands < 1:
+        raise ValueError("num_islands must be greater than zero.")
+    if topology == "ring":
+        return [[(i + 1) % num_islands] if num_islands > 1 else [] for i in range(num_islands)]
+    if topology == "fully_connected":
+        return [[j for j in range(num_islands) if j != i] for i in range(num_islands)]
+    raise ValueError("Invalid migration topology")
+
+
+def select_migrants(population: list[Phenotype], num_migrants: int) -> list[Phenotype]:
+    """
+    The best non-dominated individuals of a ranked population.
+
+    :param population: Phenotypes with NSGA-II ranks and crowding distances assigned.
+    :type population: list[Phenotype]
+    :param num_migrants: The maximum number of migrants.
+    :type num_migrants: int
+    :return: Up to `num_migrants` individuals of the first front, least crowded first.
+    :rtype: list[Phenotype]
+    """
+    first_front = [indiv for indiv in population if indiv.nsgaii_rank == 0]
+    first_front.sort(key=lambda indiv: indiv.nsgaii_distance, reverse=True)
+    return first_front[:num_migrants]
+
+
+def receive_migrants(inbox: Queue, pending: list, sources: list[int],
+                     generation_num: int) -> list[Phenotype]:
+    """
+    Wait for the migrants sent by every source island at one generation.
+
+    Messages are `(source, generation_num, migrants)` tuples. A neighbour
+    that is ahead may already have sent the migrants of a later generation;
+    those are kept in `pending` for the next call. The ID of each migrant
+    bred on its source island is prefixed with that island, e.g. `"2:137"`;
+    migrants that had already migrated keep their qualified ID.
+
+    :param inbox: The island's queue of messages.
+    :type inbox: multiprocessing.Queue
+    :param pending: Messages received early, updated in place.
+    :type pending: list[tuple]
+    :param sources: The islands that send to this one.
+    :type sources: list[int]
+    :param generation_num: The generation of the migration.
+    :type generation_num: int
+    :return: The migrants of all sources, in order of source island.
+    :rtype: list[Phenotype]
+    """
+    received = {}
+    while True:
+        for message in list(pending):
+            source, sent_at, migrants = message
+            if sent_at == generation_num:
+                received[source] = migrants
+                pending.remove(message)
+        if all(source in received for source in sources):
+            break
+        pending.append(inbox.get())
+
+    immigrants = []
+    for source in sorted(received):
+        for indiv in received[source]:
+            if ":" not in str(indiv.indiv_id):
+                indiv.indiv_id = f"{source}:{indiv.indiv_id}"
+            immigrants.append(indiv)
+    return immigrants
@@ -13,6 +13,33 @@ known_parameters = {
     "mut_effect_size": float,
     "selection_scheme": str,
     "percent_no_ridge_at_start": float,
+    "non_dominated_sort": str,
+    "num_islands": int,
+    "migration_interval": int,
+    "num_migrants": int,
+    "migration_topology": str,
+    "fitness_evaluator": str,
+    "uan_directory_root": str,
+    "fitness_cache_path": str,
+    "fitness_cache_max_entries": int,
+    "fitness_cache_quantum": float,
+    "low_fidelity_evaluator": str,
+    "low_fidelity_decimate": int,
+    "promote_fronts": int,
+    "simulator_command": str,
+    "simulation_run_dir": str,
+    "max_simulation_jobs": int,
+    "simulation_timeout": float,
+    "simulation_retries": int,
+    "simulation_backend": str,
+    "slurm_chunk_size": int,
+    "sbatch_command": str,
+    "squeue_command": str,
+    "slurm_poll_interval": float,
+    "slurm_max_failed_polls": int,
+    "surrogate_pool_factor": float,
+    "surrogate_min_archive": int,
+    "surrogate_max_archive": int,
     "NUM_WALL_PAIRS": int,
     "MIN_FLARE_LENGTH": float,
     "MAX_FLARE_LENGTH": float,
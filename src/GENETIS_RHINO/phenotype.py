@@ -3,9 +3,16 @@ import copy
 import random
 from typing import Optional
 
-from src.GENETIS_RHINO.dummy_fitness_func import DummyFitnessFunc
 from src.GENETIS_RHINO.genotype import Genotype
 
+# Fidelities of fitness scores, higher is more accurate
+LOW_FIDELITY = 0
+FULL_FIDELITY = 1
+
+
+class PendingFitnessError(RuntimeError):
+    """Raised when the fitness scores of an individual are used before they have been evaluated."""
+
 
 class Phenotype:
     """
@@ -14,6 +21,18 @@ class Phenotype:
     A wrapper for the Genotype class representing an individual antenna's
     phenotype.
 
+    An individual's fitness is pending until it is set, usually by a fitness
+    evaluator scoring a whole generation at once (see
+    `AbstractFitnessEvaluator.evaluate_pending`). Reading the fitness scores
+    of a pending individual raises a PendingFitnessError.
+
+    Fitness scores may be held at several fidelities, e.g. from a cheap
+    low-fidelity evaluation and later a full one. `fitness_scores` are the
+    scores at the highest fidelity evaluated, `fitness_fidelity`.
+
+    An evaluation can fail, e.g. when the simulation crashes; the fitness
+    then stays pending and `failed_evaluations` counts the failures.
+
     :param genotype: a Genotype instance.
     :type genotype: Genotype
     :param indiv_id: The individual's unique ID.
@@ -22,12 +41,15 @@ class Phenotype:
     :type parent1_id: str, optional
     :param generation_created: Which generation the individual was created.
     :type generation_created: int, optional
+    :param fitness_scores: The individual's fitness scores.
+    :type fitness_scores: dict, optional
     """
 
     def __init__(self, genotype: Genotype,
                  indiv_id: Optional[str],
                  parent1_id: Optional[str],
-                 generation_created: Optional[int]) -> None:
+                 generation_created: Optional[int],
+                 fitness_scores: Optional[dict] = None) -> None:
         """
         Phenotype constructor.
 
@@ -41,13 +63,76 @@ class Phenotype:
         :type parent1_id: str, optional
         :param generation_created: Which generation the individual was created.
         :type generation_created: int, optional
+        :param fitness_scores: The individual's full-fidelity fitness
+        scores, e.g. from a batch fitness evaluator. Defaults to pending.
+        :type fitness_scores: dict, optional
         :rtype: None
         """
         self.genotype = genotype
         self.indiv_id = indiv_id
         self.parent1_id = parent1_id
         self.generation_created = generation_created
-        self.fitness_scores = DummyFitnessFunc(genotype).get_fitness_scores()
+        self.fitness_scores = fitness_scores
+        self.failed_evaluations = 0
+
+    @property
+    def fitness_pending(self) -> bool:
+        """Whether the individual's fitness has yet to be evaluated."""
+        return not self._fitness
+
+    @property
+    def fitness_fidelity(self) -> Optional[int]:
+        """The highest fidelity the individual has been evaluated at, or None if pending."""
+        return max(self._fitness) if self._fitness else None
+
+    @property
+    def fitness_fidelities(self) -> list[int]:
+        """Every fidelity the individual has been evaluated at."""
+        return sorted(self._fitness)
+
+    @property
+    def fitness_scores(self) -> dict:
+        """
+        The individual's fitness scores, at the highest fidelity evaluated.
+
+        :raises PendingFitnessError: If the fitness has not been evaluated yet.
+        :rtype: dict
+        """
+        if not self._fitness:
+            raise PendingFitnessError(f"Fitness of individual {self.indiv_id} has not been evaluated yet; "
+                                      "evaluate pending individuals with a fitness evaluator first.")
+        return self._fitness[max(self._fitness)]
+
+    @fitness_scores.setter
+    def fitness_scores(self, fitness_scores: Optional[dict]) -> None:
+        """Set the individual's full-fidelity fitness scores, or None to mark them pending."""
+        self._fitness = {} if fitness_scores is None else {FULL_FIDELITY: fitness_scores}
+
+    def set_fitness(self, fitness_scores: dict, fidelity: int = FULL_FIDELITY) -> None:
+        """
+        Set the individual's fitness scores at one fidelity, keeping those at other fidelities.
+
+        :param fitness_scores: The fitness scores.
+        :type fitness_scores: dict
+        :param fidelity: The fidelity they were evaluated at.
+        :type fidelity: int
+        :rtype: None
+        """
+        self._fitness[fidelity] = fitness_scores
+
+    def fitness_at(self, fidelity: int) -> dict:
+        """
+        The individual's fitness scores at one fidelity.
+
+        :param fidelity: The fidelity.
+        :type fidelity: int
+        :raises PendingFitnessError: If the individual has not been evaluated at that fidelity.
+        :rtype: dict
+        """
+        if fidelity not in self._fitness:
+            raise PendingFitnessError(f"Fitness of individual {self.indiv_id} has not been evaluated "
+                                      f"at fidelity {fidelity}.")
+        return self._fitness[fidelity]
 
     def make_offspring(self, new_id: str, generation_num: int,
                        rand: random.Random) -> "Phenotype":
@@ -55,6 +140,7 @@ class Phenotype:
         Make offspring.
 
         Makes an offspring from the individual Phenotype this is called on.
+        Only the genotype is copied; the offspring's fitness is pending.
 
         :param new_id: The new individual's unique ID.
         :type new_id: str
@@ -62,20 +148,12 @@ class Phenotype:
         :type generation_num: int
         :param rand: Random number generator object.
         :type rand: random.Random
-        :rtype: None
+        :rtype: Phenotype
         """
-        # make a copy of parent 1 to be the offspring
-        offspring = copy.deepcopy(self)
-
-        # set fields for new individual
-        offspring.parent1_id = self.indiv_id
-        offspring.indiv_id = new_id
-        offspring.generation_created = generation_num
+        # make a copy of parent 1's genotype for the offspring
+        offspring = Phenotype(copy.deepcopy(self.genotype), new_id,
+                              self.indiv_id, generation_num)
 
         # mutate offspring
         offspring.genotype.mutate(rand)
-
-        # calc new fitness score  TODO Replace with actual fitness calc
-        offspring.fitness_scores = DummyFitnessFunc(
-            offspring.genotype).get_fitness_scores()
         return offspring
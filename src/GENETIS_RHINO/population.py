@@ -0,0 +1,619 @@
+"""
+Struct-of-arrays container for a population of individuals.
+
+A list of Phenotypes holds each individual as a tree of small objects: a
+Genotype with its WallPairs, a dict of fitness scores per fidelity, and the
+NSGA-II attributes set by the sorter. Ranking, selection and mutation then
+spend most of their time on attribute and dict lookups. A Population holds
+the same data as one NumPy array per field, with one row per individual,
+and does those steps on whole columns:
+
+- genes: `(N, G)`, the horn genes followed by the genes of each WallPair,
+  laid out as in `surrogate.genotype_features` (has_ridge as 0 or 1)
+- fitness: for each fidelity, the objectives and an `(N, M)` score matrix,
+  with a mask of the rows evaluated at it
+- rank, distance: NSGA-II rank (-1 until sorted) and crowding distance
+- ids, parent_ids, generation_created, failed_evaluations
+
+Code written for Phenotypes can still use a Population: indexing or
+iterating over it gives PhenotypeView objects, which read and write its
+rows through the Phenotype interface, e.g. for fitness evaluators.
+
+This module provides:
+- gene_names: the names of the gene columns
+- FitnessColumns: the scores of a population at one fidelity
+- Population: the container, with column-wise sorting, crowding distance,
+  tournament selection, mutation and truncation
+- PhenotypeView: one row of a Population, as a Phenotype
+"""
+import random
+from collections.abc import Iterator
+from typing import NamedTuple, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.parameters import ParametersObject
+from src.GENETIS_RHINO.phenotype import FULL_FIDELITY, PendingFitnessError, Phenotype
+from src.GENETIS_RHINO.ranking import crowding_distances, non_dominated_front_rows
+from src.GENETIS_RHINO.surrogate import genotype_features
+from src.GENETIS_RHINO.wall_pair import WallPair
+
+HORN_GENES = ("flare_length", "waveguide_height", "waveguide_length", "waveguide_width")
+WALL_GENES = ("has_ridge", "angle", "ridge_height", "ridge_width_top", "ridge_width_bottom",
+              "ridge_thickness_top", "ridge_thickness_bottom")
+
+
+def gene_names(cfg: ParametersObject) -> list[str]:
+    """
+    The names of the gene columns of a Population.
+
+    :param cfg: Configuration object.
+    :type cfg: ParametersObject
+    :return: The horn genes, then e.g. `"wp0_angle"` for the genes of each WallPair.
+    :rtype: list[str]
+    """
+    return list(HORN_GENES) + [f"wp{w}_{gene}" for w in range(int(cfg.NUM_WALL_PAIRS)) for gene in WALL_GENES]
+
+
+class FitnessColumns(NamedTuple):
+    """The fitness scores of a population at one fidelity."""
+
+    objectives: list[str]   # the names of the score columns
+    evaluated: np.ndarray   # (N,) whether each row has been evaluated at this fidelity
+    scores: np.ndarray      # (N, M) the scores, NaN for rows not evaluated
+
+
+class Population:
+    """
+    A population of individuals stored as columns.
+
+    :param cfg: Configuration object, for the gene bounds and mutation rates.
+    :type cfg: ParametersObject
+    :param genes: The genes of each individual, of shape `(N, G)`, see `gene_names`.
+    :type genes: array_like
+    :param ids: The individuals' unique IDs.
+    :type ids: list[str]
+    :param parent_ids: The individuals' parents' IDs.
+    :type parent_ids: list[str], optional
+    :param generation_created: Which generation each individual was created.
+    :type generation_created: list[int], optional
+    """
+
+    def __init__(self, cfg: ParametersObject, genes: npt.ArrayLike, ids: list,
+                 parent_ids: Optional[list] = None, generation_created: Optional[list] = None) -> None:
+        """
+        Population constructor.
+
+        Every individual starts with pending fitness, no rank and no
+        crowding distance.
+
+        :param cfg: Configuration object.
+        :type cfg: ParametersObject
+        :param genes: The genes of each individual, of shape `(N, G)`.
+        :type genes: array_like
+        :param ids: The individuals' unique IDs.
+        :type ids: list[str]
+        :param parent_ids: The individuals' parents' IDs.
+        :type parent_ids: list[str], optional
+        :param generation_created: Which generation each individual was created.
+        :type generation_created: list[int], optional
+        :rtype: None
+        """
+        self.cfg = cfg
+        self.gene_names = gene_names(cfg)
+        n = len(ids)
+        self.genes = np.asarray(genes, dtype=float).reshape(n, len(self.gene_names))
+        self.ids = np.array(ids, dtype=object)
+        self.parent_ids = np.array([None] * n if parent_ids is None else parent_ids, dtype=object)
+        self.generation_created = np.array([None] * n if generation_created is None else generation_created,
+                                           dtype=object)
+        self.failed_evaluations = np.zeros(n, dtype=int)
+        self.fitness: dict[int, FitnessColumns] = {}
+        self.rank = np.full(n, -1)
+        self.distance = np.full(n, np.nan)
+
+        # Gene bounds, e.g. MIN_ANGLE and MAX_ANGLE; has_ridge is a switch, never mutated
+        self.mutable = np.array([not name.endswith("has_ridge") for name in self.gene_names])
+        self.lower = np.zeros(len(self.gene_names))
+        self.upper = np.ones(len(self.gene_names))
+        for i, name in enumerate(self.gene_names):
+            if self.mutable[i]:
+                gene = name.split("_", 1)[1] if name.startswith("wp") else name
+                self.lower[i] = float(getattr(cfg, "MIN_" + gene.upper()))
+                self.upper[i] = float(getattr(cfg, "MAX_" + gene.upper()))
+
+    @classmethod
+    def from_phenotypes(cls, phenotypes: list, cfg: Optional[ParametersObject] = None) -> "Population":
+        """
+        Pack Phenotypes into columns, keeping their fitness, ranks and distances.
+
+        :param phenotypes: The individuals, e.g. Phenotypes or PhenotypeViews.
+        :type phenotypes: list[Phenotype]
+        :param cfg: Configuration object; defaults to that of the first Genotype.
+        :type cfg: ParametersObject, optional
+        :rtype: Population
+        """
+        if cfg is None:
+            cfg = phenotypes[0].genotype.cfg
+        n = len(phenotypes)
+        population = cls(cfg, [genotype_features(p.genotype) for p in phenotypes] if n else np.empty(0),
+                         [p.indiv_id for p in phenotypes], [p.parent1_id for p in phenotypes],
+                         [p.generation_created for p in phenotypes])
+        for row, p in enumerate(phenotypes):
+            population.failed_evaluations[row] = p.failed_evaluations
+            for fidelity in p.fitness_fidelities:
+                population.set_fitness(row, p.fitness_at(fidelity), fidelity)
+            population.rank[row] = getattr(p, "nsgaii_rank", -1)
+            population.distance[row] = getattr(p, "nsgaii_distance", np.nan)
+        return population
+
+    @classmethod
+    def concat(cls, populations: list["Population"]) -> "Population":
+        """
+        Stack populations with the same config into one.
+
+        :param populations: The populations, in order.
+        :type populations: list[Population]
+        :raises ValueError: If they have different objectives at the same fidelity.
+        :rtype: Population
+        """
+        merged = cls(populations[0].cfg, np.concatenate([p.genes for p in populations]),
+                     np.concatenate([p.ids for p in populations]).tolist(),
+                     np.concatenate([p.parent_ids for p in populations]).tolist(),
+                     np.concatenate([p.generation_created for p in populations]).tolist())
+        merged.failed_evaluations = np.concatenate([p.failed_evaluations for p in populations])
+        merged.rank = np.concatenate([p.rank for p in populations])
+        merged.distance = np.concatenate([p.distance for p in populations])
+        for fidelity in sorted(set().union(*(p.fitness for p in populations))):
+            objectives = next(p.fitness[fidelity].objectives for p in populations if fidelity in p.fitness)
+            evaluated, scores = [], []
+            for p in populations:
+                columns = p.fitness.get(fidelity)
+                if columns is None:
+                    columns = FitnessColumns(objectives, np.zeros(len(p), dtype=bool),
+                                             np.full((len(p), len(objectives)), np.nan))
+                elif columns.objectives != objectives:
+                    raise ValueError(f"Populations have different objectives at fidelity {fidelity}")
+                evaluated.append(columns.evaluated)
+                scores.append(columns.scores)
+            merged.fitness[fidelity] = FitnessColumns(objectives, np.concatenate(evaluated), np.concatenate(scores))
+        return merged
+
+    def take(self, rows: npt.ArrayLike) -> "Population":
+        """
+        A new population of some of the rows, in the given order.
+
+        :param rows: Row indices.
+        :type rows: array_like
+        :rtype: Population
+        """
+        rows = np.asarray(rows, dtype=int)
+        taken = Population(self.cfg, self.genes[rows], self.ids[rows].tolist(),
+                           self.parent_ids[rows].tolist(), self.generation_created[rows].tolist())
+        taken.failed_evaluations = self.failed_evaluations[rows]
+        taken.rank = self.rank[rows]
+        taken.distance = self.distance[rows]
+        taken.fitness = {f: FitnessColumns(c.objectives, c.evaluated[rows], c.scores[rows])
+                         for f, c in self.fitness.items()}
+        return taken
+
+    def __len__(self) -> int:
+        """The number of individuals."""
+        return len(self.ids)
+
+    def __getitem__(self, row: int) -> "PhenotypeView":
+        """One individual, as a Phenotype."""
+        if not -len(self) <= row < len(self):
+            raise IndexError("Population index out of range")
+        return PhenotypeView(self, row % len(self))
+
+    def __iter__(self) -> Iterator["PhenotypeView"]:
+        """Every individual, as a Phenotype."""
+        return (PhenotypeView(self, row) for row in range(len(self)))
+
+    def to_phenotypes(self) -> list[Phenotype]:
+        """
+        Unpack the columns into independent Phenotypes.
+
+        :rtype: list[Phenotype]
+        """
+        return [view.to_phenotype() for view in self]
+
+    def genotype(self, row: int) -> Genotype:
+        """
+        Build the Genotype of one individual.
+
+        :param row: The individual's row.
+        :type row: int
+        :rtype: Genotype
+        """
+        genes = self.genes[row].tolist()
+        walls = []
+        for start in range(len(HORN_GENES), len(genes), len(WALL_GENES)):
+            has_ridge, *values = genes[start:start + len(WALL_GENES)]
+            wp = WallPair(self.cfg, *values)
+            wp.has_ridge = bool(has_ridge)
+            walls.append(wp)
+        return Genotype(self.cfg, *genes[:len(HORN_GENES)], walls)
+
+    @property
+    def fidelity(self) -> np.ndarray:
+        """The highest fidelity each individual has been evaluated at, or -1 if pending."""
+        fidelity = np.full(len(self), -1)
+        for f, columns in sorted(self.fitness.items()):
+            fidelity[columns.evaluated] = f
+        return fidelity
+
+    @property
+    def pending(self) -> np.ndarray:
+        """Whether each individual's fitness has yet to be evaluated."""
+        return self.fidelity < 0
+
+    @property
+    def objectives(self) -> list[str]:
+        """The objectives at the highest fidelity anyone has been evaluated at."""
+        return self.fitness[max(self.fitness)].objectives if self.fitness else []
+
+    @property
+    def scores(self) -> np.ndarray:
+        """
+        The fitness matrix, `(N, M)`, at the highest fidelity anyone has been evaluated at.
+
+        Rows not evaluated at that fidelity are NaN.
+        """
+        if not self.fitness:
+            return np.full((len(self), 0), np.nan)
+        return self.fitness[max(self.fitness)].scores
+
+    def set_fitness(self, row: int, fitness_scores: dict, fidelity: int = FULL_FIDELITY) -> None:
+        """
+        Set one individual's fitness scores at one fidelity.
+
+        :param row: The individual's row.
+        :type row: int
+        :param fitness_scores: The fitness scores, with the same objectives
+        as the rest of the population at that fidelity.
+        :type fitness_scores: dict
+        :param fidelity: The fidelity they were evaluated at.
+        :type fidelity: int
+        :raises ValueError: If the objectives differ from the population's.
+        :rtype: None
+        """
+        if fidelity not in self.fitness:
+            objectives = list(fitness_scores)
+            self.fitness[fidelity] = FitnessColumns(objectives, np.zeros(len(self), dtype=bool),
+                                                    np.full((len(self), len(objectives)), np.nan))
+        columns = self.fitness[fidelity]
+        if set(fitness_scores) != set(columns.objectives):
+            raise ValueError(f"Fitness scores of {self.ids[row]} have different objectives "
+                             f"from the population at fidelity {fidelity}")
+        columns.scores[row] = [fitness_scores[obj] for obj in columns.objectives]
+        columns.evaluated[row] = True
+
+    def clear_fitness(self, row: int) -> None:
+        """Mark one individual's fitness pending at every fidelity."""
+        for columns in self.fitness.values():
+            columns.evaluated[row] = False
+            columns.scores[row] = np.nan
+
+    def fitness_levels(self, rows: Optional[npt.ArrayLike] = None) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        The fitness scores of some individuals, as `ranking.fitness_matrices` packs them.
+
+        :param rows: Row indices, by default every row.
+        :type rows: array_like, optional
+        :raises PendingFitnessError: If any of them has pending fitness.
+        :return: For each fidelity, from lowest to highest, the mask of the
+        individuals evaluated at it and their scores; a single level if they
+        all have the same highest fidelity.
+        :rtype: list[tuple]
+        """
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=int)
+        fidelity = self.fidelity[rows]
+        if (fidelity < 0).any():
+            raise PendingFitnessError("Fitness of some individuals has not been evaluated yet; "
+                                      "evaluate pending individuals with a fitness evaluator first.")
+        if rows.size and (fidelity == fidelity[0]).all():
+            return [(np.ones(rows.size, dtype=bool), self.fitness[int(fidelity[0])].scores[rows])]
+        return [(c.evaluated[rows], c.scores[rows]) for _, c in sorted(self.fitness.items())
+                if c.evaluated[rows].any()]
+
+    def non_dominated_sort(self, block_size: Optional[int] = None) -> list[np.ndarray]:
+        """
+        Assign NSGA-II Pareto ranks, as `ranking.vectorized_non_dominated_sort` does.
+
+        :param block_size: Number of dominating individuals compared at once.
+        :type block_size: int, optional
+        :return: The rows of each front, best first.
+        :rtype: list[numpy.ndarray]
+        """
+        if not len(self):
+            return []
+        fronts = non_dominated_front_rows(self.fitness_levels(), block_size)
+        for rank, rows in enumerate(fronts):
+            self.rank[rows] = rank
+        return fronts
+
+    def crowding_distance_assignment(self, rows: npt.ArrayLike) -> np.ndarray:
+        """
+        Assign NSGA-II crowding distances to the individuals of a front.
+
+        Each front is compared at the highest fidelity all its members have,
+        as `evolver.crowding_distance_assignment` does.
+
+        :param rows: The rows of the front.
+        :type rows: array_like
+        :return: The rows, reordered as `evolver.crowding_distance_assignment` reorders a front.
+        :rtype: numpy.ndarray
+        """
+        rows = np.asarray(rows, dtype=int)
+        num_for_double_front = 2
+        if rows.size <= num_for_double_front:
+            self.distance[rows] = np.inf
+            return rows
+        shared = [c for _, c in sorted(self.fitness.items()) if c.evaluated[rows].all()]
+        if not shared:
+            raise ValueError("Individuals have no fitness fidelity in common and cannot be compared")
+        distances, order = crowding_distances(shared[-1].scores[rows])
+        self.distance[rows] = distances
+        return rows[order]
+
+    def tournament(self, num: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        Binary tournaments on rank, then crowding distance, then a coin toss.
+
+        :param num: The number of tournaments.
+        :type num: int
+        :param rng: Random number generator.
+        :type rng: numpy.random.Generator
+        :raises ValueError: If there are fewer than two individuals.
+        :return: The row of each winner.
+        :rtype: numpy.ndarray
+        """
+        n = len(self)
+        tournament_size = 2
+        if n < tournament_size:
+            raise ValueError("Tournaments need at least two individuals.")
+        first = rng.integers(n, size=num)
+        second = (first + rng.integers(1, n, size=num)) % n
+        rank1, rank2 = self.rank[first], self.rank[second]
+        distance1, distance2 = self.distance[first], self.distance[second]
+        coin = rng.integers(2, size=num).astype(bool)
+        first_wins = ((rank1 < rank2)
+                      | ((rank1 == rank2) & (distance1 > distance2))
+                      | ((rank1 == rank2) & (distance1 == distance2) & coin))
+        return np.where(first_wins, first, second)
+
+    def mutate(self, rng: np.random.Generator) -> None:
+        """
+        Mutate every individual, as `Genotype.mutate` does but on the whole gene matrix.
+
+        Each gene but has_ridge mutates with probability `per_site_mut_rate`,
+        by a Gaussian step of standard deviation `mut_effect_size`, and is
+        then clipped to its bounds.
+
+        :param rng: Random number generator.
+        :type rng: numpy.random.Generator
+        :rtype: None
+        """
+        per_site_mut_rate = float(self.cfg.per_site_mut_rate)
+        mut_effect_size = float(self.cfg.mut_effect_size)
+        mutated = (rng.random(self.genes.shape) <= per_site_mut_rate) & self.mutable
+        steps = rng.normal(0., mut_effect_size, self.genes.shape)
+        self.genes = np.where(mutated, np.clip(self.genes + steps, self.lower, self.upper), self.genes)
+
+    def make_offspring(self, parents: npt.ArrayLike, first_id: int, generation_num: int,
+                       rng: np.random.Generator) -> "Population":
+        """
+        Mutated copies of some individuals, with pending fitness.
+
+        :param parents: The row of each offspring's parent.
+        :type parents: array_like
+        :param first_id: The ID of the first offspring; the others follow.
+        :type first_id: int
+        :param generation_num: The current generation number.
+        :type generation_num: int
+        :param rng: Random number generator.
+        :type rng: numpy.random.Generator
+        :rtype: Population
+        """
+        parents = np.asarray(parents, dtype=int)
+        offspring = Population(self.cfg, self.genes[parents],
+                               [str(first_id + i) for i in range(parents.size)],
+                               self.ids[parents].tolist(), [generation_num] * parents.size)
+        offspring.mutate(rng)
+        return offspring
+
+    def select_survivors(self, pop_size: int, fronts: Optional[list[np.ndarray]] = None) -> "Population":
+        """
+        Keep the best `pop_size` individuals, by rank and then crowding distance.
+
+        Keeps the same individuals, in the same order, as `evolver.select_survivors`.
+
+        :param pop_size: The number of individuals to keep.
+        :type pop_size: int
+        :param fronts: The rows of each front, if already sorted.
+        :type fronts: list[numpy.ndarray], optional
+        :rtype: Population
+        """
+        if fronts is None:
+            fronts = self.non_dominated_sort()
+        keep = []
+        for rows in fronts:
+            front = self.crowding_distance_assignment(rows)
+            if len(keep) + front.size <= pop_size:
+                keep.extend(front.tolist())
+            else:
+                # Least crowded first, ties in front order
+                order = np.argsort(-self.distance[front], kind="stable")[: pop_size - len(keep)]
+                keep.extend(front[order].tolist())
+                break
+        return self.take(keep)
+
+
+class PhenotypeView:
+    """
+    One row of a Population, with the interface of a Phenotype.
+
+    Reads and writes go to the Population's columns, so e.g. a fitness
+    evaluator can score a Population through its views. The Genotype is
+    built from the genes on each access: changing it does not change the
+    Population. Copying or pickling a view gives an independent Phenotype.
+
+    :param population: The Population.
+    :type population: Population
+    :param row: The individual's row.
+    :type row: int
+    """
+
+    def __init__(self, population: Population, row: int) -> None:
+        """
+        PhenotypeView constructor.
+
+        :param population: The Population.
+        :type population: Population
+        :param row: The individual's row.
+        :type row: int
+        :rtype: None
+        """
+        self.population = population
+        self.row = row
+
+    @property
+    def genotype(self) -> Genotype:
+        """The individual's Genotype, built from its genes."""
+        return self.population.genotype(self.row)
+
+    @property
+    def indiv_id(self) -> Optional[str]:
+        """The individual's unique ID."""
+        return self.population.ids[self.row]
+
+    @indiv_id.setter
+    def indiv_id(self, indiv_id: str) -> None:
+        self.population.ids[self.row] = indiv_id
+
+    @property
+    def parent1_id(self) -> Optional[str]:
+        """The individual's parent's unique ID."""
+        return self.population.parent_ids[self.row]
+
+    @property
+    def generation_created(self) -> Optional[int]:
+        """Which generation the individual was created."""
+        return self.population.generation_created[self.row]
+
+    @property
+    def failed_evaluations(self) -> int:
+        """The number of failed evaluations of the individual."""
+        return int(self.population.failed_evaluations[self.row])
+
+    @failed_evaluations.setter
+    def failed_evaluations(self, failed_evaluations: int) -> None:
+        self.population.failed_evaluations[self.row] = failed_evaluations
+
+    @property
+    def nsgaii_rank(self) -> int:
+        """The individual's NSGA-II rank; unset until the population is sorted."""
+        rank = int(self.population.rank[self.row])
+        if rank < 0:
+            raise AttributeError("nsgaii_rank")
+        return rank
+
+    @nsgaii_rank.setter
+    def nsgaii_rank(self, rank: int) -> None:
+        self.population.rank[self.row] = rank
+
+    @property
+    def nsgaii_distance(self) -> float:
+        """The individual's crowding distance; unset until assigned."""
+        distance = float(self.population.distance[self.row])
+        if np.isnan(distance):
+            raise AttributeError("nsgaii_distance")
+        return distance
+
+    @nsgaii_distance.setter
+    def nsgaii_distance(self, distance: float) -> None:
+        self.population.distance[self.row] = distance
+
+    @property
+    def fitness_fidelities(self) -> list[int]:
+        """Every fidelity the individual has been evaluated at."""
+        return [f for f, columns in sorted(self.population.fitness.items()) if columns.evaluated[self.row]]
+
+    @property
+    def fitness_fidelity(self) -> Optional[int]:
+        """The highest fidelity the individual has been evaluated at, or None if pending."""
+        fidelities = self.fitness_fidelities
+        return fidelities[-1] if fidelities else None
+
+    @property
+    def fitness_pending(self) -> bool:
+        """Whether the individual's fitness has yet to be evaluated."""
+        return not self.fitness_fidelities
+
+    @property
+    def fitness_scores(self) -> dict:
+        """
+        The individual's fitness scores, at the highest fidelity evaluated.
+
+        :raises PendingFitnessError: If the fitness has not been evaluated yet.
+        :rtype: dict
+        """
+        fidelity = self.fitness_fidelity
+        if fidelity is None:
+            raise PendingFitnessError(f"Fitness of individual {self.indiv_id} has not been evaluated yet; "
+                                      "evaluate pending individuals with a fitness evaluator first.")
+        return self.fitness_at(fidelity)
+
+    @fitness_scores.setter
+    def fitness_scores(self, fitness_scores: Optional[dict]) -> None:
+        """Set the individual's full-fidelity fitness scores, or None to mark them pending."""
+        self.population.clear_fitness(self.row)
+        if fitness_scores is not None:
+            self.population.set_fitness(self.row, fitness_scores, FULL_FIDELITY)
+
+    def set_fitness(self, fitness_scores: dict, fidelity: int = FULL_FIDELITY) -> None:
+        """Set the individual's fitness scores at one fidelity, keeping those at other fidelities."""
+        self.population.set_fitness(self.row, fitness_scores, fidelity)
+
+    def fitness_at(self, fidelity: int) -> dict:
+        """
+        The individual's fitness scores at one fidelity.
+
+        :param fidelity: The fidelity.
+        :type fidelity: int
+        :raises PendingFitnessError: If the individual has not been evaluated at that fidelity.
+        :rtype: dict
+        """
+        columns = self.population.fitness.get(fidelity)
+        if columns is None or not columns.evaluated[self.row]:
+            raise PendingFitnessError(f"Fitness of individual {self.indiv_id} has not been evaluated "
+                                      f"at fidelity {fidelity}.")
+        return dict(zip(columns.objectives, columns.scores[self.row].tolist(), strict=True))
+
+    def make_offspring(self, new_id: str, generation_num: int, rand: random.Random) -> Phenotype:
+        """Make a mutated offspring Phenotype, see `Phenotype.make_offspring`."""
+        return self.to_phenotype().make_offspring(new_id, generation_num, rand)
+
+    def to_phenotype(self) -> Phenotype:
+        """
+        An independent Phenotype with the individual's data.
+
+        :rtype: Phenotype
+        """
+        phenotype = Phenotype(self.genotype, self.indiv_id, self.parent1_id, self.generation_created)
+        for fidelity in self.fitness_fidelities:
+            phenotype.set_fitness(self.fitness_at(fidelity), fidelity)
+        phenotype.failed_evaluations = self.failed_evaluations
+        if self.population.rank[self.row] >= 0:
+            phenotype.nsgaii_rank = self.nsgaii_rank
+        if not np.isnan(self.population.distance[self.row]):
+            phenotype.nsgaii_distance = self.nsgaii_distance
+        return phenotype
+
+    def __reduce__(self) -> tuple:
+        """Copy or pickle as an independent Phenotype, rather than with the whole Population."""
+        return object.__new__, (Phenotype,), self.to_phenotype().__dict__
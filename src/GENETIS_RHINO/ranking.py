@@ -0,0 +1,507 @@
+"""
+Array-based NSGA-II ranking of populations.
+
+The pure-Python helpers in `evolver` compare individuals one pair at a time
+through their fitness dicts. Here the fitness scores are packed once into an
+`(N, M)` array and compared by broadcasting, a block of rows at a time, so
+memory stays bounded however large the population.
+
+A population of mixed fidelity is ranked on the highest fidelity every
+individual has, as in `evolver.comparable_scores`, since comparing each
+pair at the highest fidelity the two share is not transitive. Each front
+is then split by the higher-fidelity scores of the members that have them
+(those promoted by a two-tier evaluator): they are sorted among
+themselves, and the members without such scores join the first part.
+
+This module provides:
+- fitness_matrices: packs fitness scores into arrays, one per fidelity
+- shared_level: the fidelity every individual has, to rank a population on
+- dominance_block: which of some individuals dominate which others
+- vectorized_non_dominated_sort: Deb's fast non-dominated sort on arrays
+- non_dominated_front_rows: the same sort, on packed scores
+- sweep_non_dominated_sort: O(N log N) sort for two objectives
+- efficient_non_dominated_sort: Efficient Non-dominated Sort (ENS-SS/ENS-BS)
+- merge_into_fronts: sorts a population given the fronts of part of it
+- crowding_distances: NSGA-II crowding distance of a front's score matrix
+
+Deb's sort compares every pair, so it is O(M N^2) however the population is
+spread. The sweep and ENS sorts visit the individuals in lexicographic
+order of their scores, so that everyone who dominates an individual has
+already been placed in a front, and only search for the first front with no
+such dominator: O(N log N) for the two-objective sweep, and between
+O(M N log N) and O(M N^2) for ENS. They give the same fronts as Deb's sort,
+with each front in population order. They need a single fidelity to sort
+on; populations of mixed fidelity are sorted by
+`vectorized_non_dominated_sort` instead.
+"""
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+# Number of pairwise objective comparisons broadcast at once
+BLOCK_ELEMENTS = 1 << 22
+
+
+def fitness_matrices(population: list) -> list[tuple[npt.ArrayLike, npt.ArrayLike]]:
+    """
+    Packs the fitness scores of a population into arrays.
+
+    Args:
+        population (list[Phenotype]):
+            Evaluated individuals. Anything with `fitness_scores` works when
+            every individual has the same fidelity.
+
+    Returns:
+        levels (list of (array_like, array_like)):
+            For each fidelity, from lowest to highest: a boolean mask of the
+            individuals evaluated at it, of shape `(N,)`, and their scores, of
+            shape `(N, M)` (NaN for the other individuals). A single level
+            holds everyone's `fitness_scores` if all share the same fidelity.
+
+    """
+    if not population:
+        return []
+
+    fidelities = [getattr(indiv, "fitness_fidelity", None) for indiv in population]
+    if all(f == fidelities[0] for f in fidelities):
+        levels = [(None, [indiv.fitness_scores for indiv in population])]
+    else:
+        levels = [(f, [indiv.fitness_at(f) if f in indiv.fitness_fidelities else None
+                       for indiv in population])
+                  for f in sorted(set().union(*(indiv.fitness_fidelities for indiv in population)))]
+
+    matrices = []
+    for _, scores in levels:
+        has = np.array([s is not None for s in scores])
+        objectives = list(next(s for s in scores if s is not None))
+        matrix = np.full((len(population), len(objectives)), np.nan)
+        matrix[has] = [[s[obj] for obj in objectives] for s in scores if s is not None]
+        matrices.append((has, matrix))
+    return matrices
+
+
+def shared_level(levels: list[tuple[npt.ArrayLike, npt.ArrayLike]]) -> int:
+    """
+    The highest fidelity every individual has been evaluated at.
+
+    Args:
+        levels (list of (array_like, array_like)):
+            Output of `fitness_matrices`, for a non-empty population.
+
+    Returns:
+        level (int):
+            Index in `levels` of the fidelity to rank the population on.
+
+    """
+    for level in reversed(range(len(levels))):
+        if levels[level][0].all():
+            return level
+    raise ValueError("Individuals have no fitness fidelity in common and cannot be compared")
+
+
+def dominance_block(scores: npt.ArrayLike, rows: npt.ArrayLike) -> npt.ArrayLike:
+    """
+    Which of some individuals dominate which of all individuals (minimization).
+
+    Args:
+        scores (array_like):
+            Scores of every individual at one fidelity, of shape `(N, M)`,
+            e.g. the level of `fitness_matrices` given by `shared_level`.
+        rows (array_like):
+            Indices of the dominating individuals.
+
+    Returns:
+        dominates (array_like):
+            Boolean array of shape `(len(rows), N)`, True where the individual
+            of the row dominates the individual of the column.
+
+    """
+    a = scores[np.asarray(rows)][:, np.newaxis, :]
+    b = scores[np.newaxis, :, :]
+    return np.all(a <= b, axis=-1) & np.any(a < b, axis=-1)
+
+
+def vectorized_non_dominated_sort(population: list, block_size: Optional[int] = None) -> list[list]:
+    """
+    Assigns NSGA-II Pareto rank to each individual in the population, using arrays.
+
+    Gives the same fronts, in the same order, as the pairwise
+    `evolver.pairwise_non_dominated_sort`, but never holds more than
+    `block_size` rows of the dominance matrix. Populations of mixed
+    fidelity are ranked as described in the module docstring.
+
+    Args:
+        population (list[Phenotype]):
+            Evaluated individuals.
+        block_size (int):
+            Number of dominating individuals compared at once. Defaults to
+            what keeps about `BLOCK_ELEMENTS` comparisons in memory.
+
+    Returns:
+        fronts (list of list):
+            The individuals of each front, best first. Each individual's
+            `nsgaii_rank` is set to the index of its front.
+
+    """
+    if not population:
+        return []
+    fronts = []
+    for rank, rows in enumerate(non_dominated_front_rows(fitness_matrices(population), block_size)):
+        front = [population[i] for i in rows.tolist()]
+        for indiv in front:
+            indiv.nsgaii_rank = rank
+        fronts.append(front)
+    return fronts
+
+
+def non_dominated_front_rows(levels: list[tuple[npt.ArrayLike, npt.ArrayLike]],
+                             block_size: Optional[int] = None) -> list[npt.ArrayLike]:
+    """
+    Deb's fast non-dominated sort of packed fitness scores.
+
+    Everyone is ranked at the fidelity given by `shared_level`. If some
+    individuals also have higher-fidelity scores, each front is split by
+    sorting those individuals among themselves, at the highest fidelity
+    they all have. The others join the first part, and each part keeps the
+    order of the front.
+
+    Args:
+        levels (list of (array_like, array_like)):
+            Output of `fitness_matrices`, for a non-empty population.
+        block_size (int):
+            Number of dominating individuals compared at once. Defaults to
+            what keeps about `BLOCK_ELEMENTS` comparisons in memory.
+
+    Returns:
+        fronts (list of array_like):
+            The row indices of each front, best first, in the order of
+            `vectorized_non_dominated_sort`.
+
+    """
+    level = shared_level(levels)
+    fronts = _deb_front_rows(levels[level][1], block_size)
+    higher = levels[level + 1:]
+    if not higher:
+        return fronts
+
+    promoted = np.any([has for has, _ in higher], axis=0)
+    num_for_split = 2
+    split = []
+    for front in fronts:
+        rows = front[promoted[front]]
+        if rows.size < num_for_split:
+            split.append(front)
+            continue
+        sub_levels = [(has[rows], matrix[rows]) for has, matrix in higher]
+        sub_scores = sub_levels[shared_level(sub_levels)][1]
+        sub_rank = np.zeros(len(promoted), dtype=int)
+        for rank, sub_rows in enumerate(_deb_front_rows(sub_scores, block_size)):
+            sub_rank[rows[sub_rows]] = rank
+        split.extend(front[sub_rank[front] == rank] for rank in range(int(sub_rank[rows].max()) + 1))
+    return split
+
+
+def _deb_front_rows(scores: npt.ArrayLike, block_size: Optional[int] = None) -> list[npt.ArrayLike]:
+    """Deb's fast non-dominated sort of a score matrix of shape `(N, M)`, see `non_dominated_front_rows`."""
+    n = len(scores)
+    if block_size is None:
+        block_size = max(1, BLOCK_ELEMENTS // max(1, n * scores.shape[1]))
+
+    # How many individuals dominate each individual
+    domination_count = np.zeros(n, dtype=int)
+    for start in range(0, n, block_size):
+        domination_count += dominance_block(scores, np.arange(start, min(start + block_size, n))).sum(axis=0)
+
+    fronts = []
+    front = np.flatnonzero(domination_count == 0)
+    while front.size:
+        fronts.append(front)
+
+        # Remove the front's dominations, noting the last member of the front
+        # to dominate each individual: that is when it joins the next front
+        last_dominator = np.full(n, -1)
+        for start in range(0, front.size, block_size):
+            dominates = dominance_block(scores, front[start:start + block_size])
+            domination_count -= dominates.sum(axis=0)
+            last_in_block = start + dominates.shape[0] - 1 - np.argmax(dominates[::-1], axis=0)
+            last_dominator = np.where(dominates.any(axis=0), last_in_block, last_dominator)
+
+        joined = np.flatnonzero((domination_count == 0) & (last_dominator >= 0))
+        front = joined[np.lexsort((joined, last_dominator[joined]))]
+    return fronts
+
+
+def _assign_ranks(population: list, ranks: npt.ArrayLike) -> list[list]:
+    """Set each individual's `nsgaii_rank` and group the population into fronts, in population order."""
+    fronts = [[] for _ in range(int(ranks.max()) + 1)]
+    for indiv, rank in zip(population, ranks.tolist(), strict=True):
+        indiv.nsgaii_rank = rank
+        fronts[rank].append(indiv)
+    return fronts
+
+
+def sweep_non_dominated_sort(population: list) -> list[list]:
+    """
+    Assigns NSGA-II Pareto rank to each individual of a two-objective population in O(N log N).
+
+    Individuals are visited by increasing first, then second, objective.
+    Each front then only needs its last member, which has the front's
+    smallest second objective: an individual is dominated by a front if it
+    is dominated by that member. Fronts dominating an individual come before
+    those that do not, so its front is found by binary search.
+
+    Args:
+        population (list[Phenotype]):
+            Evaluated individuals with exactly two objectives.
+
+    Returns:
+        fronts (list of list):
+            The individuals of each front, best first, in population order.
+
+    """
+    if not population:
+        return []
+    levels = fitness_matrices(population)
+    if len(levels) > 1:
+        return vectorized_non_dominated_sort(population)
+    scores = levels[0][1]
+    num_sweep_objectives = 2
+    if scores.shape[1] != num_sweep_objectives:
+        raise ValueError("The sweep sort needs exactly two objectives")
+
+    ranks = np.empty(len(population), dtype=int)
+    last = []  # (f1, f2) of the last member of each front
+    for i in np.lexsort((scores[:, 1], scores[:, 0])).tolist():
+        f1, f2 = scores[i].tolist()
+        lo, hi = 0, len(last)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            l1, l2 = last[mid]
+            # l1 <= f1, so the front dominates unless it is no better in f2
+            if l2 < f2 or (l2 == f2 and l1 < f1):
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(last):
+            last.append((f1, f2))
+        else:
+            last[lo] = (f1, f2)
+        ranks[i] = lo
+    return _assign_ranks(population, ranks)
+
+
+def efficient_non_dominated_sort(population: list, *, binary_search: bool = True) -> list[list]:
+    """
+    Assigns NSGA-II Pareto rank to each individual with Efficient Non-dominated Sort.
+
+    Individuals are visited in lexicographic order of their scores and
+    added to the first front none of whose members dominates them, found by
+    sequential (ENS-SS) or binary (ENS-BS) search over the fronts. See
+    Zhang et al., IEEE Trans. Evol. Comput. 19 (2015) 201.
+
+    Args:
+        population (list[Phenotype]):
+            Evaluated individuals.
+        binary_search (bool):
+            Whether to use ENS-BS, which needs fewer comparisons when there
+            are many fronts, rather than ENS-SS.
+
+    Returns:
+        fronts (list of list):
+            The individuals of each front, best first, in population order.
+
+    """
+    if not population:
+        return []
+    levels = fitness_matrices(population)
+    if len(levels) > 1:
+        return vectorized_non_dominated_sort(population)
+    scores = levels[0][1]
+
+    # Scores of each front's members, in buffers that double when full
+    front_scores: list[npt.ArrayLike] = []
+    front_sizes: list[int] = []
+
+    def dominated_by_front(k: int, x: npt.ArrayLike) -> bool:
+        members = front_scores[k][:front_sizes[k]]
+        return bool(np.any(np.all(members <= x, axis=1) & np.any(members < x, axis=1)))
+
+    ranks = np.empty(len(population), dtype=int)
+    for i in np.lexsort(scores.T[::-1]).tolist():
+        x = scores[i]
+        if binary_search:
+            lo, hi = 0, len(front_sizes)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if dominated_by_front(mid, x):
+                    lo = mid + 1
+                else:
+                    hi = mid
+            k = lo
+        else:
+            k = 0
+            while k < len(front_sizes) and dominated_by_front(k, x):
+                k += 1
+
+        if k == len(front_sizes):
+            front_scores.append(np.empty((1, scores.shape[1])))
+            front_sizes.append(0)
+        if front_sizes[k] == len(front_scores[k]):
+            front_scores[k] = np.concatenate([front_scores[k], np.empty_like(front_scores[k])])
+        front_scores[k][front_sizes[k]] = x
+        front_sizes[k] += 1
+        ranks[i] = k
+    return _assign_ranks(population, ranks)
+
+
+def _dominates(a: npt.ArrayLike, b: npt.ArrayLike) -> npt.ArrayLike:
+    """Which rows of `a` dominate which rows of `b`, as a boolean array of shape `(len(a), len(b))`."""
+    a = a[:, np.newaxis, :]
+    b = b[np.newaxis, :, :]
+    return np.all(a <= b, axis=-1) & np.any(a < b, axis=-1)
+
+
+def _insert_into_fronts(front_rows: list[list[int]], scores: npt.ArrayLike, i: int) -> None:
+    """Insert row `i` of `scores` into the fronts of other rows, updating them in place."""
+    x = scores[i][np.newaxis]
+    lo, hi = 0, len(front_rows)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _dominates(scores[front_rows[mid]], x).any():
+            lo = mid + 1
+        else:
+            hi = mid
+
+    # Push back the members it dominates, then those they dominate, and so on
+    moved = [i]
+    for k in range(lo, len(front_rows)):
+        pushed = _dominates(scores[moved], scores[front_rows[k]]).any(axis=0).tolist()
+        next_moved = [r for r, p in zip(front_rows[k], pushed, strict=True) if p]
+        front_rows[k] = [r for r, p in zip(front_rows[k], pushed, strict=True) if not p] + moved
+        moved = next_moved
+        if not moved:
+            return
+    front_rows.append(moved)
+
+
+def _deb_order(scores: npt.ArrayLike, previous: npt.ArrayLike, rows: npt.ArrayLike) -> npt.ArrayLike:
+    """
+    Order the rows of a front as Deb's sort does.
+
+    Args:
+        scores (np.ndarray): The score matrix of the population.
+        previous (np.ndarray): The rows of the front before, in order.
+        rows (np.ndarray): The rows of the front, in population order.
+
+    Returns:
+        rows (np.ndarray): The rows by position of their last dominator in `previous`.
+
+    """
+    last_dominator = np.full(rows.size, -1)
+    block_size = max(1, BLOCK_ELEMENTS // max(1, rows.size * scores.shape[1]))
+    for start in range(0, previous.size, block_size):
+        dominates = _dominates(scores[previous[start:start + block_size]], scores[rows])
+        last_in_block = start + dominates.shape[0] - 1 - np.argmax(dominates[::-1], axis=0)
+        last_dominator = np.where(dominates.any(axis=0), last_in_block, last_dominator)
+    return rows[np.lexsort((rows, last_dominator))]
+
+
+def merge_into_fronts(population: list, fronts: list[list], *, deb_order: bool = True) -> list[list]:
+    """
+    Assigns NSGA-II Pareto rank to each individual, given the fronts of part of the population.
+
+    The individuals missing from `fronts` are inserted one at a time: each
+    joins the first front none of whose members dominates it, found by
+    binary search, and pushes the members it dominates one front back, along
+    with those they dominate in turn. Only the fronts an individual reaches
+    are compared with it, instead of every pair of the population.
+
+    The fronts are then ordered as a full sort of `population` would order
+    them, so the result is the same as sorting from scratch: in population
+    order, or with `deb_order` as Deb's sort does, where each member of a
+    front comes after those whose last dominator in the front before comes
+    earlier.
+
+    Args:
+        population (list[Phenotype]):
+            Evaluated individuals, all of the same fidelity; otherwise the
+            whole population is sorted by `vectorized_non_dominated_sort`.
+        fronts (list of list):
+            The fronts of some of the individuals of `population`, in any
+            order within each front.
+        deb_order (bool):
+            Whether to order each front as `vectorized_non_dominated_sort`
+            does, rather than in population order.
+
+    Returns:
+        fronts (list of list):
+            The individuals of each front of `population`, best first.
+
+    """
+    if not population:
+        return []
+    levels = fitness_matrices(population)
+    if len(levels) > 1:
+        return vectorized_non_dominated_sort(population)
+    scores = levels[0][1]
+
+    position = {id(indiv): i for i, indiv in enumerate(population)}
+    front_rows = [[position[id(indiv)] for indiv in front] for front in fronts if front]
+    known = np.zeros(len(population), dtype=bool)
+    for rows in front_rows:
+        known[rows] = True
+
+    for i in np.flatnonzero(~known).tolist():
+        _insert_into_fronts(front_rows, scores, i)
+
+    ordered = [np.sort(front_rows[0])]
+    for rows in front_rows[1:]:
+        ordered.append(_deb_order(scores, ordered[-1], np.sort(rows)) if deb_order else np.sort(rows))
+
+    result = []
+    for rank, rows in enumerate(ordered):
+        front = [population[i] for i in rows.tolist()]
+        for indiv in front:
+            indiv.nsgaii_rank = rank
+        result.append(front)
+    return result
+
+
+def crowding_distances(scores: npt.ArrayLike) -> tuple[npt.ArrayLike, npt.ArrayLike]:
+    """
+    NSGA-II crowding distance of each individual of a front.
+
+    The front is stably sorted by each objective in turn, keeping the order
+    of the previous sort for ties, exactly as `evolver.loop_crowding_distance_assignment`
+    sorts its list. Each individual then gains the normalized gap between
+    its neighbours, and the first and last get an infinite distance.
+    Objectives on which the whole front is equal are skipped.
+
+    Args:
+        scores (array_like):
+            Scores of the front's individuals, of shape `(n, M)`.
+
+    Returns:
+        distances (array_like):
+            Crowding distance of each individual, of shape `(n,)`.
+        order (array_like):
+            The individuals sorted by the last objective, ties in the order
+            of the sorts before.
+
+    """
+    n = len(scores)
+    order = np.arange(n)
+    num_for_double_front = 2
+    if n <= num_for_double_front:
+        return np.full(n, np.inf), order
+
+    distances = np.zeros(n)
+    for column in np.asarray(scores, dtype=float).T:
+        order = order[np.argsort(column[order], kind="stable")]
+        f_min, f_max = column[order[0]], column[order[-1]]
+        if f_max == f_min:
+            continue
+        distances[order[1:-1]] += (column[order[2:]] - column[order[:-2]]) / (f_max - f_min)
+        distances[order[[0, -1]]] = np.inf
+    return distances, order
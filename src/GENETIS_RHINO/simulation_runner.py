@@ -0,0 +1,261 @@
+"""
+Runs antenna simulations for a batch of Genotypes on the local machine.
+
+Each individual gets its own work directory holding its genes as
+`genotype.json`. The simulator command is run there and is expected to
+write the individual's UAN files to the `uan` subdirectory, which can then
+be handed to `calculate_fitnesses`.
+
+The command is a template: `{work_dir}`, `{genotype_file}` and `{uan_dir}`
+are replaced by the individual's paths, e.g.
+`"xfdtd_run --input {genotype_file} --output {uan_dir}"`.
+
+This module provides:
+- genotype_to_dict: a Genotype's genes by name, as written to genotype.json
+- SimulationResult: the outcome of one individual's simulation
+- LocalSimulationRunner: runs the simulations with bounded concurrency,
+  per-job timeouts and retries
+"""
+import contextlib
+import json
+import os
+import pathlib
+import shlex
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, NamedTuple, Optional
+
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.parameters import ParametersObject
+
+GENOTYPE_FILENAME = "genotype.json"
+UAN_DIRNAME = "uan"
+LOG_FILENAME = "simulation.log"
+
+
+def genotype_to_dict(genotype: Genotype) -> dict:
+    """
+    A Genotype's genes by name.
+
+    :param genotype: The Genotype.
+    :type genotype: Genotype
+    :return: The horn genes, and a list with the genes of each WallPair.
+    :rtype: dict
+    """
+    walls = genotype.walls or []
+    return {
+        "flare_length": genotype.flare_length,
+        "waveguide_height": genotype.waveguide_height,
+        "waveguide_length": genotype.waveguide_length,
+        "waveguide_width": genotype.waveguide_width,
+        "walls": [{"has_ridge": wp.has_ridge,
+                   "angle": wp.angle,
+                   "ridge_height": wp.ridge_height,
+                   "ridge_width_top": wp.ridge_width_top,
+                   "ridge_width_bottom": wp.ridge_width_bottom,
+                   "ridge_thickness_top": wp.ridge_thickness_top,
+                   "ridge_thickness_bottom": wp.ridge_thickness_bottom} for wp in walls],
+    }
+
+
+class SimulationResult(NamedTuple):
+    """Outcome of one individual's simulation."""
+
+    index: int                   # position of the Genotype in the batch
+    work_dir: str                # the individual's work directory
+    uan_dir: str                 # where the simulator wrote the UAN files
+    ok: bool                     # whether the simulation succeeded
+    attempts: int                # number of times the simulator was run
+    elapsed: float               # wall-clock time of all attempts, in s
+    error: Optional[str] = None  # why the last attempt failed
+
+
+class LocalSimulationRunner:
+    """
+    Runs a simulator command for each Genotype of a batch, keeping up to `max_jobs` running at once.
+
+    As soon as a simulation finishes, the next one starts, so every
+    simulator slot stays busy. A simulation fails if the command exits with
+    a non-zero status, runs for longer than `timeout` (it is then killed,
+    along with every process it started), or writes no UAN files. Failed simulations are retried up to `retries`
+    times, each time from an empty UAN directory. The command's output is
+    appended to `simulation.log` in the work directory.
+
+    :param command: The simulator command template, see the module docstring.
+    :type command: str or list[str]
+    :param run_dir: Directory in which work directories are created.
+    :type run_dir: str
+    :param max_jobs: The maximum number of simulations running at once.
+    :type max_jobs: int
+    :param timeout: The maximum time per attempt, in s, or None for no limit.
+    :type timeout: float, optional
+    :param retries: The number of times a failed simulation is rerun.
+    :type retries: int
+    """
+
+    # Whether every run should hold a whole batch rather than one Genotype
+    batch_only = False
+
+    def __init__(self, command: str | list[str], run_dir: str, max_jobs: int = 1,
+                 timeout: Optional[float] = None, retries: int = 0) -> None:
+        """
+        LocalSimulationRunner constructor.
+
+        :param command: The simulator command template, see the module docstring.
+        :type command: str or list[str]
+        :param run_dir: Directory in which work directories are created.
+        :type run_dir: str
+        :param max_jobs: The maximum number of simulations running at once.
+        :type max_jobs: int
+        :param timeout: The maximum time per attempt, in s, or None for no limit.
+        :type timeout: float, optional
+        :param retries: The number of times a failed simulation is rerun.
+        :type retries: int
+        :rtype: None
+        """
+        if max_jobs < 1:
+            raise ValueError("max_jobs must be greater than zero.")
+        if retries < 0:
+            raise ValueError("retries cannot be negative.")
+        self.command = shlex.split(command) if isinstance(command, str) else list(command)
+        if not self.command:
+            raise ValueError("No simulator command given.")
+        self.run_dir = pathlib.Path(run_dir)
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.retries = retries
+        self.batch_num = 0
+        self._batch_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg: ParametersObject) -> "LocalSimulationRunner":
+        """
+        Build a runner from the simulation parameters of the config.
+
+        These are `simulator_command`, `simulation_run_dir`,
+        `max_simulation_jobs`, `simulation_timeout` (0 for no limit) and
+        `simulation_retries`.
+
+        :param cfg: Configuration object.
+        :type cfg: ParametersObject
+        :rtype: LocalSimulationRunner
+        """
+        timeout = cfg.simulation_timeout if cfg.simulation_timeout > 0 else None
+        return cls(cfg.simulator_command, cfg.simulation_run_dir, cfg.max_simulation_jobs,
+                   timeout, cfg.simulation_retries)
+
+    def prepare(self, genotypes: list[Genotype]) -> list[pathlib.Path]:
+        """
+        Create the work directories of a new batch, each with its genotype.json.
+
+        Batches are numbered, so the work directory of the i-th Genotype of
+        the n-th batch is `<run_dir>/batch_<n>/<i>`. Batches can be prepared
+        from several threads at once, and by several runners sharing `run_dir`.
+
+        :param genotypes: The Genotypes to simulate.
+        :type genotypes: list[Genotype]
+        :return: The work directory of each Genotype.
+        :rtype: list[pathlib.Path]
+        """
+        with self._batch_lock:
+            while True:
+                batch_dir = self.run_dir / f"batch_{self.batch_num:05d}"
+                self.batch_num += 1
+                # mkdir fails if another runner took this batch number first
+                try:
+                    batch_dir.mkdir(parents=True)
+                    break
+                except FileExistsError:
+                    continue
+
+        work_dirs = []
+        for i, genotype in enumerate(genotypes):
+            work_dir = batch_dir / str(i)
+            work_dir.mkdir()
+            with (work_dir / GENOTYPE_FILENAME).open("w") as f:
+                json.dump(genotype_to_dict(genotype), f, indent=2)
+            work_dirs.append(work_dir)
+        return work_dirs
+
+    def command_for(self, work_dir: pathlib.Path) -> list[str]:
+        """The simulator command for one work directory."""
+        paths = {"work_dir": str(work_dir),
+                 "genotype_file": str(work_dir / GENOTYPE_FILENAME),
+                 "uan_dir": str(work_dir / UAN_DIRNAME)}
+        return [arg.format(**paths) for arg in self.command]
+
+    def run_one(self, index: int, work_dir: pathlib.Path) -> SimulationResult:
+        """
+        Simulate one individual, retrying on failure.
+
+        :param index: Position of the individual in its batch.
+        :type index: int
+        :param work_dir: The individual's work directory.
+        :type work_dir: pathlib.Path
+        :rtype: SimulationResult
+        """
+        uan_dir = work_dir / UAN_DIRNAME
+        command = self.command_for(work_dir)
+        start = time.monotonic()
+        error = None
+
+        for attempt in range(1, self.retries + 2):
+            shutil.rmtree(uan_dir, ignore_errors=True)
+            uan_dir.mkdir()
+            with (work_dir / LOG_FILENAME).open("a") as log:
+                log.write(f"--- attempt {attempt}: {shlex.join(command)}\n")
+                log.flush()
+                try:
+                    error = self._attempt(command, work_dir, log)
+                except OSError as e:
+                    error = f"could not be started: {e}"
+                if error is not None:
+                    log.write(f"--- attempt {attempt} failed: {error}\n")
+
+            if error is None:
+                break
+
+        return SimulationResult(index, str(work_dir), str(uan_dir), error is None,
+                                attempt, time.monotonic() - start, error)
+
+    def _attempt(self, command: list[str], work_dir: pathlib.Path, log: IO) -> Optional[str]:
+        """
+        Run the simulator once, in its own process group.
+
+        On timeout the whole group is killed, so simulators that start
+        their own solver processes do not leave them running.
+
+        :return: Why the attempt failed, or None if it succeeded.
+        :rtype: str or None
+        """
+        process = subprocess.Popen(command, cwd=work_dir, stdout=log, stderr=subprocess.STDOUT,  # noqa: S603
+                                   start_new_session=True)
+        try:
+            returncode = process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+            return f"timed out after {self.timeout} s"
+        if returncode != 0:
+            return f"exited with status {returncode}"
+        if not any((work_dir / UAN_DIRNAME).glob("*.uan")):
+            return "wrote no UAN files"
+        return None
+
+    def run(self, genotypes: list[Genotype]) -> list[SimulationResult]:
+        """
+        Simulate a batch of Genotypes.
+
+        :param genotypes: The Genotypes to simulate.
+        :type genotypes: list[Genotype]
+        :return: The result of each Genotype's simulation, in the same order.
+        :rtype: list[SimulationResult]
+        """
+        work_dirs = self.prepare(genotypes)
+        with ThreadPoolExecutor(max_workers=self.max_jobs) as pool:
+            return list(pool.map(self.run_one, range(len(work_dirs)), work_dirs))
@@ -0,0 +1,260 @@
+"""Reference sky model used to weight the beam when calculating the beam correction factor."""
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+import healpy as hp
+import numpy as np
+import numpy.typing as npt
+from astropy import units as u
+from astropy.coordinates import AltAz, EarthLocation, Galactic, SkyCoord
+from astropy.time import Time
+from astropy_healpix import HEALPix
+
+DEFAULT_REF_MAP_PATH = "src/assets/haslam408_dsds_Remazeilles2014.fits"
+
+
+def default_location() -> EarthLocation:
+    """Jodrell Bank, the default observer location."""
+    return EarthLocation(lat=53.2421*u.deg, lon=-2.3067*u.deg, height=70.)
+
+
+def default_obstime() -> Time:
+    """The default observation time, `2025-08-01 22:00:00Z`."""
+    return Time("2025-08-01 22:00:00Z")
+
+
+class SkyInterpolator:
+    """
+    Bilinear interpolation from a HEALPix map to the pixels of a beam grid, as a sparse matrix.
+
+    For a fixed beam grid, observer location and observation time, the
+    interpolation done by `HEALPix.interpolate_bilinear_skycoord` is a
+    linear map with four nonzeros per beam pixel. It is stored here in
+    ELLPACK form, as `(Npix, 4)` arrays of HEALPix indices and weights, so
+    interpolating any map on the same HEALPix grid is a gather and a sum,
+    with no coordinate transform.
+    """
+
+    def __init__(self, indices: npt.ArrayLike, weights: npt.ArrayLike, nside: int) -> None:
+        """
+        Wraps precomputed interpolation indices and weights.
+
+        Args:
+            indices (array_like):
+                Integer array of shape `(Npix, 4)`, with the HEALPix pixel
+                (RING ordering) of each nonzero.
+            weights (array_like):
+                Array of shape `(Npix, 4)` with the weight of each nonzero.
+            nside (int):
+                HEALPix resolution of the maps this operator applies to.
+
+        """
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=float)
+        self.nside = int(nside)
+        assert self.indices.shape == self.weights.shape, "indices and weights must have the same shape"
+
+    @classmethod
+    def from_beam_grid(cls, beam_alt_deg: npt.ArrayLike, beam_az_deg: npt.ArrayLike, nside: int,
+                       location: Optional[EarthLocation] = None,
+                       obstime: Optional[Time] = None) -> "SkyInterpolator":
+        """
+        Build the operator for a beam grid, using the same weights as `interpolate_bilinear_skycoord`.
+
+        Args:
+            beam_alt_deg (array_like):
+                Altitude of each beam pixel, in degrees.
+            beam_az_deg (array_like):
+                Azimuth of each beam pixel, in degrees.
+            nside (int):
+                HEALPix resolution of the Galactic maps to interpolate.
+            location (astropy.EarthLocation):
+                Observer location. Defaults to Jodrell Bank.
+            obstime (astropy.Time):
+                Observation time. Defaults to `2025-08-01 22:00:00Z`. If this
+                holds `Ntimes` times, the operator has one row per time and
+                beam pixel, in time-major order.
+
+        Returns:
+            interpolator (SkyInterpolator):
+                Operator of shape `(Ntimes * Npix, 12 * nside**2)`.
+
+        """
+        location = default_location() if location is None else location
+        obstime = default_obstime() if obstime is None else obstime
+
+        # Galactic coordinates of each pixel of the beam, at every time. Each
+        # time is transformed on its own: astropy is much faster with a
+        # scalar obstime than when broadcasting an array of them.
+        lon, lat = [], []
+        for t in obstime.ravel():
+            frame_altaz = AltAz(obstime=t, location=location)
+            coords = SkyCoord(np.ravel(beam_az_deg) * u.deg, np.ravel(beam_alt_deg) * u.deg, frame=frame_altaz)
+            coords = coords.transform_to(Galactic())
+            lon.append(coords.l)
+            lat.append(coords.b)
+
+        hp_grid = HEALPix(nside=nside, order="RING", frame=Galactic())
+        indices, weights = hp_grid.bilinear_interpolation_weights(np.concatenate(lon), np.concatenate(lat))
+        return cls(indices.T, weights.T, nside)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """Shape of the operator as a matrix, `(Npix, Nhealpix)`."""
+        return self.indices.shape[0], hp.nside2npix(self.nside)
+
+    def apply(self, sky_maps: npt.ArrayLike) -> npt.ArrayLike:
+        """
+        Interpolate one or more HEALPix maps onto the beam pixels.
+
+        Args:
+            sky_maps (array_like):
+                Map(s) of shape `(..., 12 * nside**2)`, in RING ordering.
+
+        Returns:
+            values (array_like):
+                Interpolated values of shape `(..., Npix)`.
+
+        """
+        sky_maps = np.asarray(sky_maps)
+        assert sky_maps.shape[-1] == self.shape[1], \
+               "maps have %d pixels, expected %d" % (sky_maps.shape[-1], self.shape[1])
+        return np.einsum("pk,...pk->...p", self.weights, sky_maps[..., self.indices])
+
+    def save(self, path: str) -> None:
+        """Write the operator to an `.npz` file."""
+        np.savez(path, indices=self.indices, weights=self.weights, nside=self.nside)
+
+    @classmethod
+    def load(cls, path: str) -> "SkyInterpolator":
+        """Read an operator written by `save`."""
+        with np.load(path) as data:
+            return cls(data["indices"], data["weights"], int(data["nside"]))
+
+
+class SkyModel:
+    """
+    Reference temperature map, loaded once and reused for every beam.
+
+    Reading the map, building the HEALPix object, transforming the beam
+    pixels to Galactic coordinates and interpolating the map onto them are
+    the same for every antenna on the same beam grid, location and
+    observation time. This class does the first two once, and keeps the
+    interpolation operators (see `SkyInterpolator`) and interpolated maps of
+    the most recently used grids, locations and times.
+    """
+
+    def __init__(self, ref_map_path: str = DEFAULT_REF_MAP_PATH,
+                 location: Optional[EarthLocation] = None,
+                 obstime: Optional[Time] = None,
+                 maxsize: int = 16) -> None:
+        """
+        Loads the reference map.
+
+        Args:
+            ref_map_path (str):
+                Path to the HEALPix reference map, in Galactic coordinates and
+                RING ordering. Defaults to the Haslam 408 MHz map.
+            location (astropy.EarthLocation):
+                Default observer location. Defaults to Jodrell Bank.
+            obstime (astropy.Time):
+                Default observation time. Defaults to `2025-08-01 22:00:00Z`.
+            maxsize (int):
+                Maximum number of grid/location/time combinations kept; the
+                least recently used is dropped first.
+
+        """
+        self.ref_map_path = ref_map_path
+        self.ref_map = hp.fitsfunc.read_map(ref_map_path) # load map from fits file
+
+        self.location = default_location() if location is None else location
+        self.obstime = default_obstime() if obstime is None else obstime
+
+        self.nside = hp.npix2nside(self.ref_map.size) # map is assumed to be in Galactic coords
+
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+
+    @staticmethod
+    def cache_key(beam_alt_deg: npt.ArrayLike, beam_az_deg: npt.ArrayLike,
+                  location: EarthLocation, obstime: Time) -> tuple:
+        """Key identifying a beam grid, observer location and observation time."""
+        alt = np.ascontiguousarray(beam_alt_deg, dtype=float)
+        az = np.ascontiguousarray(beam_az_deg, dtype=float)
+        grid_hash = hashlib.sha1(alt.tobytes() + az.tobytes(), usedforsecurity=False).hexdigest()
+        loc = tuple(float(c.to_value(u.m)) for c in location.geocentric)
+        times = (np.ravel(obstime.jd1).tobytes(), np.ravel(obstime.jd2).tobytes())
+        return (alt.shape, grid_hash, loc, obstime.scale, obstime.shape, times)
+
+    def interpolator(self, beam_alt_deg: npt.ArrayLike, beam_az_deg: npt.ArrayLike,
+                     location: Optional[EarthLocation] = None,
+                     obstime: Optional[Time] = None) -> SkyInterpolator:
+        """
+        Interpolation operator from maps at the model's resolution onto the beam pixels.
+
+        Args:
+            beam_alt_deg (array_like):
+                Altitude of each beam pixel, in degrees.
+            beam_az_deg (array_like):
+                Azimuth of each beam pixel, in degrees.
+            location (astropy.EarthLocation):
+                Observer location. Defaults to the model's location.
+            obstime (astropy.Time):
+                Observation time, or 1D array of times. Defaults to the model's time.
+
+        Returns:
+            interpolator (SkyInterpolator):
+                Operator that can be applied to any map with the same nside
+                as the reference map.
+
+        """
+        return self._lookup(beam_alt_deg, beam_az_deg, location, obstime)[0]
+
+    def tmap(self, beam_alt_deg: npt.ArrayLike, beam_az_deg: npt.ArrayLike,
+             location: Optional[EarthLocation] = None,
+             obstime: Optional[Time] = None) -> npt.ArrayLike:
+        """
+        Reference map interpolated onto the beam pixels.
+
+        Args:
+            beam_alt_deg (array_like):
+                Altitude of each beam pixel, in degrees.
+            beam_az_deg (array_like):
+                Azimuth of each beam pixel, in degrees.
+            location (astropy.EarthLocation):
+                Observer location. Defaults to the model's location.
+            obstime (astropy.Time):
+                Observation time. Defaults to the model's time. May hold a 1D
+                array of times, e.g. for a drift scan.
+
+        Returns:
+            tmap (array_like):
+                Read-only array with the reference map temperature at each
+                (flattened) beam pixel, of shape `(Npix,)`, or `(Ntimes, Npix)`
+                for an array of times.
+
+        """
+        return self._lookup(beam_alt_deg, beam_az_deg, location, obstime)[1]
+
+    def _lookup(self, beam_alt_deg: npt.ArrayLike, beam_az_deg: npt.ArrayLike,
+                location: Optional[EarthLocation],
+                obstime: Optional[Time]) -> tuple[SkyInterpolator, npt.ArrayLike]:
+        """Cached interpolation operator and interpolated reference map."""
+        location = self.location if location is None else location
+        obstime = self.obstime if obstime is None else obstime
+
+        key = self.cache_key(beam_alt_deg, beam_az_deg, location, obstime)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        interpolator = SkyInterpolator.from_beam_grid(beam_alt_deg, beam_az_deg, self.nside,
+                                                      location=location, obstime=obstime)
+        tmap = interpolator.apply(self.ref_map).reshape(*obstime.shape, -1)
+        tmap.flags.writeable = False
+
+        self._cache[key] = (interpolator, tmap)
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return self._cache[key]
@@ -0,0 +1,287 @@
+"""
+Runs antenna simulations for a batch of Genotypes as a single SLURM job array.
+
+Submitting one job per individual floods the scheduler, so the whole batch
+is packed into one array job: each array task simulates a chunk of
+`chunk_size` individuals, one after the other, in the same work directories
+LocalSimulationRunner uses. The job is then polled until it has left the
+queue, and each individual's exit status and UAN files are collected.
+
+The scheduler is only reached through the `sbatch` and `squeue` commands,
+which can be replaced, e.g. to add options such as a partition or account
+(`"sbatch --partition=gpu"`), or by a fake scheduler in tests.
+
+This module provides:
+- SlurmSimulationRunner: submits a batch as a job array, waits for it, and
+  resubmits the individuals that failed
+"""
+import math
+import pathlib
+import shlex
+import shutil
+import subprocess
+import time
+from typing import Optional
+
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.parameters import ParametersObject
+from src.GENETIS_RHINO.simulation_runner import (
+    LOG_FILENAME,
+    UAN_DIRNAME,
+    LocalSimulationRunner,
+    SimulationResult,
+)
+
+EXIT_STATUS_FILENAME = "exit_status"
+
+
+class SlurmSimulationRunner(LocalSimulationRunner):
+    """
+    Runs a simulator command for each Genotype of a batch as the tasks of one SLURM job array.
+
+    The i-th array task simulates individuals `i * chunk_size` to
+    `(i + 1) * chunk_size - 1`; at most `max_jobs` tasks run at once. Each
+    simulation records its exit status in its work directory, and fails if
+    the status is non-zero or missing (e.g. the task was cancelled or hit
+    its time limit), if it ran for longer than `timeout`, or if it wrote no
+    UAN files. The individuals that failed are resubmitted together as a new
+    job array, up to `retries` times; those that still fail are returned
+    with `ok` False, for the caller to requeue.
+
+    :param command: The simulator command template, see `simulation_runner`.
+    :type command: str or list[str]
+    :param run_dir: Directory in which work directories are created. It must
+    be visible from the compute nodes.
+    :type run_dir: str
+    :param max_jobs: The maximum number of array tasks running at once.
+    :type max_jobs: int
+    :param timeout: The maximum time per simulation, in s, or None for no limit.
+    :type timeout: float, optional
+    :param retries: The number of times failed simulations are resubmitted.
+    :type retries: int
+    :param chunk_size: The number of individuals simulated by each array task.
+    :type chunk_size: int
+    :param sbatch: The submission command; `--parsable` and the job script are appended.
+    :type sbatch: str or list[str]
+    :param squeue: The queue listing command; options selecting the job are appended.
+    :type squeue: str or list[str]
+    :param poll_interval: Seconds between queue checks.
+    :type poll_interval: float
+    :param max_failed_polls: The number of queue checks in a row that may fail before giving up.
+    :type max_failed_polls: int
+    """
+
+    # Each run submits a job array, so running one Genotype at a time floods the scheduler
+    batch_only = True
+
+    def __init__(self, command: str | list[str], run_dir: str, max_jobs: int = 1,
+                 timeout: Optional[float] = None, retries: int = 0, chunk_size: int = 1,
+                 sbatch: str | list[str] = "sbatch", squeue: str | list[str] = "squeue",
+                 poll_interval: float = 30., max_failed_polls: int = 10) -> None:
+        """
+        SlurmSimulationRunner constructor.
+
+        :param command: The simulator command template, see `simulation_runner`.
+        :type command: str or list[str]
+        :param run_dir: Directory in which work directories are created.
+        :type run_dir: str
+        :param max_jobs: The maximum number of array tasks running at once.
+        :type max_jobs: int
+        :param timeout: The maximum time per simulation, in s, or None for no limit.
+        :type timeout: float, optional
+        :param retries: The number of times failed simulations are resubmitted.
+        :type retries: int
+        :param chunk_size: The number of individuals simulated by each array task.
+        :type chunk_size: int
+        :param sbatch: The submission command.
+        :type sbatch: str or list[str]
+        :param squeue: The queue listing command.
+        :type squeue: str or list[str]
+        :param poll_interval: Seconds between queue checks.
+        :type poll_interval: float
+        :param max_failed_polls: The number of queue checks in a row that may fail.
+        :type max_failed_polls: int
+        :rtype: None
+        """
+        super().__init__(command, run_dir, max_jobs, timeout, retries)
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be greater than zero.")
+        self.chunk_size = chunk_size
+        self.sbatch = shlex.split(sbatch) if isinstance(sbatch, str) else list(sbatch)
+        self.squeue = shlex.split(squeue) if isinstance(squeue, str) else list(squeue)
+        self.poll_interval = poll_interval
+        self.max_failed_polls = max_failed_polls
+
+    @classmethod
+    def from_config(cls, cfg: ParametersObject) -> "SlurmSimulationRunner":
+        """
+        Build a runner from the simulation parameters of the config.
+
+        On top of those of LocalSimulationRunner, these are
+        `slurm_chunk_size`, `sbatch_command`, `squeue_command`,
+        `slurm_poll_interval` and `slurm_max_failed_polls`;
+        `max_simulation_jobs` limits the number of array tasks running at once.
+
+        :param cfg: Configuration object.
+        :type cfg: ParametersObject
+        :rtype: SlurmSimulationRunner
+        """
+        timeout = cfg.simulation_timeout if cfg.simulation_timeout > 0 else None
+        return cls(cfg.simulator_command, cfg.simulation_run_dir, cfg.max_simulation_jobs,
+                   timeout, cfg.simulation_retries, cfg.slurm_chunk_size,
+                   cfg.sbatch_command, cfg.squeue_command, cfg.slurm_poll_interval,
+                   cfg.slurm_max_failed_polls)
+
+    def simulation_line(self, work_dir: pathlib.Path) -> str:
+        """The shell line that simulates one individual and records its exit status."""
+        command = shlex.join(self.command_for(work_dir))
+        if self.timeout is not None:
+            command = f"timeout {self.timeout:g} {command}"
+        work_dir = shlex.quote(str(work_dir))
+        return (f"cd {work_dir} && {command} >> {LOG_FILENAME} 2>&1; "
+                f"echo $? > {work_dir}/{EXIT_STATUS_FILENAME}")
+
+    def write_job(self, work_dirs: list[pathlib.Path], attempt: int) -> pathlib.Path:
+        """
+        Write the job array script simulating `work_dirs`, and one task script per chunk.
+
+        :param work_dirs: Absolute work directories, all in the same batch.
+        :type work_dirs: list[pathlib.Path]
+        :param attempt: The submission number, used to name the scripts.
+        :type attempt: int
+        :return: The job array script.
+        :rtype: pathlib.Path
+        """
+        batch_dir = work_dirs[0].parent
+        task_dir = batch_dir / f"tasks_{attempt}"
+        task_dir.mkdir()
+        num_tasks = math.ceil(len(work_dirs) / self.chunk_size)
+        for task in range(num_tasks):
+            chunk = work_dirs[task * self.chunk_size:(task + 1) * self.chunk_size]
+            (task_dir / f"{task}.sh").write_text(
+                "#!/bin/bash\n" + "".join(self.simulation_line(w) + "\n" for w in chunk))
+
+        job_script = batch_dir / f"job_{attempt}.sh"
+        job_script.write_text(
+            "#!/bin/bash\n"
+            f"#SBATCH --job-name=rhino_{batch_dir.name}\n"
+            f"#SBATCH --array=0-{num_tasks - 1}%{self.max_jobs}\n"
+            f"#SBATCH --output={batch_dir}/slurm_{attempt}_%a.out\n"
+            f'bash {shlex.quote(str(task_dir))}/"$SLURM_ARRAY_TASK_ID".sh\n')
+        return job_script
+
+    def submit(self, job_script: pathlib.Path) -> str:
+        """
+        Submit a job script.
+
+        :param job_script: The job script.
+        :type job_script: pathlib.Path
+        :raises RuntimeError: If the job could not be submitted.
+        :return: The job ID.
+        :rtype: str
+        """
+        process = subprocess.run([*self.sbatch, "--parsable", str(job_script)],  # noqa: S603
+                                 capture_output=True, text=True, check=False)
+        if process.returncode != 0:
+            raise RuntimeError(f"Submitting {job_script} failed: {process.stderr.strip()}")
+        # --parsable prints "jobid" or "jobid;cluster"
+        return process.stdout.strip().split(";")[0]
+
+    def in_queue(self, job_id: str) -> Optional[bool]:
+        """
+        Whether any task of a job is still pending or running.
+
+        The controller forgets finished jobs after a while, and squeue then
+        fails with "Invalid job id"; such a job has finished.
+
+        :param job_id: The job ID.
+        :type job_id: str
+        :return: Whether the job is queued, or None if the queue could not be
+        listed, e.g. because the controller is busy.
+        :rtype: bool, optional
+        """
+        process = subprocess.run([*self.squeue, "--noheader", "--format=%i", "--jobs", job_id],  # noqa: S603
+                                 capture_output=True, text=True, check=False)
+        if process.returncode == 0:
+            return bool(process.stdout.strip())
+        if "Invalid job id" in process.stderr:
+            return False
+        return None
+
+    def wait(self, job_id: str) -> None:
+        """
+        Poll the queue until a job has finished.
+
+        :param job_id: The job ID.
+        :type job_id: str
+        :raises RuntimeError: If more than `max_failed_polls` queue checks in a row fail.
+        :rtype: None
+        """
+        failed_polls = 0
+        while (queued := self.in_queue(job_id)) is not False:
+            failed_polls = failed_polls + 1 if queued is None else 0
+            if failed_polls > self.max_failed_polls:
+                raise RuntimeError(f"Could not list job {job_id} in the queue {failed_polls} times in a row")
+            time.sleep(self.poll_interval)
+
+    def collect(self, work_dir: pathlib.Path) -> Optional[str]:
+        """
+        Check the outcome of one individual's simulation.
+
+        :param work_dir: The individual's work directory.
+        :type work_dir: pathlib.Path
+        :return: Why the simulation failed, or None if it succeeded.
+        :rtype: str, optional
+        """
+        status_file = work_dir / EXIT_STATUS_FILENAME
+        if not status_file.exists():
+            return "did not finish"
+        status = status_file.read_text().strip()
+        if status == "124" and self.timeout is not None:
+            return f"timed out after {self.timeout} s"
+        if status != "0":
+            return f"exited with status {status}"
+        if not any((work_dir / UAN_DIRNAME).glob("*.uan")):
+            return "wrote no UAN files"
+        return None
+
+    def run(self, genotypes: list[Genotype]) -> list[SimulationResult]:
+        """
+        Simulate a batch of Genotypes in one job array, resubmitting failures.
+
+        :param genotypes: The Genotypes to simulate.
+        :type genotypes: list[Genotype]
+        :raises RuntimeError: If a job could not be submitted.
+        :return: The result of each Genotype's simulation, in the same order.
+        :rtype: list[SimulationResult]
+        """
+        work_dirs = [w.resolve() for w in self.prepare(genotypes)]
+        attempts = [0] * len(work_dirs)
+        errors = [None] * len(work_dirs)
+        start = time.monotonic()
+
+        todo = list(range(len(work_dirs)))
+        for attempt in range(1, self.retries + 2):
+            if not todo:
+                break
+            for i in todo:
+                shutil.rmtree(work_dirs[i] / UAN_DIRNAME, ignore_errors=True)
+                (work_dirs[i] / UAN_DIRNAME).mkdir()
+                (work_dirs[i] / EXIT_STATUS_FILENAME).unlink(missing_ok=True)
+                attempts[i] += 1
+
+            job_id = self.submit(self.write_job([work_dirs[i] for i in todo], attempt))
+            print(f"Submitted {len(todo)} simulations as job array {job_id}")
+            self.wait(job_id)
+
+            for i in todo:
+                errors[i] = self.collect(work_dirs[i])
+                if errors[i] is not None:
+                    with (work_dirs[i] / LOG_FILENAME).open("a") as log:
+                        log.write(f"--- attempt {attempt} failed: {errors[i]}\n")
+            todo = [i for i in todo if errors[i] is not None]
+
+        elapsed = time.monotonic() - start
+        return [SimulationResult(i, str(w), str(w / UAN_DIRNAME), errors[i] is None,
+                                 attempts[i], elapsed, errors[i])
+                for i, w in enumerate(work_dirs)]
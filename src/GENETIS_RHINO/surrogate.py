@@ -0,0 +1,224 @@
+"""
+Surrogate model of the fitness function, used to pre-screen offspring.
+
+A full fitness evaluation is a simulation, but most offspring end up in
+dominated fronts and are truncated straight away. The surrogate is trained on
+every genotype evaluated so far and predicts the objectives of new ones, so
+the evolver can generate more offspring than it needs and only send the most
+promising to the true fitness function.
+
+This module provides:
+- genotype_features: a Genotype's genes as a vector
+- RBFSurrogate: Gaussian radial basis function regression of every objective
+- make_surrogate: builds the surrogate configured in the config, if any
+"""
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.parameters import ParametersObject
+from src.GENETIS_RHINO.phenotype import FULL_FIDELITY
+
+
+def genotype_features(genotype: Genotype) -> npt.ArrayLike:
+    """
+    A Genotype's genes as a vector.
+
+    :param genotype: The Genotype.
+    :type genotype: Genotype
+    :return: The horn genes followed by the genes of each WallPair, with
+    has_ridge as 0 or 1.
+    :rtype: numpy.ndarray
+    """
+    def flatten(value: object) -> list:
+        if isinstance(value, tuple):
+            return [v for item in value for v in flatten(item)]
+        return [float(value)]
+
+    return np.array(flatten(genotype.genes()))
+
+
+class RBFSurrogate:
+    """
+    Gaussian radial basis function regression of every objective.
+
+    The archive holds the features and true fitness scores of the most
+    recently evaluated, distinct genotypes. Features are scaled to the range
+    of the archive and objectives are standardised, then a single kernel
+    system is solved for all objectives at once. The kernel width is the
+    median distance between archived genotypes.
+
+    :param pool_factor: How many times more offspring to generate than are
+    evaluated.
+    :type pool_factor: float
+    :param min_archive: The number of evaluated genotypes needed before the
+    surrogate is used.
+    :type min_archive: int
+    :param max_archive: The maximum number of genotypes trained on.
+    :type max_archive: int
+    :param smoothing: Ridge regularisation added to the kernel diagonal.
+    :type smoothing: float
+    """
+
+    def __init__(self, pool_factor: float = 2., min_archive: int = 50,
+                 max_archive: int = 1000, smoothing: float = 1e-6) -> None:
+        """
+        RBFSurrogate constructor.
+
+        :param pool_factor: How many times more offspring to generate than
+        are evaluated.
+        :type pool_factor: float
+        :param min_archive: The number of evaluated genotypes needed before
+        the surrogate is used.
+        :type min_archive: int
+        :param max_archive: The maximum number of genotypes trained on.
+        :type max_archive: int
+        :param smoothing: Ridge regularisation added to the kernel diagonal.
+        :type smoothing: float
+        :rtype: None
+        """
+        if pool_factor < 1:
+            raise ValueError("pool_factor must be at least 1.")
+        if not 1 <= min_archive <= max_archive:
+            raise ValueError("min_archive must be between 1 and max_archive.")
+        self.pool_factor = pool_factor
+        self.min_archive = min_archive
+        self.max_archive = max_archive
+        self.smoothing = smoothing
+
+        self.archive = OrderedDict()
+        self.objectives = None
+        self.accuracy_history = []
+        self._model = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether enough genotypes have been evaluated to use the surrogate."""
+        return len(self.archive) >= self.min_archive
+
+    def observe(self, population: list) -> None:
+        """
+        Add evaluated individuals to the archive.
+
+        Individuals without full-fidelity fitness are skipped; a genotype
+        already in the archive is only moved to the most recent end.
+
+        :param population: Phenotypes.
+        :type population: list[Phenotype]
+        :rtype: None
+        """
+        for indiv in population:
+            if indiv.fitness_fidelity != FULL_FIDELITY:
+                continue
+            if self.objectives is None:
+                self.objectives = list(indiv.fitness_scores)
+            key = indiv.genotype.canonical_hash()
+            if key in self.archive:
+                self.archive.move_to_end(key)
+                continue
+            scores = [indiv.fitness_scores[obj] for obj in self.objectives]
+            self.archive[key] = (genotype_features(indiv.genotype), np.array(scores, dtype=float))
+            self._model = None
+        while len(self.archive) > self.max_archive:
+            self.archive.popitem(last=False)
+
+    def _fit(self) -> tuple:
+        """Solve the kernel system for the current archive."""
+        x = np.array([features for features, _ in self.archive.values()])
+        y = np.array([scores for _, scores in self.archive.values()])
+
+        x_min = x.min(axis=0)
+        x_range = np.where(x.max(axis=0) > x_min, x.max(axis=0) - x_min, 1.)
+        x = (x - x_min) / x_range
+        y_mean = y.mean(axis=0)
+        y_std = np.where(y.std(axis=0) > 0, y.std(axis=0), 1.)
+
+        dist = np.sqrt(((x[:, np.newaxis] - x[np.newaxis]) ** 2).sum(axis=-1))
+        width = np.median(dist[dist > 0]) if np.any(dist > 0) else 1.
+        kernel = np.exp(-(dist / width) ** 2) + self.smoothing * np.eye(len(x))
+        weights = np.linalg.lstsq(kernel, (y - y_mean) / y_std, rcond=None)[0]
+        return x, x_min, x_range, y_mean, y_std, width, weights
+
+    def predict(self, genotypes: list[Genotype]) -> list[dict]:
+        """
+        Predict the fitness scores of Genotypes.
+
+        :param genotypes: The Genotypes.
+        :type genotypes: list[Genotype]
+        :return: The predicted fitness scores of each Genotype.
+        :rtype: list[dict]
+        """
+        if not self.ready:
+            raise RuntimeError("The surrogate needs at least %d evaluated genotypes, it has %d."
+                               % (self.min_archive, len(self.archive)))
+        if self._model is None:
+            self._model = self._fit()
+        x, x_min, x_range, y_mean, y_std, width, weights = self._model
+
+        new_x = (np.array([genotype_features(g) for g in genotypes]) - x_min) / x_range
+        dist = np.sqrt(((new_x[:, np.newaxis] - x[np.newaxis]) ** 2).sum(axis=-1))
+        predicted = y_mean + y_std * (np.exp(-(dist / width) ** 2) @ weights)
+        return [dict(zip(self.objectives, row.tolist(), strict=True)) for row in predicted]
+
+    def record_accuracy(self, generation_num: int, predicted: list[dict],
+                        actual: list[dict]) -> dict:
+        """
+        Log how well the predictions of a generation matched the true fitness scores.
+
+        Two numbers are averaged over the objectives: the Spearman rank
+        correlation, which is what matters for pre-screening, and the RMS
+        error in units of the objective's standard deviation in the archive.
+
+        :param generation_num: The generation the predictions were made for.
+        :type generation_num: int
+        :param predicted: Predicted fitness scores.
+        :type predicted: list[dict]
+        :param actual: True fitness scores of the same individuals.
+        :type actual: list[dict]
+        :return: The logged accuracy, also appended to `accuracy_history`.
+        :rtype: dict
+        """
+        def ranks(values: npt.ArrayLike) -> npt.ArrayLike:
+            return np.argsort(np.argsort(values, axis=0), axis=0)
+
+        pred = np.array([[p[obj] for obj in self.objectives] for p in predicted])
+        true = np.array([[a[obj] for obj in self.objectives] for a in actual])
+        scale = np.array([scores for _, scores in self.archive.values()]).std(axis=0)
+        scale = np.where(scale > 0, scale, 1.)
+
+        correlations = []
+        if len(pred) > 1:
+            for p_rank, t_rank in zip(ranks(pred).T, ranks(true).T, strict=True):
+                if p_rank.std() > 0 and t_rank.std() > 0:
+                    correlations.append(np.corrcoef(p_rank, t_rank)[0, 1])
+
+        accuracy = {
+            "generation": generation_num,
+            "archive_size": len(self.archive),
+            "num_evaluated": len(pred),
+            "spearman": float(np.mean(correlations)) if correlations else float("nan"),
+            "normalized_rmse": float(np.mean(np.sqrt(np.mean((pred - true) ** 2, axis=0)) / scale)),
+        }
+        self.accuracy_history.append(accuracy)
+        print(f"Generation {generation_num}: surrogate spearman={accuracy['spearman']:.3f} "
+              f"normalized_rmse={accuracy['normalized_rmse']:.3f} "
+              f"(trained on {accuracy['archive_size']})")
+        return accuracy
+
+
+def make_surrogate(cfg: ParametersObject) -> Optional[RBFSurrogate]:
+    """
+    Build the surrogate configured by `cfg.surrogate_pool_factor`, if any.
+
+    :param cfg: Configuration object.
+    :type cfg: ParametersObject
+    :return: The surrogate, or None if `surrogate_pool_factor` is at most 1.
+    :rtype: RBFSurrogate, optional
+    """
+    if cfg.surrogate_pool_factor <= 1:
+        return None
+    return RBFSurrogate(cfg.surrogate_pool_factor, cfg.surrogate_min_archive,
+                        cfg.surrogate_max_archive)
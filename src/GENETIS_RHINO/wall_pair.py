@@ -5,6 +5,7 @@ This module provides:
 - generate_without_ridge: randomly generates a WallPair without a ridge.
 - generate_with_ridge: randomly generates a WallPair with a ridge.
 - generate_list: randomly generates a list of WallPairs.
+- genes: the WallPair's genes, used for equality and hashing.
 """
 import random
 from typing import Optional
@@ -114,6 +115,30 @@ class WallPair:
         self.ridge_thickness_top = ridge_thickness_top
         self.ridge_thickness_bottom = ridge_thickness_bottom
 
+    def genes(self) -> tuple:
+        """
+        WallPair genes.
+
+        The values that define the wall pair, in a fixed order. Two WallPairs
+        are equal, and hash the same, if their genes are equal.
+
+        :return: has_ridge followed by the angle and ridge genes.
+        :rtype: tuple
+        """
+        return (self.has_ridge, self.angle, self.ridge_height,
+                self.ridge_width_top, self.ridge_width_bottom,
+                self.ridge_thickness_top, self.ridge_thickness_bottom)
+
+    def __eq__(self, other: object) -> bool:
+        """Whether two WallPairs have the same genes."""
+        if not isinstance(other, WallPair):
+            return NotImplemented
+        return self.genes() == other.genes()
+
+    def __hash__(self) -> int:
+        """Hash of the WallPair's genes. Changes if the WallPair is mutated."""
+        return hash(self.genes())
+
     def generate_without_ridge(self, rand: random.Random) -> "WallPair":
         """
         Generates a WallPair without a ridge.
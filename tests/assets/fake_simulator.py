@@ -0,0 +1,35 @@
+"""Stand-in for the antenna simulator: writes the example UAN files to the output directory."""
+import argparse
+import json
+import pathlib
+import shutil
+import time
+
+EXAMPLE_UAN_DIR = pathlib.Path(__file__).parent / "uan_example" / "0"
+
+parser = argparse.ArgumentParser()
+parser.add_argument("genotype_file")
+parser.add_argument("uan_dir")
+parser.add_argument("--sleep", type=float, default=0., help="seconds to run for")
+parser.add_argument("--fail-attempts", type=int, default=0, help="number of attempts that fail first")
+parser.add_argument("--no-output", action="store_true", help="exit successfully without writing UAN files")
+parser.add_argument("--corrupt", action="store_true", help="exit successfully after writing a truncated UAN file")
+args = parser.parse_args()
+
+with open(args.genotype_file) as f:
+    genes = json.load(f)
+print("simulating flare_length =", genes["flare_length"])
+
+attempts_file = pathlib.Path("attempts")
+attempt = int(attempts_file.read_text()) + 1 if attempts_file.exists() else 1
+attempts_file.write_text(str(attempt))
+
+time.sleep(args.sleep)
+if attempt <= args.fail_attempts:
+    raise SystemExit(1)
+if not args.no_output:
+    for uan in EXAMPLE_UAN_DIR.glob("*.uan"):
+        shutil.copy(uan, pathlib.Path(args.uan_dir) / uan.name)
+    if args.corrupt:
+        data = uan.read_bytes()
+        (pathlib.Path(args.uan_dir) / uan.name).write_bytes(data[:len(data) // 2])
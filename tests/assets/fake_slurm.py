@@ -0,0 +1,82 @@
+"""
+Stand-in for the SLURM sbatch and squeue commands.
+
+`fake_slurm.py sbatch --state-dir D [--drop-task K] [--reject] --parsable job.sh`
+runs the tasks of the job array in a background process and prints the job ID.
+`fake_slurm.py squeue --state-dir D [--purge] [--down] --noheader --format=%i --jobs ID`
+lists the job while its tasks are still running. With `--purge` finished jobs
+are unknown, and with `--down` the controller cannot be reached.
+"""
+import argparse
+import os
+import pathlib
+import re
+import subprocess
+import sys
+
+
+def sbatch(args):
+    if args.reject:
+        sys.exit("sbatch: error: invalid partition specified")
+    state_dir = pathlib.Path(args.state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    job_id = str(len(list(state_dir.glob("*.job"))) + 1)
+    (state_dir / f"{job_id}.job").write_text(args.script)
+    (state_dir / f"{job_id}.running").touch()
+    subprocess.Popen([sys.executable, __file__, "run", args.state_dir, job_id, args.script,
+                      str(args.drop_task)], start_new_session=True,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    print(job_id + ";fake_cluster")
+
+
+def run(args):
+    script = pathlib.Path(args.script).read_text()
+    first, last = re.search(r"#SBATCH --array=(\d+)-(\d+)", script).groups()
+    output = re.search(r"#SBATCH --output=(\S+)", script).group(1)
+    for task in range(int(first), int(last) + 1):
+        if task == args.drop_task:
+            continue
+        with open(output.replace("%a", str(task)), "w") as out:
+            subprocess.run(["bash", args.script], env={**os.environ, "SLURM_ARRAY_TASK_ID": str(task)},
+                           stdout=out, stderr=subprocess.STDOUT, check=False)
+    (pathlib.Path(args.state_dir) / f"{args.job_id}.running").unlink()
+
+
+def squeue(args):
+    if args.down:
+        sys.exit("slurm_load_jobs error: Unable to contact slurm controller (connect failure)")
+    if (pathlib.Path(args.state_dir) / f"{args.jobs}.running").exists():
+        print(args.jobs)
+    elif args.purge:
+        sys.exit("slurm_load_jobs error: Invalid job id specified")
+
+
+parser = argparse.ArgumentParser()
+commands = parser.add_subparsers(dest="command", required=True)
+
+sbatch_parser = commands.add_parser("sbatch")
+sbatch_parser.add_argument("--state-dir", required=True)
+sbatch_parser.add_argument("--drop-task", type=int, default=-1, help="array task that never runs")
+sbatch_parser.add_argument("--reject", action="store_true", help="refuse the submission")
+sbatch_parser.add_argument("--parsable", action="store_true")
+sbatch_parser.add_argument("script")
+sbatch_parser.set_defaults(func=sbatch)
+
+run_parser = commands.add_parser("run")
+run_parser.add_argument("state_dir")
+run_parser.add_argument("job_id")
+run_parser.add_argument("script")
+run_parser.add_argument("drop_task", type=int)
+run_parser.set_defaults(func=run)
+
+squeue_parser = commands.add_parser("squeue")
+squeue_parser.add_argument("--state-dir", required=True)
+squeue_parser.add_argument("--purge", action="store_true", help="forget finished jobs")
+squeue_parser.add_argument("--down", action="store_true", help="fail to reach the controller")
+squeue_parser.add_argument("--noheader", action="store_true")
+squeue_parser.add_argument("--format")
+squeue_parser.add_argument("--jobs", required=True)
+squeue_parser.set_defaults(func=squeue)
+
+args = parser.parse_args()
+args.func(args)
@@ -0,0 +1,14 @@
+import healpy as hp
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="session")
+def ref_map_path(tmp_path_factory):
+    """A small synthetic Galactic reference map, standing in for the Haslam map."""
+    nside = 16
+    theta, phi = hp.pix2ang(nside, np.arange(hp.nside2npix(nside)))
+    ref_map = 20. + 10. * np.cos(theta)**2 + 5. * np.sin(phi)
+    path = tmp_path_factory.mktemp("sky") / "ref_map.fits"
+    hp.write_map(str(path), ref_map)
+    return str(path)
@@ -2,6 +2,7 @@ import random
 import unittest
 
 import src.GENETIS_RHINO.evolver as E
+from src.GENETIS_RHINO.phenotype import FULL_FIDELITY, LOW_FIDELITY, Phenotype
 
 
 class MockPhenotype:
@@ -109,5 +110,49 @@ class NSGA2Test(unittest.TestCase):
         assert E.dominates(self.population[2], self.population[4])
         assert E.dominates(self.population[2], self.population[5])
 
+    def test_dominates_never_mixes_fidelities(self):
+        """Tests that individuals are compared at the highest fidelity they share."""
+        p = Phenotype(None, "p", "None", 0)
+        p.set_fitness({"1": 5, "2": 5}, LOW_FIDELITY)
+        p.set_fitness({"1": 1, "2": 1}, FULL_FIDELITY)
+        q = Phenotype(None, "q", "None", 0)
+        q.set_fitness({"1": 3, "2": 3}, LOW_FIDELITY)
+
+        # p's full-fidelity scores would dominate q, but only low fidelity is shared
+        assert E.dominates(q, p)
+        assert not E.dominates(p, q)
+
+        q.set_fitness({"1": 2, "2": 2}, FULL_FIDELITY)
+        assert E.dominates(p, q)
+        assert E.dominates(q, p, LOW_FIDELITY)
+
+        r = Phenotype(None, "r", "None", 0, {"1": 0, "2": 0})
+        s = Phenotype(None, "s", "None", 0)
+        s.set_fitness({"1": 9, "2": 9}, LOW_FIDELITY)
+        with self.assertRaises(ValueError):
+            E.dominates(r, s)
+
+    def test_insert_into_fronts_matches_full_sort(self):
+        """Inserting individuals one at a time gives the same ranks as sorting them all."""
+        rand = random.Random(2)
+        pool = [MockPhenotype(i, {str(obj): rand.randint(0, 20) for obj in range(3)}) for i in range(60)]
+        fronts = E.fast_non_dominated_sort(pool[:20])
+        for i in range(20, len(pool)):
+            E.insert_into_fronts(fronts, pool[i])
+            ranks = {indiv.indiv_id: indiv.nsgaii_rank for front in fronts for indiv in front}
+            expected = E.fast_non_dominated_sort(pool[:i + 1])
+            assert [{indiv.indiv_id for indiv in front} for front in fronts] == \
+                   [{indiv.indiv_id for indiv in front} for front in expected]
+            assert ranks == {indiv.indiv_id: indiv.nsgaii_rank for indiv in pool[:i + 1]}
+
+        # The least crowded individual of the last front is removed
+        for front in fronts:
+            E.crowding_distance_assignment(front)
+        last = list(fronts[-1])
+        worst = E.remove_worst(fronts)
+        assert worst in last
+        assert worst.nsgaii_distance == min(indiv.nsgaii_distance for indiv in last)
+        assert all(worst not in front for front in fronts)
+
 if __name__ == '__main__':
     unittest.main()
@@ -69,6 +69,25 @@ class GenotypeTest(unittest.TestCase):
         self.assertEqual(g.waveguide_length, 787.168507152181)
         self.assertEqual(g.waveguide_width, 329.5012478420334)
 
+    def test_equality_and_hash(self):
+        """Tests that Genotypes with the same genes are equal and hash the same."""
+        g1 = Genotype(self.cfg).generate_with_ridge(random.Random(self.SEED))
+        g2 = Genotype(self.cfg).generate_with_ridge(random.Random(self.SEED))
+
+        self.assertIsNot(g1, g2)
+        self.assertEqual(g1, g2)
+        self.assertEqual(hash(g1), hash(g2))
+        self.assertEqual(g1.canonical_hash(), g2.canonical_hash())
+
+        # Near-identical genotypes only match once quantized
+        g2.flare_length += 1e-9
+        self.assertNotEqual(g1, g2)
+        self.assertNotEqual(g1.canonical_hash(), g2.canonical_hash())
+        self.assertEqual(g1.canonical_hash(1e-6), g2.canonical_hash(1e-6))
+
+        g2.mutate(random.Random(self.SEED))
+        self.assertNotEqual(g1.canonical_hash(1e-6), g2.canonical_hash(1e-6))
+
 
 if __name__ == '__main__':
     unittest.main()
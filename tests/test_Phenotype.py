@@ -2,9 +2,10 @@ import random
 import unittest
 import pathlib
 
+from src.GENETIS_RHINO.fitness_evaluators import DummyFitnessEvaluator
 from src.GENETIS_RHINO.phenotype import Genotype
 from src.GENETIS_RHINO.parameters import ParametersObject
-from src.GENETIS_RHINO.phenotype import Phenotype
+from src.GENETIS_RHINO.phenotype import PendingFitnessError, Phenotype
 
 cfg = ParametersObject(str(pathlib.Path(
         __file__).parent.parent/"src/GENETIS_RHINO/config.toml"))
@@ -28,6 +29,13 @@ class PhenotypeTest(unittest.TestCase):
         self.assertEqual(p.indiv_id, "Kate")
         self.assertEqual(p.parent1_id, "None")
         self.assertEqual(p.generation_created, 0)
+
+        # fitness is pending until evaluated
+        self.assertTrue(p.fitness_pending)
+        with self.assertRaises(PendingFitnessError):
+            p.fitness_scores
+        self.assertEqual(DummyFitnessEvaluator().evaluate_pending([p]), 1)
+        self.assertFalse(p.fitness_pending)
         self.assertEqual(p.fitness_scores, {
             'flare_length': 2.4030927323372038,
             'waveguide_height': 877.9469895497862,
@@ -51,9 +59,15 @@ class PhenotypeTest(unittest.TestCase):
         # build valid parent phenotype
         g = Genotype(cfg).generate_without_ridge(random.Random(1))
         parent = Phenotype(g, "Kate", "None", 0)
+        DummyFitnessEvaluator().evaluate_pending([parent])
+        parent_scores = dict(parent.fitness_scores)
 
         # make a single offspring via asexual reproduction
         child = parent.make_offspring("Oona", 1, random.Random(1))
+        self.assertTrue(child.fitness_pending)
+        self.assertIsNot(child.genotype, parent.genotype)
+        self.assertEqual(parent.fitness_scores, parent_scores)
+        DummyFitnessEvaluator().evaluate_pending([parent, child])
 
         self.assertIsInstance(child.genotype, Genotype)
         self.assertEqual(child.indiv_id, "Oona")
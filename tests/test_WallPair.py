@@ -88,5 +88,18 @@ class WallPairTest(unittest.TestCase):
         self.assertEqual(wp.ridge_thickness_top, 49.54350870919409)
         self.assertEqual(wp.ridge_thickness_bottom, 44.949106478873816)
 
+    def test_equality_and_hash(self):
+        """Tests that WallPairs with the same genes are equal and hash the same."""
+        wp1 = WallPair(self.cfg).generate_with_ridge(random.Random(self.SEED))
+        wp2 = WallPair(self.cfg).generate_with_ridge(random.Random(self.SEED))
+
+        self.assertEqual(wp1, wp2)
+        self.assertEqual(hash(wp1), hash(wp2))
+        self.assertEqual(len({wp1, wp2}), 1)
+
+        wp2.has_ridge = False
+        self.assertNotEqual(wp1, wp2)
+
+
 if __name__ == '__main__':
     unittest.main()
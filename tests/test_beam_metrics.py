@@ -0,0 +1,108 @@
+import builtins
+import pathlib
+import shutil
+
+import numpy as np
+import pytest
+
+from src.GENETIS_RHINO.beam_metrics import (
+    BCFMetric,
+    BeamMetric,
+    BeamSnapshot,
+    PerFrequencyMetric,
+    beam_metric_convert_dict,
+    calculate_beam_metrics,
+    register_beam_metric,
+)
+from src.GENETIS_RHINO import fitness_functions
+from src.GENETIS_RHINO.fitness_functions import calculate_fitnesses, load_uan, load_uan_directory
+from src.GENETIS_RHINO.sky_model import SkyModel
+
+UAN_DIR = "tests/assets/uan_example/0"
+
+
+def test_bcf_metric_matches_calculate_fitnesses(ref_map_path):
+    """The fused engine gives the same BCF statistics as the full-cube path."""
+    sky = SkyModel(ref_map_path)
+    bcf = BCFMetric()
+    values = calculate_beam_metrics(UAN_DIR, metrics=[bcf], sky_model=sky)
+    expected = calculate_fitnesses(UAN_DIR, sky_model=sky)
+    assert values.keys() == expected.keys()
+    for key in expected:
+        assert values[key] == pytest.approx(expected[key], rel=1e-10)
+    assert bcf.bcf.shape == (load_uan_directory(UAN_DIR)[1].size,)
+
+
+def test_all_metrics_in_one_pass(ref_map_path):
+    """Every registered metric is evaluated, each file being read once."""
+    sky = SkyModel(ref_map_path)
+    values = calculate_beam_metrics(UAN_DIR, metrics=list(beam_metric_convert_dict), sky_model=sky)
+
+    beams_db, _, za, _ = load_uan_directory(UAN_DIR)
+    assert values["peak_gain_dB"] == pytest.approx(np.mean(beams_db.max(axis=(1, 2))))
+    assert values["directivity_dBi"] >= values["peak_gain_dB"] - 10.
+    assert 0 < values["hpbw_deg"] <= 2 * za.max()
+    assert values["sidelobe_level_dB"] <= 0
+    assert np.isfinite(values["front_to_back_dB"])
+
+
+def test_custom_metric(ref_map_path):
+    """A registered metric can be requested by name and sees every beam once, in linear power."""
+    calls = []
+
+    @register_beam_metric("min_gain")
+    class MinGainMetric(PerFrequencyMetric):
+        name = "min_gain"
+
+        def evaluate(self, beam, ctx):
+            calls.append(beam)
+            return beam.min()
+
+    try:
+        values = calculate_beam_metrics(UAN_DIR, metrics=["min_gain"])
+    finally:
+        del beam_metric_convert_dict["min_gain"]
+
+    beams_db, freqs, _, _ = load_uan_directory(UAN_DIR)
+    assert len(calls) == freqs.size
+    assert not calls[0].flags.writeable
+    assert values["min_gain"] == pytest.approx(np.mean(10.**(beams_db.min(axis=(1, 2))/10.)))
+    assert issubclass(MinGainMetric, BeamMetric)
+
+
+def test_plots_read_each_file_once(ref_map_path, monkeypatch):
+    """make_plots gets the first beam and the BCF from a single pass over the files."""
+    sky = SkyModel(ref_map_path)
+    snapshot = BeamSnapshot(0)
+    assert calculate_beam_metrics(UAN_DIR, metrics=[snapshot], sky_model=sky) == {}
+    beams_db = load_uan_directory(UAN_DIR)[0]
+    assert snapshot.beam_db == pytest.approx(beams_db[0])
+
+    loads = []
+    monkeypatch.setattr(fitness_functions, "load_uan", lambda fname, **kwargs: loads.append(fname) or load_uan(fname, **kwargs))
+    monkeypatch.setattr(fitness_functions.plt, "show", lambda: None)
+    fitness_functions.make_plots(UAN_DIR, sky_model=sky)
+    assert sorted(loads) == sorted(set(loads))
+    assert len(loads) == beams_db.shape[0]
+
+
+def test_replots_use_the_beam_cache(ref_map_path, tmp_path, monkeypatch):
+    """With the cache, re-plotting reads the memory-mapped cube instead of the UAN files."""
+    for fname in pathlib.Path(UAN_DIR).glob("*.uan"):
+        shutil.copy(fname, tmp_path / fname.name)
+    sky = SkyModel(ref_map_path)
+    monkeypatch.setattr(fitness_functions.plt, "show", lambda: None)
+    fitness_functions.make_plots(str(tmp_path), cache=True, sky_model=sky)
+    assert (tmp_path / ".uan_cache" / "beams.npy").exists()
+
+    opened = []
+    real_open = builtins.open
+    monkeypatch.setattr(builtins, "open", lambda file, *args, **kwargs: opened.append(str(file)) or
+                        real_open(file, *args, **kwargs))
+    fitness_functions.make_plots(str(tmp_path), cache=True, sky_model=sky)
+    assert not [fname for fname in opened if fname.endswith(".uan")]
+
+    # The cached cube gives the same metrics as reading the files
+    monkeypatch.undo()
+    expected = calculate_beam_metrics(str(tmp_path), sky_model=sky)
+    assert calculate_beam_metrics(str(tmp_path), sky_model=sky, cache=True) == pytest.approx(expected)
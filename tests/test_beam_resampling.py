@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from src.GENETIS_RHINO.beam_resampling import decimate_beams, resample_to_healpix, solid_angle_weights
+from src.GENETIS_RHINO.fitness_functions import calculate_fitnesses, load_uan_directory
+from src.GENETIS_RHINO.sky_model import SkyModel
+
+UAN_DIR = "tests/assets/uan_example/0"
+ZA = np.arange(0, 181)
+AZ = np.arange(0, 361)
+
+
+def test_solid_angle_weights_cover_sphere():
+    """The pixels of the UAN grid add up to the whole sphere, without the repeated az=360 column."""
+    weights = solid_angle_weights(ZA, AZ)
+    assert weights.shape == (ZA.size, AZ.size)
+    assert weights.sum() == pytest.approx(4 * np.pi)
+    assert np.all(weights[:, -1] == 0)
+    assert solid_angle_weights(ZA[::4], AZ[::4]).sum() == pytest.approx(4 * np.pi)
+
+
+def test_solid_angle_weights_last_cell():
+    """A grid that stops short of za=180 deg keeps the true width of its last cell."""
+    weights = solid_angle_weights(ZA[::7], AZ[::4])
+    last_edges = np.deg2rad([175 - 3.5, 175 + 3.5])
+    assert weights[-1].sum() == pytest.approx(2 * np.pi * (np.cos(last_edges[0]) - np.cos(last_edges[1])))
+    assert weights.sum() == pytest.approx(2 * np.pi * (1 - np.cos(last_edges[1])))
+
+
+def test_decimate_beams():
+    """Decimation keeps every n-th sample along both angles."""
+    beams = np.random.default_rng(0).normal(size=(3, ZA.size, AZ.size))
+    small, za, az = decimate_beams(beams, ZA, AZ, 4)
+    assert small.shape == (3, 46, 91)
+    assert np.array_equal(za, ZA[::4])
+    assert np.array_equal(small[:, 1, 1], beams[:, 4, 4])
+    with pytest.raises(ValueError):
+        decimate_beams(beams, ZA, AZ, 0)
+
+
+def test_decimate_while_loading():
+    """Dropping rows before they are parsed gives the same cube as decimating the full one."""
+    full = load_uan_directory(UAN_DIR)
+    for factor in (1, 4, 7):
+        beams, freqs, za, az = load_uan_directory(UAN_DIR, decimate=factor)
+        expected = decimate_beams(full[0], full[2], full[3], factor)
+        assert np.array_equal(beams, expected[0])
+        assert np.array_equal(freqs, full[1])
+        assert np.array_equal(za, expected[1])
+        assert np.array_equal(az, expected[2])
+    with pytest.raises(ValueError):
+        load_uan_directory(UAN_DIR, decimate=0)
+
+
+def test_resample_to_healpix():
+    """A beam that only depends on zenith angle is reproduced at the HEALPix pixel centres."""
+    beam_lin = 1. + np.cos(np.deg2rad(ZA))**2
+    beams_db = 10. * np.log10(np.repeat(beam_lin[:, None], AZ.size, axis=1))[None]
+    resampled, alt, az = resample_to_healpix(beams_db, ZA, AZ, nside=8)
+    assert resampled.shape == (1, 12 * 8**2)
+    expected = 1. + np.sin(np.deg2rad(alt))**2
+    assert 10.**(resampled[0]/10.) == pytest.approx(expected, rel=1e-3)
+    assert np.all((az >= 0) & (az < 360))
+
+
+def test_low_resolution_fitnesses(ref_map_path):
+    """Coarse grids give metrics close to the default full-resolution ones."""
+    sky = SkyModel(ref_map_path)
+    full = calculate_fitnesses(UAN_DIR, sky_model=sky)
+    assert calculate_fitnesses(UAN_DIR, sky_model=sky, decimate=1) == full
+    for kwargs in ({"decimate": 2}, {"nside": 32}):
+        coarse = calculate_fitnesses(UAN_DIR, sky_model=sky, **kwargs)
+        for name, value in full.items():
+            assert coarse[name] == pytest.approx(value, rel=0.05)
+
+    with pytest.raises(ValueError):
+        calculate_fitnesses(UAN_DIR, sky_model=sky, decimate=2, nside=32)
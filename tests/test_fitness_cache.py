@@ -0,0 +1,131 @@
+import pathlib
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.GENETIS_RHINO.fitness_cache import FitnessCache
+from src.GENETIS_RHINO.fitness_evaluators import (
+    CachedFitnessEvaluator,
+    DummyFitnessEvaluator,
+    make_fitness_evaluator,
+)
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.parameters import ParametersObject
+
+CONFIG_PATH = str(pathlib.Path(__file__).parent.parent / "src/GENETIS_RHINO/config.toml")
+
+
+class CountingEvaluator(DummyFitnessEvaluator):
+    """Dummy evaluator that records every genotype it is asked to score."""
+
+    def __init__(self, cfg=None):
+        super().__init__(cfg)
+        self.evaluated = []
+
+    def evaluate_batch(self, genotypes):
+        self.evaluated.extend(genotypes)
+        return super().evaluate_batch(genotypes)
+
+
+def put_range(path, start, stop):
+    """Store scores for keys start..stop from a separate process."""
+    cache = FitnessCache(path)
+    for i in range(start, stop):
+        cache.put(str(i), {"value": i})
+
+
+def test_hits_misses_and_persistence(tmp_path):
+    """Scores survive reopening the database, and lookups are counted."""
+    path = tmp_path / "fitness.sqlite"
+    cache = FitnessCache(path)
+    assert cache.get("a") is None
+    cache.put("a", {"rms": 1.5})
+    assert cache.get("a") == {"rms": 1.5}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    reopened = FitnessCache(path)
+    assert len(reopened) == 1
+    assert reopened.get_many(["a", "b", "a"]) == {"a": {"rms": 1.5}}
+    assert (reopened.hits, reopened.misses) == (1, 1)
+
+
+def test_eviction(tmp_path):
+    """The least recently used scores are evicted beyond max_entries."""
+    cache = FitnessCache(tmp_path / "fitness.sqlite", max_entries=2)
+    cache.put("a", {"x": 1})
+    cache.put("b", {"x": 2})
+    cache.get("a")
+    cache.put("c", {"x": 3})
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"x": 1}
+
+    with pytest.raises(ValueError):
+        FitnessCache(tmp_path / "other.sqlite", max_entries=0)
+
+
+def test_shared_between_processes(tmp_path):
+    """Several processes can write to the same cache."""
+    path = str(tmp_path / "fitness.sqlite")
+    FitnessCache(path)
+    with ProcessPoolExecutor(max_workers=3) as pool:
+        list(pool.map(put_range, [path] * 3, [0, 10, 20], [10, 20, 30]))
+    assert len(FitnessCache(path)) == 30
+
+
+def test_cached_evaluator_only_evaluates_misses(tmp_path):
+    """Known and duplicate genotypes are not dispatched to the wrapped evaluator."""
+    cfg = ParametersObject(CONFIG_PATH)
+    rand = random.Random(1)
+    genotypes = [Genotype(cfg).generate_with_ridge(rand) for _ in range(3)]
+    inner = CountingEvaluator()
+    evaluator = CachedFitnessEvaluator(inner, FitnessCache(tmp_path / "fitness.sqlite"), quantum=1e-6)
+
+    expected = DummyFitnessEvaluator().evaluate_batch(genotypes)
+    assert evaluator.evaluate_batch(genotypes + [genotypes[0]]) == expected + [expected[0]]
+    assert len(inner.evaluated) == 3
+
+    # A near-identical copy is a hit
+    near = Genotype(cfg, genotypes[1].flare_length + 1e-9, genotypes[1].waveguide_height,
+                    genotypes[1].waveguide_length, genotypes[1].waveguide_width, genotypes[1].walls)
+    assert evaluator.evaluate_batch([near, genotypes[2]]) == expected[1:]
+    assert len(inner.evaluated) == 3
+    assert (evaluator.cache.hits, evaluator.cache.misses) == (2, 3)
+
+
+def test_cache_keyed_by_evaluator_settings(tmp_path):
+    """Scores from another evaluator, or with other fitness settings, are not reused."""
+    cfg = ParametersObject(CONFIG_PATH)
+    cfg.fitness_cache_path = str(tmp_path / "fitness.sqlite")
+    cfg.uan_directory_root = str(tmp_path / "uan")
+    genotype = Genotype(cfg).generate_with_ridge(random.Random(1))
+
+    namespaces = set()
+    for name, setting, value in [("dummy", "uan_directory_root", str(tmp_path / "uan")),
+                                 ("uan", "uan_directory_root", str(tmp_path / "uan")),
+                                 ("uan", "uan_directory_root", str(tmp_path / "other")),
+                                 ("uan_coarse", "low_fidelity_decimate", 4),
+                                 ("uan_coarse", "low_fidelity_decimate", 2)]:
+        cfg.fitness_evaluator = name
+        setattr(cfg, setting, value)
+        evaluator = make_fitness_evaluator(cfg)
+        evaluator.cache.put(f"{evaluator.evaluator.cache_namespace}/{genotype.canonical_hash(evaluator.quantum)}",
+                            {"value": len(namespaces)})
+        namespaces.add(evaluator.evaluator.cache_namespace)
+    assert len(namespaces) == 5
+    assert len(FitnessCache(cfg.fitness_cache_path)) == 5
+
+    cfg.fitness_evaluator = "dummy"
+    evaluator = make_fitness_evaluator(cfg)
+    assert evaluator.evaluate_batch([genotype]) == [{"value": 0}]
+
+
+def test_cache_from_config(tmp_path):
+    """Setting fitness_cache_path wraps the configured evaluator."""
+    cfg = ParametersObject(CONFIG_PATH)
+    cfg.fitness_cache_path = str(tmp_path / "fitness.sqlite")
+    evaluator = make_fitness_evaluator(cfg)
+    assert isinstance(evaluator, CachedFitnessEvaluator)
+    assert isinstance(evaluator.evaluator, DummyFitnessEvaluator)
+    assert evaluator.quantum == cfg.fitness_cache_quantum
@@ -0,0 +1,259 @@
+import pathlib
+import random
+import shutil
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+import pytest
+
+from src.GENETIS_RHINO.dummy_fitness_func import DummyFitnessFunc
+from src.GENETIS_RHINO.fitness_cache import FitnessCache
+import src.GENETIS_RHINO.evolver as E
+from src.GENETIS_RHINO.fitness_evaluators import (
+    AbstractFitnessEvaluator,
+    CachedFitnessEvaluator,
+    DummyFitnessEvaluator,
+    TwoTierFitnessEvaluator,
+    UANFitnessEvaluator,
+    make_fitness_evaluator,
+)
+from src.GENETIS_RHINO.fitness_functions import calculate_fitnesses
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.manager import Manager
+from src.GENETIS_RHINO.parameters import ParametersObject
+from src.GENETIS_RHINO.phenotype import FULL_FIDELITY, LOW_FIDELITY
+from src.GENETIS_RHINO.sky_model import SkyModel
+
+CONFIG_PATH = str(pathlib.Path(__file__).parent.parent / "src/GENETIS_RHINO/config.toml")
+
+
+class CountingEvaluator(AbstractFitnessEvaluator):
+    """Custom evaluator that records the size of every batch."""
+
+    batch_sizes = []
+
+    def evaluate_batch(self, genotypes):
+        CountingEvaluator.batch_sizes.append(len(genotypes))
+        return [{"flare_length": g.flare_length, "waveguide_height": g.waveguide_height}
+                for g in genotypes]
+
+
+class FailingEvaluator(AbstractFitnessEvaluator):
+    """Custom evaluator for which every evaluation fails."""
+
+    def evaluate_batch(self, genotypes):
+        return [None] * len(genotypes)
+
+
+class FlakyEvaluator(AbstractFitnessEvaluator):
+    """Custom evaluator whose first evaluation of every third genotype fails."""
+
+    def __init__(self, cfg=None):
+        super().__init__(cfg)
+        self.seen = set()
+
+    def evaluate_batch(self, genotypes):
+        scores = []
+        for g in genotypes:
+            key = g.canonical_hash()
+            if key not in self.seen and len(self.seen) % 3 == 0:
+                scores.append(None)
+            else:
+                scores.append(DummyFitnessFunc(g).get_fitness_scores())
+            self.seen.add(key)
+        return scores
+
+
+class SlowEvaluator(AbstractFitnessEvaluator):
+    """Custom evaluator whose evaluations take varying time, several at once."""
+
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    @property
+    def max_workers(self):
+        return 3
+
+    def evaluate_batch(self, genotypes):
+        with SlowEvaluator.lock:
+            SlowEvaluator.running += 1
+            SlowEvaluator.max_running = max(SlowEvaluator.max_running, SlowEvaluator.running)
+        time.sleep(0.001 * (hash(genotypes[0].canonical_hash()) % 20))
+        with SlowEvaluator.lock:
+            SlowEvaluator.running -= 1
+        return [DummyFitnessFunc(g).get_fitness_scores() for g in genotypes]
+
+
+class FitnessEvaluatorTest(unittest.TestCase):
+    """A test class to test the fitness evaluators."""
+
+    def setUp(self):
+        self.cfg = ParametersObject(CONFIG_PATH)
+        self.cfg.population_size = 6
+
+    def test_dummy_evaluator(self):
+        """The default evaluator gives the DummyFitnessFunc scores."""
+        rand = random.Random(1)
+        genotypes = [Genotype(self.cfg).generate_with_ridge(rand) for _ in range(3)]
+        evaluator = make_fitness_evaluator(self.cfg)
+        self.assertIsInstance(evaluator, DummyFitnessEvaluator)
+        self.assertEqual(evaluator.evaluate_batch(genotypes),
+                         [DummyFitnessFunc(g).get_fitness_scores() for g in genotypes])
+
+    def test_custom_evaluator_called_once_per_generation(self):
+        """A custom evaluator named in the config scores each generation in one batch."""
+        self.cfg.fitness_evaluator = "tests.test_fitness_evaluators:CountingEvaluator"
+        CountingEvaluator.batch_sizes = []
+        manager = Manager(self.cfg)
+        self.assertIsInstance(manager.fitness_evaluator, CountingEvaluator)
+
+        manager.initialize_population(self.cfg)
+        manager.evolve_one_gen(1)
+        manager.evolve_one_gen(2)
+        self.assertEqual(CountingEvaluator.batch_sizes, [6, 6, 6])
+        for p in manager.population:
+            self.assertEqual(p.fitness_scores, {"flare_length": p.genotype.flare_length,
+                                                "waveguide_height": p.genotype.waveguide_height})
+
+    def test_two_tier_evaluation(self):
+        """Everyone gets cheap scores; only the leading cheap fronts get full scores."""
+        self.cfg.fitness_evaluator = "tests.test_fitness_evaluators:CountingEvaluator"
+        self.cfg.low_fidelity_evaluator = "dummy"
+        self.cfg.promote_fronts = 1
+        CountingEvaluator.batch_sizes = []
+        manager = Manager(self.cfg)
+        self.assertIsInstance(manager.fitness_evaluator, TwoTierFitnessEvaluator)
+
+        manager.initialize_population(self.cfg)
+        for generation_num in range(1, 4):
+            manager.evolve_one_gen(generation_num)
+            population = manager.population
+            self.assertTrue(all(LOW_FIDELITY in p.fitness_fidelities for p in population))
+
+            # everyone on the first cheap front has full scores
+            stand_ins = [SimpleNamespace(fitness_scores=p.fitness_at(LOW_FIDELITY), indiv=p)
+                         for p in population]
+            for s in E.fast_non_dominated_sort(stand_ins)[0]:
+                self.assertEqual(s.indiv.fitness_fidelity, FULL_FIDELITY)
+                self.assertEqual(s.indiv.fitness_scores, {"flare_length": s.indiv.genotype.flare_length,
+                                                          "waveguide_height": s.indiv.genotype.waveguide_height})
+
+        # the full evaluator never saw more than a generation's worth at once
+        self.assertTrue(all(0 < size <= 2 * self.cfg.population_size for size in CountingEvaluator.batch_sizes))
+
+    def test_failed_evaluations_are_requeued(self):
+        """Individuals whose evaluation fails are evaluated again with the next generation."""
+        self.cfg.fitness_evaluator = "tests.test_fitness_evaluators:FlakyEvaluator"
+        manager = Manager(self.cfg)
+        manager.initialize_population(self.cfg)
+        requeued = list(manager.selection_scheme.requeue)
+        self.assertEqual(len(requeued), 2)
+        self.assertEqual(len(manager.population), 4)
+        self.assertTrue(all(p.fitness_pending and p.failed_evaluations == 1 for p in requeued))
+
+        manager.evolve_one_gen(1)
+        self.assertEqual(len(manager.population), self.cfg.population_size)
+        self.assertTrue(all(not p.fitness_pending for p in requeued))
+        self.assertTrue(all(not p.fitness_pending for p in manager.population))
+
+        # Offspring requeued later do not grow the population
+        for generation_num in range(2, 5):
+            manager.evolve_one_gen(generation_num)
+            self.assertEqual(len(manager.population), self.cfg.population_size)
+
+    def test_steady_state_evolution(self):
+        """The steady-state evolver keeps every worker busy and the population sorted."""
+        self.cfg.fitness_evaluator = "tests.test_fitness_evaluators:SlowEvaluator"
+        self.cfg.selection_scheme = "SteadyStateNSGAII"
+        manager = Manager(self.cfg)
+        self.assertIsInstance(manager.selection_scheme, E.SteadyStateNSGA2)
+
+        manager.initialize_population(self.cfg)
+        for generation_num in range(1, 4):
+            manager.evolve_one_gen(generation_num)
+            population = manager.population
+            self.assertEqual(len(population), self.cfg.population_size)
+            self.assertTrue(all(not p.fitness_pending for p in population))
+            # Evaluations of the next generation are already running
+            self.assertEqual(len(manager.selection_scheme.in_flight), 3)
+
+            ranks = {id(p): p.nsgaii_rank for p in population}
+            E.fast_non_dominated_sort(population)
+            self.assertEqual(ranks, {id(p): p.nsgaii_rank for p in population})
+
+        manager.selection_scheme.close()
+        self.assertEqual(SlowEvaluator.max_running, 3)
+        self.assertEqual(len({p.indiv_id for p in manager.population}), self.cfg.population_size)
+
+        self.cfg.low_fidelity_evaluator = "dummy"
+        with self.assertRaises(ValueError):
+            Manager(self.cfg)
+
+    def test_steady_state_gives_up_on_failing_evaluator(self):
+        """Steady-state evolution stops once every evaluation keeps failing."""
+        self.cfg.selection_scheme = "SteadyStateNSGAII"
+        manager = Manager(self.cfg)
+        manager.initialize_population(self.cfg)
+        evolver = manager.selection_scheme
+        evolver.fitness_evaluator = FailingEvaluator()
+        evolver.max_consecutive_failures = 10
+        with self.assertRaisesRegex(RuntimeError, "11 evaluations"):
+            manager.evolve_one_gen(1)
+        evolver.close()
+
+    def test_invalid_evaluator(self):
+        """Unknown names and classes that are not evaluators are rejected."""
+        self.cfg.fitness_evaluator = "not_an_evaluator"
+        with self.assertRaises(ValueError):
+            make_fitness_evaluator(self.cfg)
+        self.cfg.fitness_evaluator = "src.GENETIS_RHINO.genotype:Genotype"
+        with self.assertRaises(TypeError):
+            make_fitness_evaluator(self.cfg)
+
+
+def test_failed_evaluations_are_not_cached(tmp_path):
+    """A genotype whose evaluation failed is evaluated again rather than read from the cache."""
+    cfg = ParametersObject(CONFIG_PATH)
+    rand = random.Random(1)
+    genotypes = [Genotype(cfg).generate_with_ridge(rand) for _ in range(2)]
+    evaluator = CachedFitnessEvaluator(FlakyEvaluator(), FitnessCache(tmp_path / "cache.sqlite"))
+
+    first = evaluator.evaluate_batch(genotypes)
+    assert first[0] is None and first[1] is not None
+    assert len(evaluator.cache) == 1
+    assert evaluator.evaluate_batch(genotypes) == [DummyFitnessFunc(g).get_fitness_scores() for g in genotypes]
+    assert len(evaluator.cache) == 2
+
+
+def test_uan_evaluator(tmp_path, ref_map_path):
+    """Each genotype is scored from the UAN files in <root>/<hash>, however it is batched."""
+    cfg = ParametersObject(CONFIG_PATH)
+    rand = random.Random(1)
+    genotypes = [Genotype(cfg).generate_with_ridge(rand) for _ in range(2)]
+    for g in genotypes:
+        shutil.copytree("tests/assets/uan_example/0", tmp_path / g.canonical_hash())
+    cfg.fitness_evaluator = "uan"
+    cfg.uan_directory_root = str(tmp_path)
+
+    evaluator = make_fitness_evaluator(cfg)
+    assert isinstance(evaluator, UANFitnessEvaluator)
+    sky = SkyModel(ref_map_path)
+    evaluator.sky_model = sky
+
+    scores = evaluator.evaluate_batch(genotypes)
+    expected = calculate_fitnesses("tests/assets/uan_example/0", sky_model=sky)
+    assert len(scores) == 2
+    for s in scores:
+        assert s == pytest.approx(expected)
+
+    # A subset, or a single genotype, reads its own directory
+    shutil.rmtree(tmp_path / genotypes[0].canonical_hash())
+    assert evaluator.evaluate_one(genotypes[1]) == pytest.approx(expected)
+    assert evaluator.evaluate_batch(genotypes[1:]) == [pytest.approx(expected)]
+
+
+if __name__ == '__main__':
+    unittest.main()
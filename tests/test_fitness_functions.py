@@ -1,5 +1,230 @@
-from src.GENETIS_RHINO.fitness_functions import calculate_fitnesses
+import shutil
+
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.time import Time
+
+from src.GENETIS_RHINO import fitness_functions
+from src.GENETIS_RHINO.beam_metrics import BeamSnapshot, calculate_beam_metrics
+from src.GENETIS_RHINO.beam_resampling import solid_angle_weights
+from src.GENETIS_RHINO.fitness_functions import (
+    beam_correction_factor,
+    beam_correction_factor_batch,
+    calculate_bcf_stats,
+    calculate_fitnesses,
+    load_uan,
+    load_uan_directory,
+    read_uan,
+    stream_beam_correction_factor,
+)
+from src.GENETIS_RHINO.sky_model import SkyModel
+
+UAN_PATH = "tests/assets/uan_example/0/0_0_1.uan"
+
+
+def beam_grid(step=10):
+    """Flattened alt/az grid covering the upper hemisphere."""
+    az_grid, alt_grid = np.meshgrid(np.arange(0, 361, step), np.arange(90, -1, -step))
+    return alt_grid.flatten(), az_grid.flatten()
+
+
+def write_uan(path, rows, theta_max, phi_max, magnitude="dB", freq_hz=3.5e8):
+    """Write a minimal UAN file with the given (za, az, mag_th, mag_ph, ph_th, ph_ph) rows."""
+    header = ["begin_<parameters>", "phi_min 0", "phi_max %d" % phi_max, "phi_inc 1",
+              "theta_min 0", "theta_max %d" % theta_max, "theta_inc 1", "magnitude %s" % magnitude,
+              "frequencyHz %s" % freq_hz, "polarization theta_phi", "end_<parameters>"]
+    lines = header + [" ".join(str(v) for v in row) for row in rows]
+    path.write_text("\n".join(lines) + "\n")
 
 
 def test_fitness_function():
-    results = calculate_fitnesses("tests/assets/uan_example/0")
\ No newline at end of file
+    results = calculate_fitnesses("tests/assets/uan_example/0")
+
+
+def test_load_uan_matches_per_row_decode():
+    """The vectorized decode gives the same grid as converting each row on its own."""
+    freq_hz, za, az, values = load_uan(UAN_PATH)
+    assert freq_hz == 3.5e8
+    assert values.shape == (za.size, az.size)
+
+    rows = np.loadtxt(UAN_PATH, skiprows=18)
+    for _za, _az, mag_th, mag_ph, ph_th, ph_ph in rows[::997]:
+        E_za = 10.**(mag_th/10.) * np.exp(1.j*np.deg2rad(ph_th))
+        E_az = 10.**(mag_ph/10.) * np.exp(1.j*np.deg2rad(ph_ph))
+        power = (E_za * np.conj(E_za) + E_az * np.conj(E_az)).real
+        assert values[int(_za), int(_az)] == pytest.approx(10 * np.log10(power))
+
+
+def test_load_uan_rejects_duplicate_cells(tmp_path):
+    """A (za, az) cell given twice is an error."""
+    rows = [(0, 0, 1., 1., 0., 0.), (0, 1, 1., 1., 0., 0.), (0, 1, 2., 2., 0., 0.)]
+    write_uan(tmp_path / "dup.uan", rows, theta_max=0, phi_max=2)
+    with pytest.raises(AssertionError, match="duplicate"):
+        load_uan(str(tmp_path / "dup.uan"))
+
+
+def test_read_uan_header():
+    """Header metadata is returned alongside the full numeric table."""
+    header, table = read_uan(UAN_PATH)
+    assert header.freq_hz == 3.5e8
+    assert (header.phi_inc, header.theta_inc) == (1, 1)
+    assert header.magnitude_unit == "dB"
+    assert header.polarization == "theta_phi"
+    assert header.header_lines == 18
+    assert table.shape == (181 * 361, 6)
+    assert np.array_equal(table, np.loadtxt(UAN_PATH, skiprows=18))
+
+
+def test_read_uan_checks_row_count(tmp_path):
+    """A truncated file is rejected before its table is parsed."""
+    rows = [(0, 0, 1., 1., 0., 0.), (0, 1, 1., 1., 0., 0.)]
+    write_uan(tmp_path / "short.uan", rows, theta_max=0, phi_max=2)
+    with pytest.raises(AssertionError, match="expected 3"):
+        read_uan(str(tmp_path / "short.uan"))
+
+
+def test_read_uan_ignores_trailing_blank_lines(tmp_path):
+    """Blank lines after the last row are not counted as data rows."""
+    rows = [(0, 0, 1., 1., 0., 0.), (0, 1, 1., 1., 0., 0.)]
+    write_uan(tmp_path / "padded.uan", rows, theta_max=0, phi_max=1)
+    with open(tmp_path / "padded.uan", "a") as f:
+        f.write("\n  \n\n")
+    _, table = read_uan(str(tmp_path / "padded.uan"))
+    assert np.array_equal(table, np.array(rows))
+
+
+def test_load_uan_directory_cache(tmp_path):
+    """The packed cube is cached as memory-mappable .npy files and refreshed when a file changes."""
+    for fname in ["0_0_1.uan", "0_0_2.uan"]:
+        shutil.copy("tests/assets/uan_example/0/" + fname, tmp_path / fname)
+
+    beams, freqs, za, az = load_uan_directory(str(tmp_path), cache=True)
+    assert (tmp_path / ".uan_cache" / "beams.npy").exists()
+
+    cached = load_uan_directory(str(tmp_path), cache=True)
+    assert isinstance(cached[0], np.memmap)
+    for fresh, reloaded in zip((beams, freqs, za, az), cached):
+        assert np.array_equal(fresh, reloaded)
+    assert np.array_equal(np.load(tmp_path / ".uan_cache" / "beams.npy", mmap_mode="r"), beams)
+
+    # Removing a file invalidates the cache
+    (tmp_path / "0_0_2.uan").unlink()
+    beams, freqs, za, az = load_uan_directory(str(tmp_path), cache=True)
+    assert beams.shape[0] == 1
+    assert not isinstance(beams, np.memmap)
+
+
+def test_load_uan_directory_workers(tmp_path):
+    """Parsing in a process pool gives the same frequency-sorted cube as parsing serially."""
+    # File names in the opposite order to their frequencies
+    for fname, new_name in [("0_0_1.uan", "c.uan"), ("0_0_2.uan", "b.uan"), ("0_0_3.uan", "a.uan")]:
+        shutil.copy("tests/assets/uan_example/0/" + fname, tmp_path / new_name)
+
+    serial = load_uan_directory(str(tmp_path))
+    parallel = load_uan_directory(str(tmp_path), workers=2)
+    assert np.array_equal(serial[1], [350., 360., 370.])
+    for a, b in zip(serial, parallel):
+        assert np.array_equal(a, b)
+    assert np.array_equal(parallel[0][0], load_uan(str(tmp_path / "c.uan"))[3])
+
+
+def test_headers_are_parsed_once(monkeypatch):
+    """Loading a directory reuses the headers read to sort its files by frequency."""
+    parsed = []
+    parse = fitness_functions.parse_uan_header
+    monkeypatch.setattr(fitness_functions, "parse_uan_header", lambda header: parsed.append(header) or parse(header))
+    beams = load_uan_directory("tests/assets/uan_example/0")[0]
+    assert len(parsed) == beams.shape[0]
+
+    parsed.clear()
+    calculate_beam_metrics("tests/assets/uan_example/0", metrics=[BeamSnapshot(0)])
+    assert len(parsed) == beams.shape[0]
+
+
+def test_bcf_matches_per_frequency_sums(ref_map_path):
+    """The BCF is the ratio of the beam and sky-weighted beam sums, relative to the reference frequency."""
+    sky = SkyModel(ref_map_path)
+    alt, az = beam_grid()
+    freqs = np.array([50., 60., 70., 80.])
+    beams = np.random.default_rng(2).normal(0., 3., (freqs.size, alt.size))
+
+    bcf = beam_correction_factor(beams, alt, az, freqs, 2, sky_model=sky)
+
+    tmap = sky.tmap(alt, az)
+    lin = 10.**(beams/10.)
+    expected = [(np.sum(b * tmap) / np.sum(lin[2] * tmap)) * (np.sum(lin[2]) / np.sum(b)) for b in lin]
+    assert bcf == pytest.approx(expected)
+
+
+def test_bcf_batch_matches_single(ref_map_path):
+    """The batched BCF and stats agree with evaluating each antenna separately."""
+    sky = SkyModel(ref_map_path)
+    alt, az = beam_grid()
+    freqs = np.array([50., 60., 70., 80.])
+    beams = np.random.default_rng(3).normal(0., 3., (5, freqs.size, alt.size))
+
+    bcf = beam_correction_factor_batch(beams, alt, az, freqs, 1, sky_model=sky)
+    assert bcf.shape == (5, freqs.size)
+    stats = calculate_bcf_stats(freqs, bcf)
+
+    for i, beam in enumerate(beams):
+        single = beam_correction_factor(beam, alt, az, freqs, 1, sky_model=sky)
+        assert bcf[i] == pytest.approx(single)
+        single_stats = calculate_bcf_stats(freqs, single)
+        for name, value in single_stats.items():
+            assert stats[name][i] == pytest.approx(value)
+
+
+def test_streaming_bcf_matches_full_cube(ref_map_path):
+    """Accumulating the integrals file by file gives the same BCF and stats as loading the cube."""
+    sky = SkyModel(ref_map_path)
+    beams, freqs, za, az = load_uan_directory("tests/assets/uan_example/0")
+    az_grid, alt_grid = np.meshgrid(az, 90-za)
+    expected = beam_correction_factor(beams, alt_grid.flatten(), az_grid.flatten(), freqs, freqs.size//2, sky_model=sky,
+                                      pixel_weights=solid_angle_weights(za, az))
+
+    stream_freqs, bcf = stream_beam_correction_factor("tests/assets/uan_example/0", sky_model=sky)
+    assert np.array_equal(stream_freqs, freqs)
+    assert bcf == pytest.approx(expected)
+
+    stats = calculate_fitnesses("tests/assets/uan_example/0", sky_model=sky)
+    stream_stats = calculate_fitnesses("tests/assets/uan_example/0", sky_model=sky, streaming=True)
+    for name, value in stats.items():
+        assert stream_stats[name] == pytest.approx(value)
+
+    with pytest.raises(ValueError, match="streaming"):
+        calculate_fitnesses("tests/assets/uan_example/0", sky_model=sky, streaming=True, cache=True)
+
+
+def test_multi_epoch_bcf(ref_map_path):
+    """An array of times gives one BCF per time, matching separate single-time calls."""
+    sky = SkyModel(ref_map_path)
+    alt, az = beam_grid()
+    freqs = np.array([50., 60., 70.])
+    beams = np.random.default_rng(4).normal(0., 3., (2, freqs.size, alt.size))
+    times = Time("2025-08-01 22:00:00Z") + np.arange(3) * 2 * u.hour
+
+    bcf = beam_correction_factor(beams[0], alt, az, freqs, 1, obstime=times, sky_model=sky)
+    assert bcf.shape == (times.size, freqs.size)
+    batch = beam_correction_factor_batch(beams, alt, az, freqs, 1, obstime=times, sky_model=sky)
+    assert batch.shape == (2, times.size, freqs.size)
+    assert batch[0] == pytest.approx(bcf)
+
+    for i, t in enumerate(times):
+        assert bcf[i] == pytest.approx(beam_correction_factor(beams[0], alt, az, freqs, 1, obstime=t, sky_model=sky))
+        assert batch[1, i] == pytest.approx(beam_correction_factor(beams[1], alt, az, freqs, 1, obstime=t, sky_model=sky))
+
+
+def test_multi_epoch_fitnesses(ref_map_path):
+    """Drift-scan fitnesses average the per-time statistics, with or without streaming."""
+    sky = SkyModel(ref_map_path)
+    times = Time("2025-08-01 22:00:00Z") + np.arange(2) * 6 * u.hour
+    path = "tests/assets/uan_example/0"
+
+    per_time = [calculate_fitnesses(path, sky_model=sky, obstime=t) for t in times]
+    averaged = calculate_fitnesses(path, sky_model=sky, obstime=times)
+    streamed = calculate_fitnesses(path, sky_model=sky, obstime=times, streaming=True)
+    for name, value in averaged.items():
+        assert value == pytest.approx(np.mean([stats[name] for stats in per_time]))
+        assert streamed[name] == pytest.approx(value)
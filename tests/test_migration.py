@@ -0,0 +1,95 @@
+import pathlib
+import queue
+
+import pandas as pd
+import pytest
+
+from src.GENETIS_RHINO.manager import Manager, island_config, run_islands
+from src.GENETIS_RHINO.migration import migration_targets, receive_migrants, select_migrants
+from src.GENETIS_RHINO.parameters import ParametersObject
+
+CONFIG_PATH = str(pathlib.Path(__file__).parent.parent / "src/GENETIS_RHINO/config.toml")
+
+
+def small_cfg():
+    cfg = ParametersObject(CONFIG_PATH)
+    cfg.population_size = 6
+    cfg.num_generations = 5
+    cfg.migration_interval = 2
+    cfg.num_migrants = 2
+    return cfg
+
+
+def test_migration_targets():
+    """Ring and fully connected topologies."""
+    assert migration_targets("ring", 3) == [[1], [2], [0]]
+    assert migration_targets("ring", 1) == [[]]
+    assert migration_targets("fully_connected", 3) == [[1, 2], [0, 2], [0, 1]]
+    with pytest.raises(ValueError):
+        migration_targets("star", 3)
+
+
+def test_islands_have_their_own_simulation_dirs():
+    """Each island gets its own copy of the config; the shared one is left unchanged."""
+    cfg = small_cfg()
+    run_dir = pathlib.Path(cfg.simulation_run_dir)
+    assert [island_config(cfg, i).simulation_run_dir for i in (0, 1, 1)] == \
+           [str(run_dir / "island0"), str(run_dir / "island1"), str(run_dir / "island1")]
+    assert cfg.simulation_run_dir == str(run_dir)
+
+
+def test_islands_have_their_own_random_streams():
+    """Island 0 matches a single-population run; other islands differ from it."""
+    cfg = small_cfg()
+    single, island0, island1 = Manager(cfg), Manager(cfg, 0), Manager(cfg, 1)
+    assert single.rand.random() == island0.rand.random()
+    assert single.rand.random() != island1.rand.random()
+
+
+def test_migrants_are_merged_in_generation_order():
+    """Migrants sent early are kept until their generation; immigrants compete with residents."""
+    cfg = small_cfg()
+    managers = [Manager(cfg, i) for i in range(3)]
+    for manager in managers:
+        manager.initialize_population(cfg)
+        manager.evolve_one_gen(1)
+
+    migrants = [select_migrants(m.population, cfg.num_migrants) for m in managers]
+    for m, sent in zip(managers, migrants):
+        assert 0 < len(sent) <= cfg.num_migrants
+        assert all(indiv.nsgaii_rank == 0 for indiv in sent)
+
+    # island 1 is ahead and already sent its migrants for generation 4
+    inbox = queue.Queue()
+    inbox.put((1, 4, ["later"]))
+    inbox.put((1, 2, migrants[1]))
+    inbox.put((2, 2, migrants[2]))
+    pending = []
+    immigrants = receive_migrants(inbox, pending, [1, 2], 2)
+    assert immigrants == migrants[1] + migrants[2]
+    assert pending == [(1, 4, ["later"])]
+    assert all(indiv.indiv_id.split(":")[0] in ("1", "2") for indiv in immigrants)
+
+    # Migrants passed on to another island keep the ID of the island they were bred on
+    ids = [indiv.indiv_id for indiv in immigrants]
+    inbox.put((0, 4, immigrants))
+    assert receive_migrants(inbox, [], [0], 4) == immigrants
+    assert [indiv.indiv_id for indiv in immigrants] == ids
+
+    managers[0].add_immigrants(immigrants)
+    assert len(managers[0].population) == cfg.population_size
+
+
+def test_run_islands(tmp_path, monkeypatch):
+    """Islands evolve in separate processes and write their own CSV files."""
+    monkeypatch.chdir(tmp_path)
+    cfg = small_cfg()
+    cfg.num_islands = 3
+    cfg.migration_topology = "fully_connected"
+    populations = run_islands(cfg)
+
+    assert len(populations) == 3
+    assert all(len(p) == cfg.population_size for p in populations)
+    for i in range(3):
+        assert len(pd.read_csv(tmp_path / f"island{i}_fitness.csv")) == cfg.num_generations - 1
+        assert (tmp_path / f"island{i}_best_individuals.csv").exists()
@@ -0,0 +1,183 @@
+import pathlib
+import pickle
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.GENETIS_RHINO.evolver as E
+from src.GENETIS_RHINO.analysis import Analysis
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.manager import Manager
+from src.GENETIS_RHINO.parameters import ParametersObject
+from src.GENETIS_RHINO.phenotype import FULL_FIDELITY, LOW_FIDELITY, PendingFitnessError, Phenotype
+from src.GENETIS_RHINO.population import Population, PhenotypeView, gene_names
+
+CONFIG_PATH = str(pathlib.Path(__file__).parent.parent / "src/GENETIS_RHINO/config.toml")
+cfg = ParametersObject(CONFIG_PATH)
+
+
+def make_phenotypes(size, seed=1, spread=4):
+    """Evaluated Phenotypes with small integer scores, so there are many ties."""
+    rand = random.Random(seed)
+    phenotypes = []
+    for i in range(size):
+        genotype = (Genotype(cfg).generate_with_ridge(rand) if i % 3
+                    else Genotype(cfg).generate_without_ridge(rand))
+        p = Phenotype(genotype, str(i), "None", 0)
+        p.fitness_scores = {"a": rand.randint(0, spread), "b": rand.randint(0, spread), "c": rand.randint(0, spread)}
+        phenotypes.append(p)
+    return phenotypes
+
+
+def test_round_trip():
+    """Packing Phenotypes into columns and back keeps their genes, fitness and IDs."""
+    phenotypes = make_phenotypes(10)
+    phenotypes[0].set_fitness({"x": 1.}, LOW_FIDELITY)
+    population = Population.from_phenotypes(phenotypes)
+    assert population.genes.shape == (10, len(gene_names(cfg)))
+    assert population.objectives == ["a", "b", "c"]
+
+    for p, q in zip(phenotypes, population.to_phenotypes(), strict=True):
+        assert q.genotype == p.genotype
+        assert q.fitness_fidelities == p.fitness_fidelities
+        assert q.fitness_scores == p.fitness_scores
+        assert (q.indiv_id, q.parent1_id, q.generation_created) == (p.indiv_id, p.parent1_id, p.generation_created)
+    assert population.to_phenotypes()[0].fitness_at(LOW_FIDELITY) == {"x": 1.}
+
+
+def test_views_read_and_write_columns():
+    """PhenotypeViews give the Phenotype interface on top of the columns."""
+    population = Population(cfg, Population.from_phenotypes(make_phenotypes(3)).genes, ["0", "1", "2"])
+    view = population[1]
+    assert isinstance(view, PhenotypeView)
+    assert view.fitness_pending
+    assert population.pending.all()
+    with pytest.raises(PendingFitnessError):
+        _ = view.fitness_scores
+    with pytest.raises(AttributeError):
+        _ = view.nsgaii_rank
+    assert getattr(view, "nsgaii_distance", None) is None
+
+    view.set_fitness({"a": 1, "b": 2}, LOW_FIDELITY)
+    view.set_fitness({"a": 3, "b": 4})
+    view.nsgaii_rank = 2
+    view.failed_evaluations += 1
+    assert view.fitness_scores == {"a": 3, "b": 4}
+    assert view.fitness_at(LOW_FIDELITY) == {"a": 1, "b": 2}
+    assert population.fidelity.tolist() == [-1, FULL_FIDELITY, -1]
+    assert population.rank[1] == 2
+    assert population.failed_evaluations[1] == 1
+    with pytest.raises(ValueError):
+        population[0].set_fitness({"z": 0})
+
+    # Copies are independent Phenotypes
+    copy = pickle.loads(pickle.dumps(view))
+    assert type(copy) is Phenotype
+    assert copy.fitness_scores == {"a": 3, "b": 4}
+    assert copy.genotype == view.genotype
+
+    view.fitness_scores = None
+    assert view.fitness_pending
+    with pytest.raises(IndexError):
+        _ = population[3]
+    assert population[-1].indiv_id == "2"
+
+
+def test_ranking_matches_phenotype_lists():
+    """Sorting, crowding distance and truncation on columns match the list-based evolver functions."""
+    phenotypes = make_phenotypes(60)
+    population = Population.from_phenotypes(phenotypes)
+
+    fronts = E.fast_non_dominated_sort(phenotypes)
+    rows = population.non_dominated_sort()
+    assert [[p.indiv_id for p in front] for front in fronts] == [population.ids[r].tolist() for r in rows]
+    for front, front_rows in zip(fronts, rows, strict=True):
+        E.crowding_distance_assignment(front)
+        reordered = population.crowding_distance_assignment(front_rows)
+        assert [p.indiv_id for p in front] == population.ids[reordered].tolist()
+        assert [p.nsgaii_distance for p in front] == population.distance[reordered].tolist()
+
+    survivors = E.select_survivors(list(phenotypes), 25)
+    assert population.select_survivors(25).ids.tolist() == [p.indiv_id for p in survivors]
+
+
+def test_tournament_and_mutation():
+    """Tournaments prefer lower rank; mutation stays within bounds and never flips has_ridge."""
+    population = Population.from_phenotypes(make_phenotypes(2))
+    population.rank[:] = [1, 0]
+    population.distance[:] = [np.inf, 0.]
+    rng = np.random.default_rng(1)
+    assert (population.tournament(50, rng) == 1).all()
+
+    config = ParametersObject(CONFIG_PATH)
+    config.per_site_mut_rate = 1.
+    config.mut_effect_size = 100.
+    population = Population.from_phenotypes(make_phenotypes(40), config)
+    before = population.genes.copy()
+    offspring = population.make_offspring(np.arange(40), 100, 3, rng)
+    assert np.array_equal(population.genes, before)
+    assert ((offspring.genes >= offspring.lower) & (offspring.genes <= offspring.upper)).all()
+    assert np.array_equal(offspring.genes[:, ~offspring.mutable], before[:, ~offspring.mutable])
+    assert (offspring.genes[:, offspring.mutable] != before[:, offspring.mutable]).any(axis=0).all()
+    assert offspring.ids.tolist() == [str(i) for i in range(100, 140)]
+    assert offspring.parent_ids.tolist() == population.ids.tolist()
+    assert offspring.pending.all()
+
+
+def test_concat():
+    """Populations are stacked with their fitness columns; objectives must agree."""
+    first = Population.from_phenotypes(make_phenotypes(3))
+    second = Population(cfg, first.genes, ["x", "y", "z"])
+    merged = Population.concat([first, second])
+    assert merged.ids.tolist() == ["0", "1", "2", "x", "y", "z"]
+    assert merged.pending.tolist() == [False] * 3 + [True] * 3
+
+    second[0].set_fitness({"other": 0.})
+    with pytest.raises(ValueError):
+        Population.concat([first, second])
+
+
+def test_analysis_of_population(tmp_path, monkeypatch):
+    """Analysis writes the same CSV files from columns as from Phenotypes."""
+    monkeypatch.chdir(tmp_path)
+    phenotypes = make_phenotypes(20)
+    population = Population.from_phenotypes(phenotypes)
+    population.non_dominated_sort()
+    for p, rank in zip(phenotypes, population.rank.tolist(), strict=True):
+        p.nsgaii_rank = rank
+
+    assert len(Analysis(population, "columns_").update_best_individuals()) == (population.rank == 0).sum()
+    Analysis(phenotypes, "list_").update_best_individuals()
+    # Scores are stored as floats
+    pd.testing.assert_frame_equal(pd.read_csv("columns_best_individuals.csv"),
+                                  pd.read_csv("list_best_individuals.csv"), check_dtype=False)
+    assert (Analysis(population).update_fitness_scores()
+            == Analysis(phenotypes).update_fitness_scores())
+
+
+def test_columnar_evolver(tmp_path, monkeypatch):
+    """The columnar NSGA-II evolves a Population, requeueing failed evaluations."""
+    monkeypatch.chdir(tmp_path)
+    config = ParametersObject(CONFIG_PATH)
+    config.population_size = 12
+    config.selection_scheme = "ColumnarNSGAII"
+    config.fitness_evaluator = "tests.test_fitness_evaluators:FlakyEvaluator"
+    manager = Manager(config)
+    manager.initialize_population(config)
+    assert isinstance(manager.selection_scheme, E.ColumnarNSGA2)
+
+    for generation_num in range(1, 4):
+        manager.evolve_one_gen(generation_num)
+        population = manager.population
+        assert isinstance(population, Population)
+        assert len(population) == config.population_size
+        assert not population.pending.any()
+        assert (population.rank >= 0).all()
+        Analysis(population).update(generation_num)
+
+    config.promote_fronts = 1
+    config.low_fidelity_evaluator = "dummy"
+    with pytest.raises(ValueError):
+        Manager(config)
@@ -0,0 +1,259 @@
+import pathlib
+import random
+
+import pytest
+
+import src.GENETIS_RHINO.evolver as E
+from src.GENETIS_RHINO.fitness_evaluators import AbstractFitnessEvaluator
+from src.GENETIS_RHINO.manager import Manager
+from src.GENETIS_RHINO.parameters import ParametersObject
+from src.GENETIS_RHINO.phenotype import FULL_FIDELITY, LOW_FIDELITY, Phenotype
+from src.GENETIS_RHINO.ranking import (
+    dominance_block,
+    fitness_matrices,
+    merge_into_fronts,
+    sweep_non_dominated_sort,
+    vectorized_non_dominated_sort,
+)
+
+
+class MockPhenotype:
+    def __init__(self, indiv_id, fitness_scores):
+        self.indiv_id = indiv_id
+        self.fitness_scores = fitness_scores
+
+
+class CoarseEvaluator(AbstractFitnessEvaluator):
+    """Two rounded objectives, so populations have many fronts and ties."""
+
+    def evaluate_batch(self, genotypes):
+        return [{"flare_length": round(g.flare_length, 1), "waveguide_height": round(g.waveguide_height, 1)}
+                for g in genotypes]
+
+
+def random_population(rand, size, num_objectives, spread=5):
+    """Small integer scores, so there are many ties and duplicates."""
+    return [MockPhenotype(i, {f"obj{m}": rand.randint(0, spread) for m in range(num_objectives)})
+            for i in range(size)]
+
+
+def fronts_and_ranks(fronts):
+    return ([[indiv.indiv_id for indiv in front] for front in fronts],
+            {indiv.indiv_id: indiv.nsgaii_rank for front in fronts for indiv in front})
+
+
+@pytest.mark.parametrize("num_objectives", [1, 2, 3, 16])
+@pytest.mark.parametrize("block_size", [None, 1, 7])
+def test_matches_pairwise_sort(num_objectives, block_size):
+    """Same fronts, in the same order, and same ranks as the pairwise sort."""
+    rand = random.Random(num_objectives)
+    for size in (0, 1, 2, 40, 101):
+        population = random_population(rand, size, num_objectives)
+        expected = fronts_and_ranks(E.pairwise_non_dominated_sort(population))
+        assert fronts_and_ranks(vectorized_non_dominated_sort(population, block_size)) == expected
+
+
+def test_mixed_fidelities_match_pairwise_sort():
+    """Everyone is ranked at low fidelity; fronts are split by the full-fidelity scores of promoted members."""
+    rand = random.Random(3)
+    population = []
+    for i in range(60):
+        p = Phenotype(None, i, "None", 0)
+        p.set_fitness({"a": rand.randint(0, 6), "b": rand.randint(0, 6)}, LOW_FIDELITY)
+        if rand.random() < 0.5:
+            p.set_fitness({"a": rand.randint(0, 6), "b": rand.randint(0, 6)}, FULL_FIDELITY)
+        population.append(p)
+
+    fronts = E.pairwise_non_dominated_sort(population)
+    expected = fronts_and_ranks(fronts)
+    assert fronts_and_ranks(vectorized_non_dominated_sort(population, 5)) == expected
+
+    has_low, _ = fitness_matrices(population)[0]
+    assert has_low.all()
+
+    # The fronts refine the low-fidelity fronts, and inside each of those the
+    # full-fidelity scores order the promoted individuals
+    low_fronts = E.pairwise_non_dominated_sort([MockPhenotype(p, p.fitness_at(LOW_FIDELITY)) for p in population])
+    low_rank = {stand_in.indiv_id: stand_in.nsgaii_rank for front in low_fronts for stand_in in front}
+    for p in population:
+        for q in population:
+            if low_rank[p] < low_rank[q]:
+                assert p.nsgaii_rank < q.nsgaii_rank
+            elif (low_rank[p] == low_rank[q] and FULL_FIDELITY in p.fitness_fidelities
+                    and FULL_FIDELITY in q.fitness_fidelities and E.dominates(p, q, FULL_FIDELITY)):
+                assert p.nsgaii_rank < q.nsgaii_rank
+
+    # Full-fidelity scores alone cannot be compared with low-fidelity ones
+    population.append(Phenotype(None, "full_only", "None", 0, {"a": 0, "b": 0}))
+    with pytest.raises(ValueError):
+        vectorized_non_dominated_sort(population)
+
+
+def test_dominance_block():
+    """Row individuals dominate column individuals; nobody dominates itself."""
+    population = [MockPhenotype(0, {"a": 1, "b": 1}),
+                  MockPhenotype(1, {"a": 2, "b": 2}),
+                  MockPhenotype(2, {"a": 1, "b": 1})]
+    dominates = dominance_block(fitness_matrices(population)[0][1], [0, 1])
+    assert dominates.tolist() == [[False, True, False], [False, False, False]]
+
+
+def test_mixed_fidelities_are_ranked_transitively():
+    """Comparing each pair at its highest shared fidelity would make a cycle; everyone is ranked at low fidelity."""
+    a = Phenotype(None, "a", "None", 0)
+    a.set_fitness({"x": 5, "y": 0}, LOW_FIDELITY)
+    a.set_fitness({"x": 1, "y": 0}, FULL_FIDELITY)
+    b = Phenotype(None, "b", "None", 0)
+    b.set_fitness({"x": 1, "y": 0}, LOW_FIDELITY)
+    b.set_fitness({"x": 2, "y": 0}, FULL_FIDELITY)
+    c = Phenotype(None, "c", "None", 0)
+    c.set_fitness({"x": 3, "y": 0}, LOW_FIDELITY)
+
+    # A dominates B at full fidelity, B dominates C and C dominates A at low fidelity
+    assert E.dominates(a, b) and E.dominates(b, c) and E.dominates(c, a)
+
+    for algorithm in E.non_dominated_sort_convert_dict:
+        fronts = E.fast_non_dominated_sort([a, b, c], algorithm)
+        assert [[p.indiv_id for p in front] for front in fronts] == [["b"], ["c"], ["a"]]
+    assert [p.indiv_id for p in E.select_survivors([a, b, c], 3)] == ["b", "c", "a"]
+    assert [p.indiv_id for p in E.select_survivors([a, b, c], 2)] == ["b", "c"]
+
+    # Within a low-fidelity front, the promoted members are ordered by their full-fidelity scores
+    b.set_fitness({"x": 5, "y": 0}, LOW_FIDELITY)
+    c.set_fitness({"x": 0, "y": 0}, FULL_FIDELITY)
+    for algorithm in E.non_dominated_sort_convert_dict:
+        fronts = E.fast_non_dominated_sort([a, b, c], algorithm)
+        assert [[p.indiv_id for p in front] for front in fronts] == [["c"], ["a"], ["b"]]
+
+
+def front_sets(fronts):
+    return [sorted(indiv.indiv_id for indiv in front) for front in fronts]
+
+
+@pytest.mark.parametrize("algorithm", ["ens_ss", "ens_bs", "sweep_2d"])
+def test_sub_quadratic_sorts_match_pairwise_sort(algorithm):
+    """Same fronts and ranks as the pairwise sort, each front in population order."""
+    rand = random.Random(4)
+    for num_objectives in ([2] if algorithm == "sweep_2d" else [1, 2, 3, 5]):
+        for size, spread in ((0, 5), (1, 5), (60, 3), (200, 20), (200, 1000)):
+            population = random_population(rand, size, num_objectives, spread)
+            expected = E.pairwise_non_dominated_sort(population)
+            expected_ranks = {indiv.indiv_id: indiv.nsgaii_rank for indiv in population}
+
+            fronts = E.fast_non_dominated_sort(population, algorithm)
+            assert front_sets(fronts) == front_sets(expected)
+            assert {indiv.indiv_id: indiv.nsgaii_rank for indiv in population} == expected_ranks
+            for front in fronts:
+                assert [indiv.indiv_id for indiv in front] == sorted(indiv.indiv_id for indiv in front)
+
+
+def test_sort_algorithm_selection():
+    """Mixed fidelities fall back to the vectorized sort; unknown algorithms are rejected."""
+    rand = random.Random(5)
+    population = []
+    for i in range(30):
+        p = Phenotype(None, i, "None", 0)
+        p.set_fitness({"a": rand.randint(0, 6), "b": rand.randint(0, 6)}, LOW_FIDELITY)
+        if i % 2:
+            p.set_fitness({"a": rand.randint(0, 6), "b": rand.randint(0, 6)}, FULL_FIDELITY)
+        population.append(p)
+    expected = front_sets(E.pairwise_non_dominated_sort(population))
+    for algorithm in E.non_dominated_sort_convert_dict:
+        assert front_sets(E.fast_non_dominated_sort(population, algorithm)) == expected
+
+    with pytest.raises(ValueError):
+        sweep_non_dominated_sort(random_population(rand, 5, 3))
+    with pytest.raises(ValueError):
+        E.NSGA2(sort_algorithm="bubble")
+
+
+@pytest.mark.parametrize("num_objectives", [1, 2, 3, 16])
+def test_crowding_distance_matches_loop(num_objectives):
+    """Same distances, and the front left in the same order, as the per-objective list sorts."""
+    rand = random.Random(num_objectives)
+    for size, spread in ((0, 5), (1, 5), (2, 5), (3, 0), (30, 4), (100, 1000)):
+        population = random_population(rand, size, num_objectives, spread)
+        front = list(population)
+        expected = list(population)
+        E.loop_crowding_distance_assignment(expected)
+        expected_distances = [indiv.nsgaii_distance for indiv in expected]
+
+        distances = E.crowding_distance_assignment(front)
+        assert [indiv.indiv_id for indiv in front] == [indiv.indiv_id for indiv in expected]
+        assert [indiv.nsgaii_distance for indiv in front] == expected_distances
+        assert distances.tolist() == expected_distances
+
+
+def test_crowding_distance_of_mixed_fidelities():
+    """A front is compared at the highest fidelity all its members share."""
+    rand = random.Random(6)
+    front = []
+    for i in range(20):
+        p = Phenotype(None, i, "None", 0)
+        p.set_fitness({"a": rand.random(), "b": rand.random()}, LOW_FIDELITY)
+        if i % 3:
+            p.set_fitness({"a": rand.random(), "b": rand.random()}, FULL_FIDELITY)
+        front.append(p)
+    expected = list(front)
+    E.loop_crowding_distance_assignment(expected)
+    expected_distances = {p.indiv_id: p.nsgaii_distance for p in expected}
+
+    E.crowding_distance_assignment(front)
+    assert {p.indiv_id: p.nsgaii_distance for p in front} == expected_distances
+
+
+def test_select_survivors_matches_list_truncation():
+    """Truncation keeps the same individuals, in the same order, as sorting the last front by distance."""
+    rand = random.Random(7)
+    combined = random_population(rand, 80, 3, 6)
+    survivors = E.select_survivors(list(combined), 40)
+
+    expected = []
+    for front in E.pairwise_non_dominated_sort(combined):
+        E.loop_crowding_distance_assignment(front)
+        if len(expected) + len(front) <= 40:
+            expected.extend(front)
+        else:
+            front.sort(key=lambda indiv: indiv.nsgaii_distance, reverse=True)
+            expected.extend(front[:40 - len(expected)])
+            break
+    assert [indiv.indiv_id for indiv in survivors] == [indiv.indiv_id for indiv in expected]
+
+
+@pytest.mark.parametrize("algorithm", ["vectorized", "ens_bs"])
+def test_merge_into_fronts_matches_full_sort(algorithm):
+    """Inserting the rest of a population into the fronts of part of it gives the fronts of a full sort."""
+    rand = random.Random(8)
+    for num_objectives, spread in ((1, 5), (2, 4), (3, 1000), (5, 3)):
+        for size, known in ((0, 0), (1, 0), (1, 1), (60, 0), (60, 30), (60, 60), (150, 100)):
+            population = random_population(rand, size, num_objectives, spread)
+            expected = fronts_and_ranks(E.fast_non_dominated_sort(population, algorithm))
+
+            # Fronts of a random subset, in scrambled order
+            fronts = E.fast_non_dominated_sort(rand.sample(population, known), algorithm)
+            for front in fronts:
+                rand.shuffle(front)
+            merged = merge_into_fronts(population, fronts, deb_order=algorithm in E.deb_ordered_sorts)
+            assert fronts_and_ranks(merged) == expected
+
+
+@pytest.mark.parametrize("algorithm", ["vectorized", "ens_bs"])
+def test_carried_fronts_match_sorting_every_generation(algorithm):
+    """Reusing the survivors' fronts evolves the same populations as sorting from scratch."""
+    cfg = ParametersObject(str(pathlib.Path(__file__).parent.parent / "src/GENETIS_RHINO/config.toml"))
+    cfg.population_size = 30
+    cfg.non_dominated_sort = algorithm
+    cfg.fitness_evaluator = "tests.test_ranking:CoarseEvaluator"
+    carried, resorted = Manager(cfg), Manager(cfg)
+    resorted.selection_scheme.sort_into_fronts = lambda population, known_fronts=None: (
+        E.fast_non_dominated_sort(population, algorithm))
+    carried.initialize_population(cfg)
+    resorted.initialize_population(cfg)
+
+    for generation_num in range(1, 11):
+        carried.evolve_one_gen(generation_num)
+        resorted.evolve_one_gen(generation_num)
+        assert carried.selection_scheme.survivors is carried.population
+        assert ([(p.indiv_id, p.nsgaii_rank, p.nsgaii_distance) for p in carried.population]
+                == [(p.indiv_id, p.nsgaii_rank, p.nsgaii_distance) for p in resorted.population])
+    assert len(carried.selection_scheme.survivor_fronts) > 1
@@ -0,0 +1,133 @@
+import json
+import pathlib
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.GENETIS_RHINO.fitness_evaluators import SimulationFitnessEvaluator, make_fitness_evaluator
+from src.GENETIS_RHINO.fitness_functions import calculate_fitnesses
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.parameters import ParametersObject
+from src.GENETIS_RHINO.simulation_runner import LocalSimulationRunner
+from src.GENETIS_RHINO.sky_model import SkyModel
+
+CONFIG_PATH = str(pathlib.Path(__file__).parent.parent / "src/GENETIS_RHINO/config.toml")
+FAKE_SIMULATOR = [sys.executable, str(pathlib.Path(__file__).parent / "assets" / "fake_simulator.py"),
+                  "{genotype_file}", "{uan_dir}"]
+
+
+def genotypes(n):
+    cfg = ParametersObject(CONFIG_PATH)
+    rand = random.Random(1)
+    return [Genotype(cfg).generate_with_ridge(rand) for _ in range(n)]
+
+
+def test_runs_each_genotype_in_its_own_work_dir(tmp_path):
+    """Every genotype is written out and simulated."""
+    batch = genotypes(3)
+    runner = LocalSimulationRunner(FAKE_SIMULATOR, tmp_path, max_jobs=2)
+    results = runner.run(batch)
+
+    assert [r.index for r in results] == [0, 1, 2]
+    assert all(r.ok and r.attempts == 1 for r in results)
+    for g, r in zip(batch, results):
+        with open(pathlib.Path(r.work_dir) / "genotype.json") as f:
+            assert json.load(f)["flare_length"] == g.flare_length
+        assert len(list(pathlib.Path(r.uan_dir).glob("*.uan"))) == 4
+        assert "simulating" in (pathlib.Path(r.work_dir) / "simulation.log").read_text()
+
+    # A second batch does not overwrite the first
+    second = runner.run(batch[:1])
+    assert second[0].work_dir != results[0].work_dir
+
+
+def test_runners_sharing_a_run_dir(tmp_path):
+    """Runners preparing batches in the same directory at once never share a batch."""
+    runners = [LocalSimulationRunner(FAKE_SIMULATOR, tmp_path) for _ in range(4)]
+    batch = genotypes(1)
+    with ThreadPoolExecutor(max_workers=len(runners)) as pool:
+        work_dirs = list(pool.map(lambda runner: [runner.prepare(batch)[0] for _ in range(10)], runners))
+    work_dirs = [w for dirs in work_dirs for w in dirs]
+    assert len(set(work_dirs)) == len(work_dirs)
+
+
+def test_bounded_concurrency(tmp_path):
+    """At most max_jobs simulations run at once, and the slots are kept busy."""
+    runner = LocalSimulationRunner(FAKE_SIMULATOR + ["--sleep", "0.4"], tmp_path, max_jobs=2)
+    start = time.monotonic()
+    results = runner.run(genotypes(4))
+    elapsed = time.monotonic() - start
+    assert all(r.ok for r in results)
+    assert 0.8 <= elapsed < 1.6
+
+
+def test_retries_and_timeouts(tmp_path):
+    """Failed simulations are retried; ones that run too long are killed."""
+    runner = LocalSimulationRunner(FAKE_SIMULATOR + ["--fail-attempts", "1"], tmp_path / "retry", retries=1)
+    result, = runner.run(genotypes(1))
+    assert result.ok
+    assert result.attempts == 2
+
+    runner = LocalSimulationRunner(FAKE_SIMULATOR + ["--sleep", "10"], tmp_path / "timeout",
+                                   timeout=0.5, retries=1)
+    result, = runner.run(genotypes(1))
+    assert not result.ok
+    assert result.attempts == 2
+    assert "timed out" in result.error
+    assert result.elapsed < 5
+
+    runner = LocalSimulationRunner(FAKE_SIMULATOR + ["--no-output"], tmp_path / "empty")
+    result, = runner.run(genotypes(1))
+    assert not result.ok
+    assert result.error == "wrote no UAN files"
+
+    with pytest.raises(ValueError):
+        LocalSimulationRunner(FAKE_SIMULATOR, tmp_path, max_jobs=0)
+
+
+def test_timeout_kills_child_processes(tmp_path):
+    """A simulator that times out is killed along with the processes it started."""
+    script = "sleep 30 & echo $! > child.pid; wait"
+    runner = LocalSimulationRunner(["sh", "-c", script], tmp_path, timeout=0.5)
+    result, = runner.run(genotypes(1))
+    assert "timed out" in result.error
+
+    # Killed children of a reaped shell may linger as zombies until init collects them
+    child = int((pathlib.Path(result.work_dir) / "child.pid").read_text())
+    stat = pathlib.Path(f"/proc/{child}/stat")
+    assert not stat.exists() or stat.read_text().rsplit(")", 1)[1].split()[0] == "Z"
+
+
+def test_simulation_evaluator(tmp_path, ref_map_path):
+    """Simulated UAN directories are scored with calculate_fitnesses."""
+    cfg = ParametersObject(CONFIG_PATH)
+    cfg.fitness_evaluator = "simulation"
+    cfg.simulator_command = " ".join(FAKE_SIMULATOR)
+    cfg.simulation_run_dir = str(tmp_path)
+    evaluator = make_fitness_evaluator(cfg)
+    assert isinstance(evaluator, SimulationFitnessEvaluator)
+    sky = SkyModel(ref_map_path)
+    evaluator.sky_model = sky
+
+    scores = evaluator.evaluate_batch(genotypes(2))
+    expected = calculate_fitnesses("tests/assets/uan_example/0", sky_model=sky)
+    assert scores == [pytest.approx(expected)] * 2
+
+    # failed simulations are returned for requeueing instead of stopping the run
+    evaluator.runner.command.append("--no-output")
+    evaluator.runner.retries = 0
+    assert evaluator.evaluate_batch(genotypes(2)) == [None, None]
+
+    # so are simulations that exit successfully but leave a corrupt UAN file
+    evaluator.runner.command[-1] = "--corrupt"
+    assert evaluator.evaluate_batch(genotypes(2)) == [None, None]
+    batch_dir = tmp_path / f"batch_{evaluator.runner.batch_num - 1:05d}"
+    for i in range(2):
+        assert "scoring failed: AssertionError" in (batch_dir / str(i) / "simulation.log").read_text()
+
+    cfg.simulation_backend = "not_a_backend"
+    with pytest.raises(ValueError):
+        make_fitness_evaluator(cfg)
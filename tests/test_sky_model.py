@@ -0,0 +1,107 @@
+import healpy as hp
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.coordinates import AltAz, Galactic, SkyCoord
+from astropy.time import Time
+from astropy_healpix import HEALPix
+
+from src.GENETIS_RHINO.fitness_functions import beam_correction_factor
+from src.GENETIS_RHINO.sky_model import SkyInterpolator, SkyModel, default_location, default_obstime
+
+
+def beam_grid(step=10):
+    """Flattened alt/az grid covering the upper hemisphere."""
+    az_grid, alt_grid = np.meshgrid(np.arange(0, 361, step), np.arange(90, -1, -step))
+    return alt_grid.flatten(), az_grid.flatten()
+
+
+def test_tmap_is_memoized(ref_map_path):
+    """The same grid, location and time reuse the interpolated map."""
+    sky = SkyModel(ref_map_path)
+    alt, az = beam_grid()
+
+    tmap = sky.tmap(alt, az)
+    assert tmap.shape == alt.shape
+    assert np.all(tmap > 0)
+    assert sky.tmap(alt.copy(), az.copy()) is tmap
+    assert not tmap.flags.writeable
+
+    # A different time or grid is a different map
+    later = sky.tmap(alt, az, obstime=Time("2025-08-02 04:00:00Z"))
+    assert later is not tmap
+    assert not np.allclose(later, tmap)
+    assert sky.tmap(*beam_grid(step=15)).shape != tmap.shape
+
+
+def test_tmap_cache_is_bounded(ref_map_path):
+    """The least recently used map is dropped once maxsize is reached."""
+    sky = SkyModel(ref_map_path, maxsize=2)
+    alt, az = beam_grid()
+    t0, t1, t2 = (Time("2025-08-01 22:00:00Z") + hours * u.hour for hours in (0, 1, 2))
+    first = sky.tmap(alt, az, obstime=t0)
+    sky.tmap(alt, az, obstime=t1)
+    sky.tmap(alt, az, obstime=t2)
+    assert len(sky._cache) == 2
+    assert sky.tmap(alt, az, obstime=t0) is not first
+
+
+def test_bcf_with_sky_model(ref_map_path):
+    """Passing a SkyModel gives the same BCF as loading the map from its path."""
+    alt, az = beam_grid()
+    freqs = np.array([50., 60., 70.])
+    rng = np.random.default_rng(1)
+    beams = rng.normal(0., 3., (freqs.size, alt.size))
+
+    bcf_path = beam_correction_factor(beams, alt, az, freqs, 1, ref_map_path=ref_map_path)
+    bcf_model = beam_correction_factor(beams, alt, az, freqs, 1, sky_model=SkyModel(ref_map_path))
+    assert bcf_model == pytest.approx(bcf_path)
+    assert bcf_model[1] == pytest.approx(1.)
+
+
+def test_interpolator_matches_astropy_healpix(ref_map_path):
+    """The sparse operator reproduces interpolate_bilinear_skycoord."""
+    alt, az = beam_grid()
+    ref_map = hp.read_map(ref_map_path)
+    nside = hp.npix2nside(ref_map.size)
+
+    frame = AltAz(obstime=default_obstime(), location=default_location())
+    coords = SkyCoord(az * u.deg, alt * u.deg, frame=frame)
+    expected = HEALPix(nside=nside, order="RING", frame=Galactic()).interpolate_bilinear_skycoord(coords, ref_map)
+
+    interp = SkyInterpolator.from_beam_grid(alt, az, nside)
+    assert interp.shape == (alt.size, ref_map.size)
+    assert interp.indices.shape == (alt.size, 4)
+    assert interp.apply(ref_map) == pytest.approx(expected)
+
+    # Several maps at once
+    stacked = interp.apply(np.stack([ref_map, 2. * ref_map]))
+    assert stacked.shape == (2, alt.size)
+    assert stacked[1] == pytest.approx(2. * expected)
+
+
+def test_interpolator_save_load(ref_map_path, tmp_path):
+    """An operator written to disk is read back unchanged."""
+    sky = SkyModel(ref_map_path)
+    alt, az = beam_grid()
+    interp = sky.interpolator(alt, az)
+    assert interp.apply(sky.ref_map) == pytest.approx(sky.tmap(alt, az))
+
+    interp.save(tmp_path / "interp.npz")
+    loaded = SkyInterpolator.load(tmp_path / "interp.npz")
+    assert loaded.nside == interp.nside
+    assert np.array_equal(loaded.indices, interp.indices)
+    assert np.array_equal(loaded.weights, interp.weights)
+
+
+def test_tmap_for_several_times(ref_map_path):
+    """An array of times gives one interpolated map per time, cached as one entry."""
+    sky = SkyModel(ref_map_path)
+    alt, az = beam_grid()
+    times = Time("2025-08-01 22:00:00Z") + np.arange(3) * u.hour
+
+    tmaps = sky.tmap(alt, az, obstime=times)
+    assert tmaps.shape == (3, alt.size)
+    assert sky.tmap(alt, az, obstime=times) is tmaps
+    for t, tmap in zip(times, tmaps):
+        assert tmap == pytest.approx(sky.tmap(alt, az, obstime=t))
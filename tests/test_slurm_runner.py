@@ -0,0 +1,126 @@
+import pathlib
+import random
+import sys
+
+import pytest
+
+from src.GENETIS_RHINO.evolver import SteadyStateNSGA2
+from src.GENETIS_RHINO.fitness_cache import FitnessCache
+from src.GENETIS_RHINO.fitness_evaluators import (
+    CachedFitnessEvaluator,
+    SimulationFitnessEvaluator,
+    make_fitness_evaluator,
+)
+from src.GENETIS_RHINO.fitness_functions import calculate_fitnesses
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.parameters import ParametersObject
+from src.GENETIS_RHINO.sky_model import SkyModel
+from src.GENETIS_RHINO.slurm_runner import SlurmSimulationRunner
+
+CONFIG_PATH = str(pathlib.Path(__file__).parent.parent / "src/GENETIS_RHINO/config.toml")
+ASSETS = pathlib.Path(__file__).parent / "assets"
+FAKE_SIMULATOR = [sys.executable, str(ASSETS / "fake_simulator.py"), "{genotype_file}", "{uan_dir}"]
+FAKE_SLURM = [sys.executable, str(ASSETS / "fake_slurm.py")]
+
+
+def genotypes(n):
+    cfg = ParametersObject(CONFIG_PATH)
+    rand = random.Random(1)
+    return [Genotype(cfg).generate_with_ridge(rand) for _ in range(n)]
+
+
+def fake_runner(tmp_path, simulator_args=(), sbatch_args=(), squeue_args=(), **kwargs):
+    state_dir = str(tmp_path / "slurm_state")
+    return SlurmSimulationRunner(FAKE_SIMULATOR + list(simulator_args), tmp_path / "runs",
+                                 sbatch=FAKE_SLURM + ["sbatch", "--state-dir", state_dir] + list(sbatch_args),
+                                 squeue=FAKE_SLURM + ["squeue", "--state-dir", state_dir] + list(squeue_args),
+                                 poll_interval=0.05, **kwargs)
+
+
+def test_batch_runs_as_one_chunked_job_array(tmp_path):
+    """A batch is submitted once, with chunk_size individuals per array task."""
+    runner = fake_runner(tmp_path, ["--sleep", "0.1"], max_jobs=2, chunk_size=2)
+    results = runner.run(genotypes(5))
+
+    assert [r.index for r in results] == list(range(5))
+    assert all(r.ok and r.attempts == 1 and r.error is None for r in results)
+    for r in results:
+        assert len(list(pathlib.Path(r.uan_dir).glob("*.uan"))) == 4
+
+    assert len(list((tmp_path / "slurm_state").glob("*.job"))) == 1
+    batch_dir = pathlib.Path(results[0].work_dir).parent
+    assert "#SBATCH --array=0-2%2" in (batch_dir / "job_1.sh").read_text()
+    assert len(list((batch_dir / "tasks_1").glob("*.sh"))) == 3
+
+
+def test_failures_are_resubmitted_then_returned(tmp_path):
+    """Failed individuals are resubmitted together, then returned for requeueing."""
+    runner = fake_runner(tmp_path / "retry", ["--fail-attempts", "1"], retries=1)
+    results = runner.run(genotypes(3))
+    assert all(r.ok and r.attempts == 2 for r in results)
+    assert len(list((tmp_path / "retry" / "slurm_state").glob("*.job"))) == 2
+
+    # the first array task never runs, e.g. it was preempted
+    runner = fake_runner(tmp_path / "dropped", sbatch_args=["--drop-task", "0"], retries=1)
+    results = runner.run(genotypes(3))
+    assert not results[0].ok
+    assert results[0].error == "did not finish"
+    assert results[0].attempts == 2
+    assert all(r.ok and r.attempts == 1 for r in results[1:])
+
+    runner = fake_runner(tmp_path / "failed", ["--fail-attempts", "1"])
+    results = runner.run(genotypes(2))
+    assert [r.error for r in results] == ["exited with status 1"] * 2
+    assert "attempt 1 failed: exited with status 1" in (pathlib.Path(results[0].work_dir) / "simulation.log").read_text()
+
+    runner = fake_runner(tmp_path / "rejected", sbatch_args=["--reject"])
+    with pytest.raises(RuntimeError, match="invalid partition"):
+        runner.run(genotypes(1))
+
+    with pytest.raises(ValueError):
+        fake_runner(tmp_path, chunk_size=0)
+
+
+def test_queue_listing_failures(tmp_path):
+    """Jobs the controller has forgotten have finished; an unreachable controller is given up on."""
+    runner = fake_runner(tmp_path / "purged", squeue_args=["--purge"])
+    results = runner.run(genotypes(2))
+    assert all(r.ok for r in results)
+
+    runner = fake_runner(tmp_path / "down", squeue_args=["--down"], max_failed_polls=3)
+    with pytest.raises(RuntimeError, match="4 times in a row"):
+        runner.run(genotypes(1))
+
+
+def test_slurm_simulation_evaluator(tmp_path, ref_map_path):
+    """The simulation evaluator runs on the SLURM backend when configured to."""
+    cfg = ParametersObject(CONFIG_PATH)
+    cfg.fitness_evaluator = "simulation"
+    cfg.simulation_backend = "slurm"
+    cfg.simulator_command = " ".join(FAKE_SIMULATOR)
+    cfg.simulation_run_dir = str(tmp_path / "runs")
+    cfg.slurm_chunk_size = 2
+    cfg.sbatch_command = " ".join(FAKE_SLURM + ["sbatch", "--state-dir", str(tmp_path / "state")])
+    cfg.squeue_command = " ".join(FAKE_SLURM + ["squeue", "--state-dir", str(tmp_path / "state")])
+    cfg.slurm_poll_interval = 0.05
+    cfg.slurm_max_failed_polls = 3
+    evaluator = make_fitness_evaluator(cfg)
+    assert isinstance(evaluator, SimulationFitnessEvaluator)
+    assert isinstance(evaluator.runner, SlurmSimulationRunner)
+    assert evaluator.runner.max_failed_polls == 3
+    sky = SkyModel(ref_map_path)
+    evaluator.sky_model = sky
+
+    scores = evaluator.evaluate_batch(genotypes(3))
+    expected = calculate_fitnesses(str(ASSETS / "uan_example" / "0"), sky_model=sky)
+    assert scores == [pytest.approx(expected)] * 3
+
+    # Steady-state evolution would submit one job array per individual
+    with pytest.raises(ValueError, match="one individual at a time"):
+        SteadyStateNSGA2(evaluator)
+    with pytest.raises(ValueError, match="one individual at a time"):
+        SteadyStateNSGA2(CachedFitnessEvaluator(evaluator, FitnessCache(str(tmp_path / "cache.sqlite"))))
+
+    # An array task that exits successfully but leaves a corrupt UAN file gets its genotype requeued
+    evaluator.runner.command.append("--corrupt")
+    assert evaluator.evaluate_batch(genotypes(2)) == [None, None]
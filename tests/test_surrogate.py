@@ -0,0 +1,109 @@
+import pathlib
+import random
+
+import numpy as np
+import pytest
+
+from src.GENETIS_RHINO.fitness_evaluators import DummyFitnessEvaluator
+from src.GENETIS_RHINO.genotype import Genotype
+from src.GENETIS_RHINO.manager import Manager
+from src.GENETIS_RHINO.parameters import ParametersObject
+from src.GENETIS_RHINO.phenotype import Phenotype
+from src.GENETIS_RHINO.surrogate import RBFSurrogate, genotype_features, make_surrogate
+
+CONFIG_PATH = str(pathlib.Path(__file__).parent.parent / "src/GENETIS_RHINO/config.toml")
+
+
+class CountingEvaluator(DummyFitnessEvaluator):
+    """Dummy evaluator that records the size of every batch."""
+
+    batch_sizes = []
+
+    def evaluate_batch(self, genotypes):
+        CountingEvaluator.batch_sizes.append(len(genotypes))
+        return super().evaluate_batch(genotypes)
+
+
+def evaluated_population(cfg, size, seed):
+    """Random phenotypes scored by the dummy fitness function."""
+    rand = random.Random(seed)
+    population = [Phenotype(Genotype(cfg).generate_with_ridge(rand), str(i), "None", 0) for i in range(size)]
+    DummyFitnessEvaluator().evaluate_pending(population)
+    return population
+
+
+def test_genotype_features():
+    """Features are the flattened genes."""
+    cfg = ParametersObject(CONFIG_PATH)
+    g = Genotype(cfg).generate_with_ridge(random.Random(1))
+    features = genotype_features(g)
+    assert features.shape == (4 + 7 * cfg.NUM_WALL_PAIRS,)
+    assert features[0] == g.flare_length
+    assert features[4] == 1.0  # has_ridge
+
+
+def test_surrogate_predictions():
+    """The surrogate reproduces its training data and ranks unseen genotypes."""
+    cfg = ParametersObject(CONFIG_PATH)
+    train = evaluated_population(cfg, 80, seed=1)
+    test = evaluated_population(cfg, 40, seed=2)
+
+    surrogate = RBFSurrogate(min_archive=80)
+    surrogate.observe(train[:40])
+    assert not surrogate.ready
+    with pytest.raises(RuntimeError):
+        surrogate.predict([test[0].genotype])
+    surrogate.observe(train[40:] + train[:5])
+    assert surrogate.ready
+    assert len(surrogate.archive) == 80
+
+    predicted = surrogate.predict([p.genotype for p in train[:10]])
+    for p, indiv in zip(predicted, train[:10]):
+        assert p == pytest.approx(indiv.fitness_scores, rel=1e-3)
+
+    accuracy = surrogate.record_accuracy(1, surrogate.predict([p.genotype for p in test]),
+                                         [p.fitness_scores for p in test])
+    assert accuracy["spearman"] > 0
+    assert np.isfinite(accuracy["normalized_rmse"])
+    assert surrogate.accuracy_history == [accuracy]
+
+
+def test_archive_is_bounded():
+    """Only the most recent genotypes are kept."""
+    cfg = ParametersObject(CONFIG_PATH)
+    population = evaluated_population(cfg, 10, seed=1)
+    surrogate = RBFSurrogate(min_archive=2, max_archive=4)
+    surrogate.observe(population)
+    assert len(surrogate.archive) == 4
+    assert list(surrogate.archive) == [p.genotype.canonical_hash() for p in population[-4:]]
+
+
+def test_prescreening_in_evolution():
+    """With a trained surrogate, only pop_size offspring per generation are evaluated."""
+    cfg = ParametersObject(CONFIG_PATH)
+    cfg.population_size = 10
+    cfg.fitness_evaluator = "tests.test_surrogate:CountingEvaluator"
+    cfg.surrogate_pool_factor = 3.0
+    cfg.surrogate_min_archive = 15
+    assert make_surrogate(cfg) is not None
+
+    CountingEvaluator.batch_sizes = []
+    manager = Manager(cfg)
+    manager.initialize_population(cfg)
+    for generation_num in range(1, 5):
+        manager.evolve_one_gen(generation_num)
+        assert len(manager.population) == 10
+
+    assert CountingEvaluator.batch_sizes == [10] * 5
+    surrogate = manager.selection_scheme.surrogate
+    # the surrogate is ready once the first generation has been evaluated
+    assert [a["generation"] for a in surrogate.accuracy_history] == [2, 3, 4]
+    assert all(a["num_evaluated"] == 10 for a in surrogate.accuracy_history)
+
+    ids = [int(p.indiv_id) for p in manager.population if p.generation_created == 4]
+    assert all(40 <= i < 50 for i in ids)
+
+
+def test_disabled_by_default():
+    """The default config does not pre-screen."""
+    assert make_surrogate(ParametersObject(CONFIG_PATH)) is None